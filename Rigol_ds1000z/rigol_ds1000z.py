@@ -1,7 +1,10 @@
 import pyvisa as _visa
+import asyncio
+import time
 from .rigol_visa               import Rigol_visa
 from .rigol_ds1000z_acquire    import Rigol_ds1000z_Acquire
 from .rigol_ds1000z_channel    import Rigol_ds1000z_Channel
+from .rigol_ds1000z_cursor     import Rigol_ds1000z_Cursor
 from .rigol_ds1000z_decoder    import Rigol_ds1000z_Decoder
 from .rigol_ds1000z_math       import Rigol_ds1000z_Math
 from .rigol_ds1000z_measure    import Rigol_ds1000z_Measure
@@ -9,6 +12,8 @@ from .rigol_ds1000z_trigger    import Rigol_ds1000z_Trigger
 from .rigol_ds1000z_timebase   import Rigol_ds1000z_Timebase
 from .rigol_ds1000z_wave       import Rigol_ds1000z_Wave
 from .rigol_ds1000z_screenshot import Rigol_ds1000z_Screenshot
+from .rigol_ds1000z_tuning     import Rigol_ds1000z_Tuning
+from .rigol_ds1000z_constants  import TriggerStatus
 
 class Rigol_ds1000z:
     '''
@@ -17,21 +22,38 @@ class Rigol_ds1000z:
     Attributes implmemented:
       acquire
       channel
+      cursor
       decoder
       measure
       screenshot
       timebase
       trigger (analog)
+      tuning
       wave
 
+    Run control: run(), stop(), single(), force() and wait_for_trigger()
+
+    The object may be shared between threads: every command is atomic, and
+    multi-command sequences go inside transaction(). Downloads let threads
+    running under rigol_visa.priority() in between blocks (see the
+    concurrency notes in rigol_visa).
+
     '''
-    def __init__(self, visa_resource=None):
+    def __init__(self, visa_resource=None, load_tuning:bool=False):
+        '''
+        Args:
+            visa_resource: open pyvisa resource (or a replay); autodetected when omitted
+            load_tuning (bool): apply the stored transfer tuning of this scope
+                (see rigol_ds1000z_tuning); this queries *IDN?
+        '''
         self.visa_resource = self._autodetect_visa(visa_resource)
         self.visa = Rigol_visa(self.visa_resource)
         self._num_channels = 4
         self._num_decoders = 2
+        self._srq_supported = None # unknown until the first wait_for_trigger() over SRQ
         self.acquire    = Rigol_ds1000z_Acquire(self.visa_resource)
         self.channel    = [Rigol_ds1000z_Channel(self.visa_resource, c) for c in range(1, self._num_channels+1)]
+        self.cursor     = Rigol_ds1000z_Cursor(self.visa_resource)
         self.decoder    = [Rigol_ds1000z_Decoder(self.visa_resource, c) for c in range(1, self._num_decoders+1)]
         self.math       = Rigol_ds1000z_Math(self.visa_resource)
         self.measure    = Rigol_ds1000z_Measure(self.visa_resource)
@@ -39,6 +61,9 @@ class Rigol_ds1000z:
         self.trigger    = Rigol_ds1000z_Trigger(self.visa_resource)
         self.wave       = Rigol_ds1000z_Wave(self.visa_resource)
         self.screenshot = Rigol_ds1000z_Screenshot(self.visa_resource)
+        self.tuning     = Rigol_ds1000z_Tuning(self)
+        if load_tuning:
+            self.tuning.load()
 
 
     def __getitem__(self, i):
@@ -63,24 +88,188 @@ class Rigol_ds1000z:
         KNOWN_SCOPE_MODELS = ['1054Z', '1074Z', '1104Z']
         return bool([model for model in KNOWN_SCOPE_MODELS if(model in idn)])
 
+    def transaction(self):
+        '''
+        Context manager holding the instrument lock for a multi-command
+        sequence, e.g. changing a channel and reading the preamble that
+        depends on it, without other threads' commands in between.
+        '''
+        return self.visa.transaction()
+
     def autoscale(self):
         self.visa.write(':autoscale') 
+        self.wave.new_acquisition()
 
     def clear(self):
         self.visa.write(':clear')
+        self.wave.new_acquisition()
 
     def run(self):
         self.visa.write(':run')
+        self.wave.new_acquisition()
 
     def stop(self):
         self.visa.write(':stop')
 
     def single(self):
         self.visa.write(':single')
+        self.wave.new_acquisition()
 
     def force(self):
         self.visa.write(':tforce')
 
+    def wait_for_trigger(self, timeout:float=10.0, use_srq:bool=None,
+                         poll_interval:float=1e-3, max_poll_interval:float=50e-3) -> dict:
+        '''
+        Block until the acquisition armed by single() has triggered and the
+        scope has stopped, i.e. the waveform memory is ready to be read.
+
+        Where the transport supports service requests (pyvisa wait_for_srq)
+        the Operation Complete bit is routed to the status byte
+        (*ESE 1, *SRE 32, *OPC; the previous enables are restored after)
+        and the call first sleeps on the SRQ line.
+        *OPC completes once :SINGle has been processed, not at the trigger,
+        so the SRQ only replaces the wait for the scope to arm; the trigger
+        and the final STOP are still confirmed with :TRIGger:STATus?.
+        Transports that turn out not to support service requests fall back
+        to polling (and are not tried again).
+        Otherwise :TRIGger:STATus? is polled with an exponential backoff,
+        starting at poll_interval and capped at max_poll_interval. The
+        interval drops back to poll_interval once TD is seen so the
+        TD -> STOP transition is caught quickly.
+
+        Args:
+            timeout (float): deadline in seconds
+            use_srq (bool): force (True) or disable (False) the SRQ path;
+                None tries SRQ whenever the transport may provide it
+            poll_interval (float): first polling interval in seconds
+            max_poll_interval (float): polling interval ceiling in seconds
+
+        Returns: dict
+            'method'  'srq' or 'poll'
+            'polls'   number of :TRIGger:STATus? queries sent
+            'elapsed' seconds from the call until the scope was ready
+            'latency' seconds from the trigger being seen until ready
+                      (an upper bound when TD was never observed)
+
+        Raises TimeoutError if the scope is not ready before the deadline.
+        '''
+        start = time.perf_counter()
+        deadline = start + timeout
+        if use_srq is None:
+            use_srq = self._srq_available() and self._wait_for_srq(deadline)
+        elif use_srq:
+            self._wait_for_srq(deadline, required=True)
+        if use_srq:
+            poller = self._poll_trigger(start, deadline, poll_interval, max_poll_interval, method='srq')
+        else:
+            poller = self._poll_trigger(start, deadline, poll_interval, max_poll_interval)
+        try:
+            while True:
+                time.sleep(next(poller))
+        except StopIteration as done:
+            return done.value
+
+    async def wait_for_trigger_async(self, timeout:float=10.0, use_srq:bool=None,
+                                     poll_interval:float=1e-3, max_poll_interval:float=50e-3) -> dict:
+        '''
+        Awaitable version of wait_for_trigger().
+
+        The polling path sleeps with asyncio.sleep so other tasks keep running
+        between status queries; the SRQ path waits in the default executor.
+        '''
+        if use_srq or (use_srq is None and self._srq_available()):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.wait_for_trigger, timeout, use_srq,
+                                              poll_interval, max_poll_interval)
+        start = time.perf_counter()
+        poller = self._poll_trigger(start, start + timeout, poll_interval, max_poll_interval)
+        try:
+            while True:
+                await asyncio.sleep(next(poller))
+        except StopIteration as done:
+            return done.value
+
+    def _srq_available(self) -> bool:
+        ''' Whether the SRQ path is worth trying: not known to fail on this transport '''
+        return self._srq_supported is not False and hasattr(self.visa_resource, 'wait_for_srq')
+
+    def _wait_for_srq(self, deadline:float, required:bool=False) -> bool:
+        '''
+        Arm the OPC -> ESB -> SRQ chain and sleep until the service request.
+        The caller's *ESE and *SRE enable registers are restored afterwards.
+
+        Returns False (and remembers it) when the transport does not
+        support service requests, unless required, in which case the
+        error is raised. Raises TimeoutError if the request does not come
+        before the deadline.
+        '''
+        if not self._srq_available():
+            if required:
+                raise NotImplementedError('the transport does not support service requests')
+            return False
+        ese, sre = self.ese, self.sre
+        self.cls()
+        try:
+            self.ese = 1    # OPC  -> ESB (bit 5 of the status byte)
+            self.sre = 32   # ESB  -> SRQ
+            self.visa.write('*OPC')
+            timeout_ms = max(1, int((deadline - time.perf_counter()) * 1000))
+            try:
+                self.visa_resource.wait_for_srq(timeout_ms)
+            except _visa.VisaIOError as e:
+                if e.error_code == _visa.constants.StatusCode.error_timeout:
+                    raise TimeoutError(f'no service request within {timeout_ms} ms')
+                if required:
+                    raise
+                self._srq_supported = False
+                return False
+            except NotImplementedError:
+                if required:
+                    raise
+                self._srq_supported = False
+                return False
+            self._srq_supported = True
+            self.esr() # clear the event register for the next capture
+            return True
+        finally:
+            self.ese = ese
+            self.sre = sre
+
+    def _poll_trigger(self, start:float, deadline:float, poll_interval:float,
+                      max_poll_interval:float, method:str='poll'):
+        '''
+        Generator behind wait_for_trigger(): queries :TRIGger:STATus?, yields
+        the next sleep interval and returns the result dict once STOP is seen.
+        '''
+        polls = 0
+        triggered = None
+        interval = poll_interval
+        last_poll = start
+        while True:
+            status = self.trigger.status
+            polls += 1
+            now = time.perf_counter()
+            if status == TriggerStatus.STOP:
+                if triggered is None:
+                    triggered = last_poll
+                return {
+                    'method': method,
+                    'polls': polls,
+                    'elapsed': now - start,
+                    'latency': now - triggered,
+                }
+            if status == TriggerStatus.WAIT:
+                triggered = None # re-armed since TD was seen
+            elif status == TriggerStatus.TRIGGERED and triggered is None:
+                triggered = now
+                interval = poll_interval
+            if now >= deadline:
+                raise TimeoutError(f'trigger status still {status} after {now - start:.3f} s')
+            last_poll = now
+            yield min(interval, deadline - now)
+            interval = min(2*interval, max_poll_interval)
+
 
     # IEEE 488.2
     def cls(self):
@@ -98,7 +287,7 @@ class Rigol_ds1000z:
         the range of <value> are the decimal numbers corresponding to 
         the binary numbers X0XXXX0X (X is 1 or 0).
         '''
-        return self.visa.ask('*ESE?')
+        return int(self.visa.query('*ESE?'))
     @ese.setter
     def ese(self, val:int):
         self.visa.write(f'*ESE {val}')
@@ -108,14 +297,14 @@ class Rigol_ds1000z:
         (IEEE 488.2)
         Query and clear the event register for the standard event status register.
         '''
-        return self.visa.ask('*ESR?')
+        return int(self.visa.query('*ESR?'))
 
     def idn(self) -> str:
         '''
         (IEEE 488.2)
         Query the ID string of the instrument.
         '''
-        return self.visa.ask('*IDN?')
+        return self.visa.query('*IDN?').strip()
 
     @property
     def opc(self) -> int:
@@ -125,9 +314,9 @@ class Rigol_ds1000z:
         event status register to 1 after the current operation is finished. The *OPC? command is
         used to query whether the current operation is finished.
         '''
-        return self.visa.ask('*OPC?')
+        return int(self.visa.query('*OPC?'))
     @opc.setter
-    def ese(self):
+    def opc(self, val:int=1):
         self.visa.write('*OPC')
 
     def rst(self):
@@ -143,8 +332,8 @@ class Rigol_ds1000z:
         (IEEE 488.2)
         Set or query the enable register for the status byte register set.
         '''
-        return self.visa.ask('*SRE?')
-    @opc.setter
+        return int(self.visa.query('*SRE?'))
+    @sre.setter
     def sre(self, val:int):
         self.visa.write(f'*SRE {val}')
 
@@ -158,14 +347,14 @@ class Rigol_ds1000z:
         The query returns the decimal numbers corresponding to the binary numbers X0XXXX0X
         (X is 1 or 0).
         '''
-        return self.visa.ask('*STB?')
+        return int(self.visa.query('*STB?'))
     
     def tst(self) -> int:
         '''
         (IEEE 488.2) 
         Perform a self-test and then return the seilf-test results.
         '''
-        return self.visa.ask('*TST?')
+        return int(self.visa.query('*TST?'))
 
     def wai(self):
         '''
@@ -1,8 +1,18 @@
 from .rigol_visa import Rigol_visa
+from .rigol_ds1000z_scpi import Rigol_scpi_Subsystem, scpi_property
 from .rigol_ds1000z_constants import MemoryDepth, AcquisitionMode
 import math
 
-class Rigol_ds1000z_Acquire:
+def memory_depths(num_channels:int) -> list:
+    '''
+    Memory depths (points, ascending) allowed with num_channels analog channels
+    enabled, from the MemoryDepth table (3 channels use the 4 channel depths).
+    '''
+    group = f'Analog_{4 if num_channels > 2 else max(num_channels, 1)}Chan_'
+    return sorted(int(depth.value) for name, depth in MemoryDepth.__members__.items() if name.startswith(group))
+
+
+class Rigol_ds1000z_Acquire(Rigol_scpi_Subsystem):
     def __init__(self, visa_resource):
         self.visa_resource = visa_resource
         self.visa = Rigol_visa(visa_resource)
@@ -23,21 +33,16 @@ class Rigol_ds1000z_Acquire:
         self.visa.write(f':acq:averages {averages}')
         return
 
-    @property
-    def type(self) -> str:
+    @scpi_property(':ACQuire:TYPE', enum=AcquisitionMode)
+    def type(self):
         '''
         Set or query the acquisition mode of the oscilloscope.
 
         mode = {NORMal|AVERages|PEAK|HRESolution}
         '''
-        return self.visa.query(':acq:type?')
-    @type.setter
-    def type(self, mode:AcquisitionMode):
-        self.visa.write(f':acq:type {mode}')
 
-
-    @property
-    def sample_rate(self) -> int:
+    @scpi_property(':ACQuire:SRATe', int, readonly=True, volatile=True)
+    def sample_rate(self):
         '''
         Query the current sample rate. The default unit is Sa/s.
         
@@ -53,7 +58,6 @@ class Rigol_ds1000z_Acquire:
         
         Return Format: The query returns the sample rate (integer).
         '''
-        return int(float(self.visa.query(':acq:srat?')))
 
     @property
     def memory_depth(self):
@@ -84,29 +88,27 @@ class Rigol_ds1000z_Acquire:
         When AUTO is selected, the oscilloscope will select the memory depth automatically
         according to the current sample rate.
 
+        The memory depth can only be changed while the scope runs, so the setter
+        sends :RUN first. A depth not allowed for the channels currently
+        enabled falls back to AUTO.
+
         The query returns the actual number of points (integer) or AUTO.
         '''
-        md = self.visa.query(':acq:mdep?')
-        return int(md) if not md.startswith('AUTO') else md
+        md = self.visa.query(':acq:mdep?').strip()
+        return md if md.startswith('AUTO') else int(float(md))
     @memory_depth.setter
     def memory_depth(self, memory_depth:MemoryDepth):
-        num_enabled_chans = self._channels_enabled()
-        # Resort to AUTO if improper number of pts specified
-        if num_enabled_chans == 1:
-            if pts not in ('AUTO', '12000', '120000', '1200000', '12000000', '24000000'):
-                pts = 'AUTO'
-        elif num_enabled_chans == 2:
-            if pts not in ('AUTO', '6000', '60000', '600000', '6000000', '12000000'):
+        pts = str(memory_depth).strip().upper()
+        with self.visa.transaction():
+            # Resort to AUTO if improper number of pts specified
+            if pts != 'AUTO' and int(float(pts)) not in memory_depths(self._channels_enabled()):
                 pts = 'AUTO'
-        elif num_enabled_chans in (3, 4):
-            if pts not in ('AUTO', '3000', '30000', '300000', '3000000', '6000000'):
-                pts = 'AUTO'
-        self.run()
-        self.visa.write(f':acq:mdep {pts}')
-
+            if pts != 'AUTO':
+                pts = int(float(pts))
+            self.visa.write(':run')
+            self.visa.write(f':acq:mdep {pts}')
 
     def _channels_enabled(self) -> int:
-        channels_enabled = 0
-        for chan in ['CHAN1', 'CHAN2', 'CHAN3', 'CHAN4']:
-            channels_enable += self.visa.query(f':{chan}:DISPplay?')
-        return channels_enabled
+        ''' Number of analog channels displayed '''
+        replies = self.visa.query_many([f':CHAN{chan}:DISPlay?' for chan in range(1, 5)])
+        return sum(int(float(reply)) for reply in replies)
@@ -0,0 +1,272 @@
+from .rigol_ds1000z_constants import WaveSource
+from .rigol_ds1000z_wave import Rigol_ds1000z_Wave
+from .rigol_ds1000z_capture import Rigol_ds1000z_Capture, Rigol_ds1000z_CaptureWriter, save_capture
+import numpy as np
+import math
+
+'''
+Alignment of captures taken by several scopes on the same event.
+
+The trigger of each scope fires at a slightly different time, so the
+captures' time axes (relative to their own trigger) are offset. Every
+scope records a shared reference signal; the delay of each capture to the
+first one is where the cross-correlation of their reference channels peaks:
+
+    coarse  both reference channels block-averaged to at most coarse_points
+            points on a common grid, correlated over every lag with FFTs
+    fine    a fine_points window of full rate samples, where the reference
+            is most active, correlated over the few lags around the coarse
+            peak; the peak is then interpolated between lags (parabola)
+            and the fine pass repeated at that delay
+
+so the cost does not grow with the square of the memory depth. merge()
+then resamples every channel of every capture on one time grid, with the
+delays removed, into a new capture file.
+
+Delays are in s: an event at time t of the first capture is at time
+t + delays[i] of capture i.
+'''
+
+_CHUNK_POINTS = 1 << 20
+
+
+def _axis(capture, name:str) -> tuple:
+    ''' (time of point 0 relative to the trigger, xincrement, points) of channel name '''
+    preamble = capture.preamble(name)
+    position = capture.settings.get('trigger', {}).get('position')
+    xinc = preamble['xincrement']
+    return -Rigol_ds1000z_Wave._trigger_index(preamble, position) * xinc, xinc, capture.points(name)
+
+
+def _decimate(capture, name:str, factor:int) -> np.ndarray:
+    ''' Means of blocks of factor points of channel name, in volts '''
+    preamble = capture.preamble(name)
+    points = capture.points(name) // factor * factor
+    chunk = max(_CHUNK_POINTS // factor, 1) * factor
+    means = []
+    for start in range(0, points, chunk):
+        codes = capture.codes(name, start, min(start + chunk, points))
+        means.append(codes.reshape(-1, factor).mean(axis=1))
+    codes = np.concatenate(means) if means else np.zeros(0)
+    return (codes - preamble['yorigin'] - preamble['yreference']) * preamble['yincrement']
+
+
+def _resample(capture, name:str, times:np.ndarray) -> np.ndarray:
+    ''' Codes of channel name linearly interpolated at times (s, its own time axis; clamped to the memory) '''
+    t0, xinc, points = _axis(capture, name)
+    positions = (times - t0) / xinc
+    np.clip(positions, 0, points - 1, out=positions)
+    first = int(positions[0])
+    last = min(int(math.ceil(positions[-1])) + 2, points)
+    codes = capture.codes(name, first, last).astype(np.float32)
+    positions -= first
+    index = positions.astype(np.intp)
+    np.minimum(index, max(len(codes) - 2, 0), out=index)
+    fraction = (positions - index).astype(np.float32)
+    before, after = codes[index], codes[np.minimum(index + 1, len(codes) - 1)]
+    after -= before
+    after *= fraction
+    after += before
+    return after
+
+
+def _correlate(a:np.ndarray, b:np.ndarray) -> np.ndarray:
+    '''
+    Full cross-correlation of b against a by FFT: element k is
+    sum(a[j] * b[j + k - len(a) + 1]), i.e. lags -(len(a)-1) .. len(b)-1.
+    '''
+    size = 1 << (len(a) + len(b) - 2).bit_length()
+    correlation = np.fft.irfft(np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size), size)
+    return np.concatenate((correlation[size - len(a) + 1:], correlation[:len(b)]))
+
+
+def _peak(correlation:np.ndarray, first:int=0, last:int=None) -> float:
+    ''' Index of the maximum of correlation[first:last], refined between samples by a parabola '''
+    last = len(correlation) if last is None else last
+    k = first + int(np.argmax(correlation[first:last]))
+    if 0 < k < len(correlation) - 1:
+        left, centre, right = correlation[k - 1:k + 2]
+        curvature = left - 2 * centre + right
+        if curvature < 0:
+            return k + 0.5 * (left - right) / curvature
+    return float(k)
+
+
+class Rigol_ds1000z_Alignment:
+    '''
+    Delays between captures of several scopes, and their merge on one time
+    base (see the module notes).
+
+    example:
+        # both scopes triggered on the same event and stopped; CHAN1 of each sees the reference
+        alignment = Rigol_ds1000z_Alignment.from_scopes([dso_a, dso_b], ['a.rgc', 'b.rgc'],
+            sources=[WaveSource.CHAN1, WaveSource.CHAN2, WaveSource.CHAN3, WaveSource.CHAN4])
+        print(alignment.delays, alignment.correlation)
+        merged = alignment.merge('merged.rgc')   # channels S1.CHAN1 .. S2.CHAN4
+        v = merged.volts('S2.CHAN3')
+    '''
+
+    def __init__(self, captures:list, reference='CHAN1', coarse_points:int=1 << 16,
+                 fine_points:int=1 << 16, max_delay:float=None):
+        '''
+        Args:
+            captures (list): captures (Rigol_ds1000z_Capture), one per scope;
+                the first one is the time reference
+            reference (str or list): reference channel name, or one name per capture
+            coarse_points (int): points per capture of the coarse correlation
+            fine_points (int): full rate points of the fine correlation
+            max_delay (float): largest delay searched, s; None searches every overlap
+        '''
+        if len(captures) < 2:
+            raise ValueError('alignment needs at least two captures')
+        self.captures = list(captures)
+        self.reference = [str(reference)] * len(captures) if isinstance(reference, str) else [str(r) for r in reference]
+        self.coarse_points = coarse_points
+        self.fine_points = fine_points
+        self.max_delay = max_delay
+        self.delays = [0.0]
+        self.correlation = [1.0]
+        for i in range(1, len(captures)):
+            delay, correlation = self._estimate(i)
+            self.delays.append(delay)
+            self.correlation.append(correlation)
+
+    @classmethod
+    def from_scopes(cls, scopes:list, filenames:list, sources=(WaveSource.CHAN1,),
+                    reference=WaveSource.CHAN1, **kwargs) -> 'Rigol_ds1000z_Alignment':
+        '''
+        Save the current acquisition of sources of every scope (see
+        save_capture; the scopes are stopped) and align the captures.
+
+        Args:
+            scopes (list): Rigol_ds1000z instances, the first one is the time reference
+            filenames (list): capture file of each scope
+            sources (list of WaveSource): sources to save from every scope, including reference
+            reference (WaveSource): shared reference channel
+            kwargs: passed to Rigol_ds1000z_Alignment
+        '''
+        for dso, filename in zip(scopes, filenames):
+            save_capture(dso, filename, sources)
+        return cls([Rigol_ds1000z_Capture(filename) for filename in filenames], reference, **kwargs)
+
+    def _estimate(self, i:int) -> tuple:
+        ''' (delay s, normalized correlation) of capture i to capture 0 '''
+        ref, other = self.captures[0], self.captures[i]
+        ref_name, other_name = self.reference[0], self.reference[i]
+        t0_ref, xinc_ref, points_ref = _axis(ref, ref_name)
+        t0_other, xinc_other, points_other = _axis(other, other_name)
+
+        # coarse: block means on a common grid of step `step`
+        widest = max(points_ref * xinc_ref, points_other * xinc_other)
+        step = max(xinc_ref, xinc_other) * max(math.ceil(widest / max(xinc_ref, xinc_other) / self.coarse_points), 1)
+        coarse = []
+        for capture, name, t0, xinc, points in ((ref, ref_name, t0_ref, xinc_ref, points_ref),
+                                                (other, other_name, t0_other, xinc_other, points_other)):
+            factor = max(int(round(step / xinc)), 1)
+            means = _decimate(capture, name, factor)
+            times = t0 + (np.arange(len(means)) * factor + (factor - 1) / 2) * xinc
+            grid = times[0] + np.arange(int((times[-1] - times[0]) / step) + 1) * step
+            values = np.interp(grid, times, means)
+            coarse.append((grid[0], values - values.mean()))
+        (start_ref, coarse_ref), (start_other, coarse_other) = coarse
+        correlation = _correlate(coarse_ref, coarse_other)
+        # element k: lag k - len(coarse_ref) + 1 coarse steps, delay start_other - start_ref + lag * step
+        delays = start_other - start_ref + (np.arange(len(correlation)) - len(coarse_ref) + 1) * step
+        first, last = 0, len(correlation)
+        if self.max_delay is not None:
+            first, last = np.searchsorted(delays, (-self.max_delay, self.max_delay), 'right')
+            first = max(first - 1, 0)
+            if first >= last:
+                raise ValueError(f'no lag within max_delay {self.max_delay} s')
+        delay = start_other - start_ref + (_peak(correlation, first, last) - len(coarse_ref) + 1) * step
+
+        # fine window of the reference: where it changes most, over fine_points samples
+        span = min(self.fine_points, points_ref)
+        width = max(int(span * xinc_ref / step), 1)
+        activity = np.convolve(np.abs(np.diff(coarse_ref, prepend=coarse_ref[0])), np.ones(width), 'same')
+        centre = start_ref + int(np.argmax(activity)) * step
+        first = min(max(int(round((centre - t0_ref) / xinc_ref)) - span // 2, 0), points_ref - span)
+        window = ref.codes(ref_name, first, first + span).astype(np.float64)
+        window -= window.mean()
+        times = t0_ref + np.arange(first, first + span) * xinc_ref
+
+        # fine: lags around the coarse delay in reference samples, twice
+        # (the second pass removes most of the parabola's bias)
+        radius = int(math.ceil(step / xinc_ref)) + 2
+        for radius in (radius, 2):
+            lags = np.arange(-radius, span + radius) * xinc_ref
+            shifted = _resample(other, other_name, times[0] + lags + delay).astype(np.float64)
+            shifted -= shifted.mean()
+            fine = _correlate(window, shifted)[span - 1:span + 2 * radius]
+            delay += (_peak(fine) - radius) * xinc_ref
+        aligned = _resample(other, other_name, times + delay).astype(np.float64)
+        aligned -= aligned.mean()
+        norm = math.sqrt(np.dot(window, window) * np.dot(aligned, aligned))
+        return float(delay), float(np.dot(window, aligned) / norm) if norm else 0.0
+
+    def label(self, i:int, name:str) -> str:
+        ''' Name of channel name of capture i in the merged capture '''
+        return f'S{i + 1}.{name}'
+
+    def span(self, channels:list=None) -> tuple:
+        '''
+        (t_start, t_stop) s, on the time axis of the first capture, covered
+        by every channel ((capture index, channel name) pairs; all by default)
+        '''
+        if channels is None:
+            channels = [(i, name) for i, capture in enumerate(self.captures) for name in capture.channels]
+        start, stop = -math.inf, math.inf
+        for i, name in channels:
+            t0, xinc, points = _axis(self.captures[i], name)
+            start = max(start, t0 - self.delays[i])
+            stop = min(stop, t0 - self.delays[i] + (points - 1) * xinc)
+        return start, stop
+
+    def merge(self, filename:str, channels:list=None, xincrement:float=None,
+              t_start:float=None, t_stop:float=None, **kwargs) -> Rigol_ds1000z_Capture:
+        '''
+        Resample channels of every capture on one time grid, delays
+        removed, and write them to a new capture file, a chunk at a time.
+        Codes are stored as float32 (linear interpolation falls between
+        codes) with each channel's preamble, adjusted to the new grid.
+
+        Args:
+            filename (str): merged capture file to create
+            channels (list): (capture index, channel name) pairs; all by default
+            xincrement (float): grid step, s; the finest of the captures by default
+            t_start, t_stop (float): grid span, s on the first capture's time
+                axis; span() by default
+            kwargs: passed to Rigol_ds1000z_CaptureWriter (chunk_points, compress, level);
+                not compressed by default, float32 codes compress poorly and slowly
+
+        Returns: Rigol_ds1000z_Capture of filename; channel names from label()
+        '''
+        kwargs.setdefault('compress', False)
+        if channels is None:
+            channels = [(i, name) for i, capture in enumerate(self.captures) for name in capture.channels]
+        if xincrement is None:
+            xincrement = min(self.captures[i].preamble(name)['xincrement'] for i, name in channels)
+        start, stop = self.span(channels)
+        t_start = start if t_start is None else t_start
+        t_stop = stop if t_stop is None else t_stop
+        if t_stop <= t_start:
+            raise ValueError(f'the captures do not overlap ({t_start} s to {t_stop} s)')
+        points = int((t_stop - t_start) / xincrement) + 1
+        settings = {'alignment': {
+            'reference': self.reference,
+            'delays': self.delays,
+            'correlation': self.correlation,
+        }}
+        idn = '; '.join(getattr(capture, 'idn', '') for capture in self.captures)
+
+        def blocks(i:int, name:str):
+            for first in range(0, points, _CHUNK_POINTS):
+                times = t_start + np.arange(first, min(first + _CHUNK_POINTS, points)) * xincrement
+                yield _resample(self.captures[i], name, times + self.delays[i])
+
+        with Rigol_ds1000z_CaptureWriter(filename, settings, idn, **kwargs) as writer:
+            for i, name in channels:
+                preamble = dict(self.captures[i].preamble(name), xincrement=xincrement,
+                                xorigin=t_start, points=points)
+                writer.add_channel(self.label(i, name), blocks(i, name), preamble)
+        return Rigol_ds1000z_Capture(filename)
@@ -0,0 +1,285 @@
+from .rigol_ds1000z_capture import Rigol_ds1000z_Capture, _CaptureEdges
+from concurrent.futures import ProcessPoolExecutor
+import concurrent.futures as _futures
+from multiprocessing import shared_memory
+from collections import deque
+import numpy as np
+import os
+import queue
+import threading
+
+'''
+Parallel post-processing of captures.
+
+Captures are handed to the worker processes as a shared memory block (in
+memory captures, e.g. segments) or as the path of a capture container
+(memory mapped by the worker); sample arrays are never pickled. Every
+registered analyzer is called with a capture object offering the
+Rigol_ds1000z_Capture interface (channels, preamble(), points(), codes(),
+volts(), time(), and the memoized edges()/thresholds()) and its return
+value is sent back.
+'''
+
+class _SharedCapture(_CaptureEdges):
+    '''
+    Rigol_ds1000z_Capture look-alike over the shared memory block of one
+    submitted capture (worker side).
+    '''
+
+    def __init__(self, shm_name:str, layout:dict, preambles:dict, meta=None):
+        self._shm = shared_memory.SharedMemory(shm_name)
+        self._layout = layout
+        self._preambles = preambles
+        self.meta = meta
+        self.settings = {}
+        self.cache_key = shm_name
+
+    @property
+    def channels(self) -> list:
+        return list(self._layout)
+
+    def preamble(self, name:str) -> dict:
+        return self._preambles.get(name, {})
+
+    def points(self, name:str) -> int:
+        return self._layout[name][2]
+
+    def codes(self, name:str, start:int=0, stop:int=None) -> np.ndarray:
+        offset, dtype, points = self._layout[name]
+        codes = np.frombuffer(self._shm.buf, np.dtype(dtype), points, offset)
+        return codes[start:stop]
+
+    def volts(self, name:str, start:int=0, stop:int=None) -> np.ndarray:
+        preamble = self.preamble(name)
+        codes = self.codes(name, start, stop)
+        return (codes - preamble['yorigin'] - preamble['yreference']) * preamble['yincrement']
+
+    def time(self, name:str, start:int=0, stop:int=None) -> np.ndarray:
+        start, stop, _ = slice(start, stop).indices(self.points(name))
+        return np.arange(start, stop) * self.preamble(name)['xincrement']
+
+    def close(self):
+        try:
+            self._shm.close()
+        except BufferError:
+            pass # an analyzer kept a view; released with it
+
+
+def _analyze(analyzers:dict, source, meta) -> dict:
+    ''' Worker: run every analyzer on one capture '''
+    if isinstance(source, str):
+        capture = Rigol_ds1000z_Capture(source)
+        capture.meta = meta
+    else:
+        capture = _SharedCapture(*source, meta)
+    try:
+        return {name: analyzer(capture) for name, analyzer in analyzers.items()}
+    finally:
+        capture.close()
+
+
+class Rigol_ds1000z_AnalysisPool:
+    '''
+    Process pool running user-registered analyzers on every submitted capture.
+
+    submit() copies the capture into shared memory and returns immediately;
+    results come back in submission order from get()/results(). At most
+    max_pending captures may be submitted and not yet collected: further
+    submits block (or raise queue.Full with block=False), which is the
+    backpressure that keeps memory bounded. Run the submitting side on the
+    consumer thread of Rigol_ds1000z_Segmented so the acquisition thread
+    never waits on it (a full pool shows up as ring buffer overruns), and
+    collect on another thread (or pass on_result) so a blocked submit can
+    always make progress.
+
+    Analyzers must be picklable (module level functions) and take one
+    capture argument.
+
+    example:
+        def rms(capture):
+            return float(np.sqrt(np.mean(capture.volts('CHAN1')**2)))
+
+        with Rigol_ds1000z_AnalysisPool(on_result=print) as pool:
+            pool.register('rms', rms)
+            engine.start(consumer=pool.submit_segment)
+            ...
+            engine.stop()
+    '''
+
+    def __init__(self, processes:int=None, max_pending:int=None, on_result=None):
+        '''
+        Args:
+            processes (int): worker processes, None for one per CPU
+            max_pending (int): captures submitted but not collected before
+                submit() blocks; defaults to twice the number of workers
+            on_result (callable): if given, a collector thread calls
+                on_result(result) for every get() result, in order; the
+                result of a capture whose analyzer raised has 'results'
+                None and the exception under 'error'
+        '''
+        processes = processes or os.cpu_count()
+        self.analyzers = {}
+        self.max_pending = max_pending or 2 * processes
+        self._executor = ProcessPoolExecutor(processes)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = deque()
+        self._available = threading.Condition()
+        self._submitted = 0
+        self._closing = threading.Event()
+        self.on_result = on_result
+        self._collector = None
+        if on_result is not None:
+            self._collector = threading.Thread(target=self._collect, daemon=True)
+            self._collector.start()
+
+    def register(self, name:str, analyzer):
+        ''' Run analyzer(capture) on every capture submitted from now on '''
+        self.analyzers[name] = analyzer
+
+    def unregister(self, name:str):
+        self.analyzers.pop(name, None)
+
+    def _acquire_slot(self, block:bool, timeout:float):
+        if not self._slots.acquire(block, timeout):
+            raise queue.Full('analysis pool: max_pending captures not collected yet')
+
+    def _queue(self, future, meta):
+        with self._available:
+            index = self._submitted
+            self._submitted += 1
+            self._pending.append((index, meta, future))
+            self._available.notify()
+        return index
+
+    def submit(self, data:dict, preambles:dict=None, meta=None,
+               block:bool=True, timeout:float=None) -> int:
+        '''
+        Queue one capture for analysis.
+
+        Args:
+            data (dict): {channel name: numpy codes (or volts) array}
+            preambles (dict): {channel name: preamble dict}, for volts()/time()
+            meta: anything picklable, returned with the result and
+                available to analyzers as capture.meta
+            block (bool), timeout (float): wait for a free slot; raise
+                queue.Full if none frees up
+
+        Returns: capture number (the order results come back in)
+        '''
+        self._acquire_slot(block, timeout)
+        shm = None
+        try:
+            arrays = {str(name): np.ascontiguousarray(codes) for name, codes in data.items()}
+            shm = shared_memory.SharedMemory(create=True, size=max(1, sum(a.nbytes for a in arrays.values())))
+            layout, offset = {}, 0
+            for name, codes in arrays.items():
+                np.frombuffer(shm.buf, codes.dtype, len(codes), offset)[:] = codes
+                layout[name] = (offset, codes.dtype.str, len(codes))
+                offset += codes.nbytes
+            source = (shm.name, layout, {str(k): v for k, v in (preambles or {}).items()})
+            future = self._executor.submit(_analyze, dict(self.analyzers), source, meta)
+        except BaseException:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _, shm=shm: (shm.close(), shm.unlink()))
+        return self._queue(future, meta)
+
+    def submit_segment(self, segment:dict, block:bool=True, timeout:float=None) -> int:
+        ''' submit() a Rigol_ds1000z_Segmented segment; usable as its consumer '''
+        meta = {key: segment[key] for key in ('index', 'time', 'start')}
+        return self.submit(segment['data'], segment['preamble'], meta, block, timeout)
+
+    def submit_file(self, filename:str, meta=None, block:bool=True, timeout:float=None) -> int:
+        ''' Queue a capture container (see rigol_ds1000z_capture) for analysis '''
+        self._acquire_slot(block, timeout)
+        try:
+            future = self._executor.submit(_analyze, dict(self.analyzers), os.fspath(filename), meta)
+        except BaseException:
+            self._slots.release()
+            raise
+        return self._queue(future, meta)
+
+    def get(self, timeout:float=None) -> dict:
+        '''
+        Result of the oldest uncollected capture, waiting for it if needed.
+        An exception raised by an analyzer is re-raised here, once: the
+        capture counts as collected and the next get() moves on.
+
+        Returns: {'index': capture number, 'meta': meta, 'results': {analyzer name: result}}
+        Raises: queue.Empty if nothing was submitted or finished within timeout
+        '''
+        result = self._get(timeout)
+        if 'error' in result:
+            raise result['error']
+        return result
+
+    def _get(self, timeout:float) -> dict:
+        ''' get(), with an analyzer exception returned under 'error' '''
+        with self._available:
+            if not self._available.wait_for(lambda: self._pending, timeout):
+                raise queue.Empty
+            index, meta, future = self._pending[0]
+        results, error = None, None
+        try:
+            results = future.result(timeout)
+        except _futures.TimeoutError as exc:
+            # not the builtin TimeoutError before Python 3.11; an analyzer may raise it too
+            if not future.done() or future.exception() is not exc:
+                raise queue.Empty from None
+            error = exc
+        except Exception as exc: # raised by an analyzer, or cancelled
+            error = exc
+        self._collected(future)
+        if error is not None:
+            return {'index': index, 'meta': meta, 'results': None, 'error': error}
+        return {'index': index, 'meta': meta, 'results': results}
+
+    def _collected(self, future):
+        ''' Drop the entry of future from the pending queue and free its slot '''
+        with self._available:
+            if not self._pending or self._pending[0][2] is not future:
+                return # taken by a concurrent get()
+            self._pending.popleft()
+        self._slots.release()
+
+    def results(self, timeout:float=None):
+        ''' Yield get() results in order until none are pending '''
+        while self._pending:
+            yield self.get(timeout)
+
+    @property
+    def pending(self) -> int:
+        ''' Captures submitted and not collected yet '''
+        return len(self._pending)
+
+    def _collect(self):
+        while not (self._closing.is_set() and not self._pending):
+            try:
+                result = self._get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self.on_result(result)
+
+    def close(self, wait:bool=True):
+        '''
+        Shut the workers down. With wait=True the captures already submitted
+        are analyzed (and handed to on_result) first.
+        '''
+        self._closing.set()
+        if self._collector is not None and wait:
+            self._collector.join()
+        if not wait:
+            # shutdown(cancel_futures=True) needs Python 3.9
+            with self._available:
+                for _, _, future in self._pending:
+                    future.cancel()
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,219 @@
+from .rigol_ds1000z_constants import WaveSource, WaveMode
+from .rigol_ds1000z_wave import Rigol_ds1000z_Wave
+import numpy as np
+
+class Rigol_ds1000z_Accumulator:
+    '''
+    Host-side averaging of repeated RAW captures.
+
+    :ACQuire:AVERages averages at most 1024 (a power of two) screen
+    resolution waveforms. The accumulator instead folds any number of full
+    memory depth captures into buffers allocated once, in place, block by
+    block as they download, so memory stays constant however many captures
+    are added:
+
+        mean         running sum of the codes (int32, or float64) divided by
+                     the number of captures at read time
+        exponential  exponential moving average with weight alpha (float64),
+                     bias corrected for the first captures
+        envelope     peak hold: lowest and highest code seen at each point
+
+    Captures are aligned on the trigger: the first one sets the reference
+    trigger index and later ones are shifted by the difference of their
+    :TRIGger:POSition? to it. Points a shifted capture does not cover are
+    left out of the averages there.
+
+    example:
+        acc = Rigol_ds1000z_Accumulator(exponential=0.01, envelope=True)
+        acc.capture(dso, 1000, WaveSource.CHAN1)
+        t, v = acc.time(), acc.volts(acc.mean())
+        low, high = (acc.volts(codes) for codes in acc.envelope())
+    '''
+
+    def __init__(self, points:int=None, mean:bool=True, exponential:float=None,
+                 envelope:bool=False, dtype=np.int32, max_shift:int=None):
+        '''
+        Args:
+            points (int): memory points per capture; None takes the length of the first capture
+            mean (bool): keep the running sum for mean()
+            exponential (float): alpha of the exponential average (0 < alpha <= 1), None to disable
+            envelope (bool): keep the peak hold envelope
+            dtype: np.int32 (exact, up to 8.4M captures of BYTE codes) or np.float64
+            max_shift (int): captures whose trigger is more than max_shift
+                points away from the reference are rejected; None accepts all
+        '''
+        if exponential is not None and not 0 < exponential <= 1:
+            raise ValueError(f'exponential alpha {exponential} is not in (0, 1]')
+        self.points = points
+        self.alpha = exponential
+        self.dtype = np.dtype(dtype)
+        self.max_shift = max_shift
+        self._keep = {'mean': mean, 'exponential': exponential is not None, 'envelope': envelope}
+        self.preamble = None
+        self.reference = None
+        self.captures = 0
+        self.rejected = 0
+        self._buffers = None
+
+    def _allocate(self, points:int):
+        self.points = points
+        self._buffers = {
+            'sum': np.zeros(points, self.dtype) if self._keep['mean'] else None,
+            'ema': np.zeros(points, np.float64) if self._keep['exponential'] else None,
+            'scratch': np.empty(points, np.float64) if self._keep['exponential'] else None,
+            'low': np.full(points, 255, np.uint8) if self._keep['envelope'] else None,
+            'high': np.zeros(points, np.uint8) if self._keep['envelope'] else None,
+        }
+        # {(first, stop): captures} of the buffer ranges covered, for the
+        # per point counts (a few entries, whatever the number of captures)
+        self._coverage = {}
+
+    def reset(self):
+        ''' Forget all captures (and the reference trigger), keeping the buffers '''
+        if self._buffers is not None:
+            for name, buffer in self._buffers.items():
+                if buffer is not None and name != 'scratch':
+                    buffer.fill(255 if name == 'low' else 0)
+            self._coverage = {}
+        self.reference = None
+        self.captures = 0
+        self.rejected = 0
+
+    def _shift(self, trigger_index:float) -> int:
+        ''' Points the capture is shifted by, or None if it is rejected '''
+        if trigger_index is None:
+            return 0
+        trigger_index = int(round(trigger_index))
+        if self.reference is None:
+            self.reference = trigger_index
+        shift = trigger_index - self.reference
+        if self.max_shift is not None and abs(shift) > self.max_shift:
+            return None
+        return shift
+
+    def _accumulate(self, codes:np.ndarray, shift:int, offset:int=0):
+        ''' Fold codes (memory points offset.., shifted by shift) into the buffers '''
+        if self._buffers is None:
+            self._allocate(self.points or offset + len(codes))
+        first = offset - shift
+        lo, hi = max(first, 0), min(first + len(codes), self.points)
+        if lo >= hi:
+            return
+        codes = codes[lo - first:hi - first]
+        buffers = self._buffers
+        if buffers['sum'] is not None:
+            np.add(buffers['sum'][lo:hi], codes, out=buffers['sum'][lo:hi], casting='unsafe')
+        if buffers['ema'] is not None:
+            ema, scratch = buffers['ema'][lo:hi], buffers['scratch'][:hi - lo]
+            np.subtract(codes, ema, out=scratch)
+            scratch *= self.alpha
+            ema += scratch
+        if buffers['low'] is not None:
+            np.minimum(buffers['low'][lo:hi], codes, out=buffers['low'][lo:hi])
+            np.maximum(buffers['high'][lo:hi], codes, out=buffers['high'][lo:hi])
+        self._coverage[lo, hi] = self._coverage.get((lo, hi), 0) + 1
+
+    def add(self, codes:np.ndarray, trigger_index:float=None, offset:int=0,
+            preamble:dict=None) -> bool:
+        '''
+        Add one capture.
+
+        Args:
+            codes: uint8 codes of the capture
+            trigger_index (float): 0-based memory index of its trigger (see
+                Rigol_ds1000z_Wave._trigger_index); None adds it unaligned
+            offset (int): memory index of codes[0] (for windowed downloads)
+            preamble (dict): preamble of the capture, kept for volts() and time()
+
+        Returns: False if the capture was rejected (see max_shift)
+        '''
+        if preamble is not None and self.preamble is None:
+            self.preamble = preamble
+        shift = self._shift(trigger_index)
+        if shift is None:
+            self.rejected += 1
+            return False
+        self._accumulate(codes, shift, offset)
+        self.captures += 1
+        return True
+
+    def capture(self, dso, count:int, source:WaveSource=WaveSource.CHAN1,
+                trigger_timeout:float=10.0, progress=None) -> int:
+        '''
+        Run count single() -> wait -> download cycles of the full RAW memory
+        of source and add them. Each block is folded in as it arrives.
+
+        Args:
+            dso (Rigol_ds1000z): scope
+            count (int): captures to add
+            source (WaveSource): channel to average
+            trigger_timeout (float): seconds to wait for each trigger
+            progress (callable): called as progress(captures_done, count)
+
+        Returns: number of captures added (rejected ones not included)
+        '''
+        wave = dso.wave
+        added = 0
+        for done in range(count):
+            dso.single()
+            dso.wait_for_trigger(timeout=trigger_timeout)
+            with dso.transaction():
+                # other threads may have changed the wave setup since the last capture
+                wave._setup_read(source, WaveMode.RAW)
+                if self.preamble is None:
+                    self.preamble = wave.preamble
+                points = self.preamble['points']
+                position = int(wave.visa.query(':TRIGger:POSition?'))
+                shift = self._shift(Rigol_ds1000z_Wave._trigger_index(self.preamble, position))
+                if shift is None:
+                    self.rejected += 1
+                    continue
+                for start in range(1, points + 1, wave.block_pts):
+                    block = wave.read_range(start, min(start + wave.block_pts - 1, points))
+                    self._accumulate(block, shift, start - 1)
+                    wave.visa.checkpoint()
+            self.captures += 1
+            added += 1
+            if progress is not None:
+                progress(done + 1, count)
+        return added
+
+    def counts(self) -> np.ndarray:
+        ''' Number of captures that covered each point '''
+        counts = np.zeros(self.points + 1, np.int64)
+        for (lo, hi), n in self._coverage.items():
+            counts[lo] += n
+            counts[hi] -= n
+        return np.cumsum(counts[:-1])
+
+    def mean(self) -> np.ndarray:
+        ''' Mean code at each point (float64, NaN where no capture covered it) '''
+        if not self._keep['mean']:
+            raise ValueError('mean was not enabled')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._buffers['sum'] / self.counts()
+
+    def exponential(self) -> np.ndarray:
+        ''' Exponential average code at each point (float64, NaN where no capture covered it) '''
+        if not self._keep['exponential']:
+            raise ValueError('exponential average was not enabled')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._buffers['ema'] / (1 - (1 - self.alpha)**self.counts())
+
+    def envelope(self) -> tuple:
+        ''' (lowest, highest) code seen at each point '''
+        if not self._keep['envelope']:
+            raise ValueError('envelope was not enabled')
+        return self._buffers['low'].copy(), self._buffers['high'].copy()
+
+    def volts(self, codes:np.ndarray) -> np.ndarray:
+        ''' Codes scaled to volts with the preamble of the captures '''
+        preamble = self.preamble
+        return (np.asarray(codes, np.float64) - preamble['yorigin'] - preamble['yreference']) * preamble['yincrement']
+
+    def time(self) -> np.ndarray:
+        ''' Time of each point relative to the reference trigger, s '''
+        reference = self.reference
+        if reference is None:
+            reference = Rigol_ds1000z_Wave._trigger_index(self.preamble)
+        return (np.arange(self.points) - reference) * self.preamble['xincrement']
@@ -0,0 +1,272 @@
+from .rigol_ds1000z_constants import MeasureSources, Measurements, MeasureStatisticsType, \
+    StatisticsMode, WaveMode
+from .rigol_ds1000z_sinefit import gain_phase
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import numpy as np
+import math
+import os
+import time
+
+
+def _fit_codes(codes:np.ndarray, preambles:list, frequency:float=None) -> dict:
+    '''
+    gain_phase() of the BYTE codes of source_in/source_out (one row each).
+    Amplitudes are fitted on the codes and scaled to volts afterwards, so
+    only the uint8 codes travel to the pool workers.
+    '''
+    point = gain_phase(codes[0], codes[1], preambles[0]['xincrement'], frequency)
+    point['vin'] *= preambles[0]['yincrement']
+    point['vout'] *= preambles[1]['yincrement']
+    vin, vout = point['vin'], point['vout']
+    point['gain_db'] = 20*math.log10(vout / vin) if vin > 0 and vout > 0 else math.nan
+    return point
+
+
+class Rigol_ds1000z_Bode:
+    '''
+    Frequency response sweep engine.
+
+    For every frequency the generator callback sets the stimulus, the
+    measurement statistics are reset and then polled until their running
+    averages stop moving (instead of dwelling a fixed time). All per-point
+    results (VPP in, VPP out, rising delay, counter frequency and the
+    deviations) are read in a single compound query.
+
+    With method='waveform' the scope is stopped at each point, CH in/out
+    are read from the same acquisition and gain/phase come from a host-side
+    sine fit (rigol_ds1000z_sinefit) at the generator frequency instead of
+    the measurement engine. sweep() then only captures at each frequency;
+    each capture (its BYTE codes) is handed to a process pool as soon as
+    it is read and fitted while the next points are captured.
+
+    Each point is a dict:
+        'set_frequency'  frequency requested from the generator
+        'frequency'      frequency measured by the counter (or the fit)
+        'vin', 'vout'    amplitudes (VPP averages, or fitted peak amplitudes)
+        'delay'          rising edge delay out - in (scope method only)
+        'gain_db'        20*log10(vout/vin), NaN when a channel saw no signal
+        'phase_deg'      output phase relative to input; negative = lagging
+        'dwell'          seconds spent on the point
+        'polls'          statistic polls needed to converge
+
+    example:
+        def generator(f):
+            fgen.write(f'FREQ {f}')
+        bode = Rigol_ds1000z_Bode(dso, generator)
+        points = bode.sweep(np.logspace(2, 5, 31))
+    '''
+
+    def __init__(self, dso, generator=None,
+                 source_in:MeasureSources=MeasureSources.CHAN1,
+                 source_out:MeasureSources=MeasureSources.CHAN2,
+                 method:str='scope', rel_tol:float=2e-3, settle_polls:int=2,
+                 min_dwell:float=0.2, max_dwell:float=5.0, poll_interval:float=0.1,
+                 auto_timebase:bool=True, periods_on_screen:float=4,
+                 wave_mode:WaveMode=WaveMode.RAW, processes:int=None):
+        '''
+        Args:
+            dso (Rigol_ds1000z): scope
+            generator (callable): generator(frequency) sets the stimulus; None
+                if the stimulus is stepped by other means
+            source_in, source_out (MeasureSources): input and output channels
+            method (str): 'scope' (measurement statistics) or 'waveform' (sine fit)
+            rel_tol (float): relative change of every running average between
+                polls below which a point counts as settled
+            settle_polls (int): consecutive settled polls required
+            min_dwell, max_dwell (float): bounds on the time per point, s
+            poll_interval (float): time between statistic polls, s
+            auto_timebase (bool): rescale the timebase to show periods_on_screen periods
+            periods_on_screen (float): periods across the 12 horizontal divisions
+            wave_mode (WaveMode): waveform method: Raw (memory) or Normal (screen) points
+            processes (int): waveform method: fitting pool size, None for one
+                per CPU, 0 to fit in this process
+        '''
+        assert method in ('scope', 'waveform')
+        self._dso = dso
+        self.generator = generator
+        self.source_in = source_in
+        self.source_out = source_out
+        self.method = method
+        self.rel_tol = rel_tol
+        self.settle_polls = settle_polls
+        self.min_dwell = min_dwell
+        self.max_dwell = max_dwell
+        self.poll_interval = poll_interval
+        self.auto_timebase = auto_timebase
+        self.periods_on_screen = periods_on_screen
+        self.wave_mode = wave_mode
+        self.processes = processes
+        self._timebase_scale = None
+        self._point_queries = [
+            self._stat_query(MeasureStatisticsType.AVERAGES, Measurements.VPP, source_in),
+            self._stat_query(MeasureStatisticsType.AVERAGES, Measurements.VPP, source_out),
+            self._stat_query(MeasureStatisticsType.AVERAGES, Measurements.RDELAY),
+            self._stat_query(MeasureStatisticsType.DEVIATION, Measurements.VPP, source_in),
+            self._stat_query(MeasureStatisticsType.DEVIATION, Measurements.VPP, source_out),
+            self._stat_query(MeasureStatisticsType.DEVIATION, Measurements.RDELAY),
+            ':MEAS:COUNter:VALue?',
+        ]
+
+    @staticmethod
+    def _stat_query(type:MeasureStatisticsType, item:Measurements, source:MeasureSources='') -> str:
+        cmd_str = f':MEAS:STATistic:ITEM? {type},{item}'
+        if source:
+            cmd_str += f",{source}"
+        return cmd_str
+
+    def setup(self):
+        '''
+        One-off measurement configuration (called by sweep()).
+        '''
+        measure = self._dso.measure
+        measure.counter_source = self.source_in
+        measure.setup.delay_source_a = self.source_in
+        measure.setup.delay_source_b = self.source_out
+        measure.statistic.display = True
+        measure.statistic.mode = StatisticsMode.DIFFERENCE
+        measure.statistic.item_set(Measurements.VPP, self.source_in)
+        measure.statistic.item_set(Measurements.VPP, self.source_out)
+        measure.statistic.item_set(Measurements.RDELAY)
+        self._timebase_scale = None
+
+    def _set_timebase(self, frequency:float):
+        '''
+        Smallest 1-2-5 timebase scale showing periods_on_screen periods
+        '''
+        target = self.periods_on_screen / (12 * frequency)
+        decade = 10**math.floor(math.log10(target))
+        scale = next(step * decade for step in (1, 2, 5, 10) if step * decade >= target * (1 - 1e-9))
+        if scale != self._timebase_scale:
+            self._dso.timebase.scale = scale
+            self._timebase_scale = scale
+
+    def measure_point(self, frequency:float=None) -> dict:
+        '''
+        Step the generator to frequency (if given) and measure one point.
+        '''
+        start = time.perf_counter()
+        self._step(frequency)
+        if self.method == 'waveform':
+            point = self._waveform_point(_fit_codes(*self._capture(), frequency))
+        else:
+            point = self._measure_statistics(start)
+        point['set_frequency'] = frequency
+        point['dwell'] = time.perf_counter() - start
+        return point
+
+    def _step(self, frequency:float):
+        if frequency is not None:
+            if self.generator is not None:
+                self.generator(frequency)
+            if self.auto_timebase:
+                self._set_timebase(frequency)
+
+    def _measure_statistics(self, start:float) -> dict:
+        self._dso.measure.statistic.reset()
+        previous = None
+        settled = 0
+        polls = 0
+        while True:
+            time.sleep(self.poll_interval)
+            values = [float(v) for v in self._dso.visa.query_many(self._point_queries)]
+            polls += 1
+            averages = np.array(values[:3])
+            if previous is not None and np.all(np.abs(averages - previous) <= self.rel_tol * np.abs(averages)):
+                settled += 1
+            else:
+                settled = 0
+            previous = averages
+            elapsed = time.perf_counter() - start
+            if (settled >= self.settle_polls and elapsed >= self.min_dwell) or elapsed >= self.max_dwell:
+                break
+        vin, vout, delay, vin_dev, vout_dev, delay_dev, frequency = values
+        return {
+            'frequency': frequency,
+            'vin': vin,
+            'vout': vout,
+            'delay': delay,
+            'deviation': {'vin': vin_dev, 'vout': vout_dev, 'delay': delay_dev},
+            'gain_db': 20*math.log10(vout / vin) if vin > 0 and vout > 0 else math.nan,
+            'phase_deg': -360.0 * frequency * delay,
+            'polls': polls,
+            'converged': settled >= self.settle_polls,
+        }
+
+    def _capture(self) -> tuple:
+        ''' (BYTE codes, preambles) of source_in/source_out from one acquisition '''
+        time.sleep(self.min_dwell)
+        wave = self._dso.wave
+        rows, preambles = [], []
+        with self._dso.transaction():
+            wave._setup_read(self.source_in, self.wave_mode)
+            for source in (self.source_in, self.source_out):
+                wave.source = source
+                preambles.append(wave.preamble)
+                rows.append(wave.read_data(1, preambles[-1]['points']))
+        self._dso.run()
+        return np.stack(rows), preambles
+
+    @staticmethod
+    def _waveform_point(point:dict) -> dict:
+        point['vin'], point['vout'] = 2*point['vin'], 2*point['vout'] # peak -> VPP
+        point['delay'] = None
+        point['polls'] = 1
+        point['converged'] = True
+        return point
+
+    def sweep(self, frequencies, progress=None) -> list:
+        '''
+        Measure every frequency in turn.
+
+        Args:
+            frequencies (iterable): stimulus frequencies in Hz
+            progress (callable): called as progress(index, point) after each point
+
+        Returns: list of point dicts
+        '''
+        if self.method == 'waveform':
+            return self._sweep_waveform(frequencies, progress)
+        self.setup()
+        points = []
+        for i, frequency in enumerate(frequencies):
+            points.append(self.measure_point(frequency))
+            if progress is not None:
+                progress(i, points[-1])
+        return points
+
+    def _sweep_waveform(self, frequencies, progress=None) -> list:
+        processes = os.cpu_count() if self.processes is None else self.processes
+        pool = ProcessPoolExecutor(processes) if processes else None
+        pending = deque() # (future, frequency, dwell) of the fits still running
+        points = []
+
+        def add(fit:dict, frequency:float, dwell:float):
+            point = self._waveform_point(fit)
+            point['set_frequency'] = frequency
+            point['dwell'] = dwell
+            points.append(point)
+            if progress is not None:
+                progress(len(points) - 1, point)
+
+        try:
+            for frequency in frequencies:
+                start = time.perf_counter()
+                self._step(frequency)
+                codes, preambles = self._capture()
+                dwell = time.perf_counter() - start
+                if pool is None:
+                    add(_fit_codes(codes, preambles, frequency), frequency, dwell)
+                    continue
+                pending.append((pool.submit(_fit_codes, codes, preambles, frequency), frequency, dwell))
+                # collect finished fits in order; wait when the pool falls behind
+                while pending and (pending[0][0].done() or len(pending) > 2 * processes):
+                    future, frequency, dwell = pending.popleft()
+                    add(future.result(), frequency, dwell)
+            while pending:
+                future, frequency, dwell = pending.popleft()
+                add(future.result(), frequency, dwell)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return points
@@ -0,0 +1,448 @@
+from .rigol_ds1000z_constants import WaveSource, WaveMode
+from .rigol_ds1000z_scpi import Rigol_scpi_Subsystem, Rigol_scpi_Property
+from .rigol_ds1000z_search import find_edges
+from collections import OrderedDict
+import pyvisa as _visa
+import numpy as np
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+'''
+Capture container: raw sample codes of one or more sources, their
+:WAV:PREamble? and a snapshot of the scope settings, readable without
+the scope.
+
+Layout (little endian):
+
+    b'RGLCAPT1' <version:u16>
+    chunks:  the codes of each channel, split in chunks of chunk_points
+             points, zlib compressed or stored as is
+    header:  UTF-8 JSON
+        'created', 'idn', 'settings' {subsystem: {property: value}}
+        'channels' {name: {'preamble', 'dtype', 'points', 'chunk_points',
+                           'compression', 'chunks': [[offset, length], ...]}}
+    footer:  <header offset:u64> <header length:u64> b'RGLCAPTX'
+
+Uncompressed channels are served as zero-copy views of the memory-mapped
+file; compressed ones are inflated one chunk at a time, only for the range
+asked for. BYTE codes take 1/8 of the space of float64 volts before
+compression.
+
+Threshold crossings (edges()) are computed once per channel, level and
+hysteresis and kept in edge_cache, an LRU cache shared by every capture of
+the process, so the analyses run on one capture (measurements, eye,
+search, jitter, ...) scan its samples only once.
+'''
+
+_MAGIC = b'RGLCAPT1'
+_FOOTER_MAGIC = b'RGLCAPTX'
+_VERSION = 1
+_FILE_HEADER = struct.Struct('<8sH')
+_FOOTER = struct.Struct('<QQ8s')
+
+
+DEFAULT_THRESHOLDS = {'max_threshold': 90, 'mid_threshold': 50, 'min_threshold': 10}
+
+
+def settings_snapshot(dso) -> dict:
+    '''
+    Query every readable property of channel[], timebase, trigger, acquire
+    and measure.setup. Settings declared with scpi_property are read with
+    one get_many() per subsystem. Properties the scope refuses in its
+    current state are left out.
+
+    Returns: {'channel1': {...}, ..., 'timebase': {...}, 'trigger': {...}, 'acquire': {...},
+              'measure_setup': {...}}
+    '''
+    subsystems = {f'channel{i+1}': channel for i, channel in enumerate(dso.channel)}
+    subsystems.update(timebase=dso.timebase, trigger=dso.trigger, acquire=dso.acquire,
+                      measure_setup=dso.measure.setup)
+    snapshot = {}
+    for name, subsystem in subsystems.items():
+        values = {}
+        if isinstance(subsystem, Rigol_scpi_Subsystem):
+            try:
+                values.update(subsystem.get_many())
+            except (_visa.errors.VisaIOError, ValueError):
+                pass # read one at a time below, skipping the refused ones
+        for attribute in dir(type(subsystem)):
+            if attribute.startswith('_') or attribute in values:
+                continue
+            if not isinstance(getattr(type(subsystem), attribute), (property, Rigol_scpi_Property)):
+                continue
+            try:
+                value = getattr(subsystem, attribute)
+            except (_visa.errors.VisaIOError, ValueError):
+                continue
+            values[attribute] = value if isinstance(value, (int, float, bool)) else str(value).strip()
+        snapshot[name] = values
+    return snapshot
+
+
+class Rigol_ds1000z_EdgeCache:
+    '''
+    Thread safe LRU cache of edge arrays, bounded by the bytes it holds.
+    Keys start with the cache key of the capture (file path and
+    modification time, or shared memory block name).
+    '''
+
+    def __init__(self, max_bytes:int=256 << 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(value) -> int:
+        if isinstance(value, dict):
+            return sum(getattr(item, 'nbytes', 64) for item in value.values())
+        return getattr(value, 'nbytes', 64)
+
+    def get(self, key, compute):
+        ''' Cached value of key, computed by compute() (outside the lock) on a miss '''
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self.nbytes += self._size(value)
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= self._size(evicted)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+edge_cache = Rigol_ds1000z_EdgeCache()
+
+
+class _CaptureEdges:
+    '''
+    Edge detection for capture objects offering codes(), preamble(),
+    settings and cache_key (Rigol_ds1000z_Capture and the analysis pool's
+    shared captures).
+    '''
+
+    def _code(self, name:str, volts:float) -> float:
+        preamble = self.preamble(name)
+        return volts / preamble['yincrement'] + preamble['yorigin'] + preamble['yreference']
+
+    def top_base(self, name:str) -> tuple:
+        '''
+        (top, base) of channel name in volts: the most frequent code above
+        and below the middle of the code range, as the scope's
+        measurements define them. Computed once per capture.
+        '''
+        def compute():
+            codes = self.codes(name)
+            if codes.dtype.kind == 'f': # resampled codes, e.g. a merged capture
+                histogram = np.histogram(codes, 256, (0, 256))[0]
+            else:
+                histogram = np.bincount(codes, minlength=256)
+            used = np.flatnonzero(histogram)
+            middle = (used[0] + used[-1]) // 2 + 1
+            base = histogram[:middle].argmax()
+            top = middle + histogram[middle:].argmax() if used[-1] >= middle else base
+            return {'top': top, 'base': base}
+        codes = edge_cache.get((self.cache_key, name, 'top_base'), compute)
+        preamble = self.preamble(name)
+        return tuple((codes[level] - preamble['yorigin'] - preamble['yreference']) * preamble['yincrement']
+                     for level in ('top', 'base'))
+
+    def thresholds(self, name:str) -> dict:
+        '''
+        Upper, middle and lower threshold of channel name in volts, from
+        the measure.setup percentages of the capture's settings (90/50/10 %
+        of base to top when not recorded).
+
+        Returns: {'max', 'mid', 'min'}
+        '''
+        setup = dict(DEFAULT_THRESHOLDS, **self.settings.get('measure_setup', {}))
+        top, base = self.top_base(name)
+        return {level: base + (top - base) * setup[f'{level}_threshold'] / 100 for level in ('max', 'mid', 'min')}
+
+    def edges(self, name:str, level:float=None, hysteresis:float=0.0) -> dict:
+        '''
+        Rising and falling crossings of level by channel name (see
+        rigol_ds1000z_search.find_edges), computed on first use and then
+        served from edge_cache.
+
+        Args:
+            name (str): channel
+            level (float): volts; defaults to the middle threshold, see thresholds()
+            hysteresis (float): total hysteresis band, volts
+
+        Returns: {'rising', 'falling'} float64 arrays of fractional sample
+            positions (0-based; multiply by xincrement for capture.time() times)
+        '''
+        if level is None:
+            level = self.thresholds(name)['mid']
+        yinc = self.preamble(name)['yincrement']
+        level_code, hysteresis_code = self._code(name, level), hysteresis / yinc
+        def compute():
+            rising, falling = find_edges(self.codes(name), level_code, hysteresis_code)
+            return {'rising': rising, 'falling': falling}
+        return edge_cache.get((self.cache_key, name, round(level_code, 6), round(hysteresis_code, 6)), compute)
+
+
+class Rigol_ds1000z_CaptureWriter:
+    '''
+    Writes a capture container.
+
+    As a context manager the file is completed on exit, or deleted if the
+    block raised.
+
+    example:
+        with Rigol_ds1000z_CaptureWriter('run.rgc', settings=settings_snapshot(dso)) as writer:
+            writer.add_channel('CHAN1', codes, dso.wave.preamble)
+    '''
+
+    def __init__(self, filename:str, settings:dict=None, idn:str='',
+                 chunk_points:int=1 << 20, compress:bool=True, level:int=1):
+        '''
+        Args:
+            filename (str): file to create
+            settings (dict): settings snapshot to store (see settings_snapshot)
+            idn (str): *IDN? of the scope
+            chunk_points (int): points per chunk
+            compress (bool): zlib compress the chunks; False keeps the codes
+                memory-mappable without any copy
+            level (int): zlib level
+        '''
+        self.chunk_points = chunk_points
+        self.compress = compress
+        self.level = level
+        self.header = {
+            'created': time.time(),
+            'idn': idn,
+            'settings': settings or {},
+            'channels': {},
+        }
+        self.filename = filename
+        self._file = open(filename, 'wb')
+        self._file.write(_FILE_HEADER.pack(_MAGIC, _VERSION))
+
+    def add_channel(self, name:str, codes, preamble:dict):
+        '''
+        Store the sample codes of one source.
+
+        Args:
+            name (str): channel name, e.g. 'CHAN1'
+            codes: uint8/uint16 array, or an iterable of arrays (e.g. the
+                blocks of a download as they arrive)
+            preamble (dict): Rigol_ds1000z_Wave.preamble of the source
+        '''
+        if isinstance(codes, np.ndarray):
+            codes = [codes]
+        chunks, points, dtype = [], 0, None
+        carry = None # start of the next chunk, left over from the previous block
+        for block in codes:
+            block = np.ascontiguousarray(block)
+            dtype = dtype or block.dtype.str
+            if carry is not None and len(carry):
+                block = np.concatenate((carry, block))
+            full = len(block) - len(block) % self.chunk_points
+            for offset in range(0, full, self.chunk_points):
+                chunks.append(self._write_chunk(block[offset:offset + self.chunk_points]))
+            carry = block[full:]
+            points += full
+        if carry is not None and len(carry):
+            chunks.append(self._write_chunk(carry))
+            points += len(carry)
+        self.header['channels'][str(name)] = {
+            'preamble': preamble,
+            'dtype': dtype or '|u1',
+            'points': points,
+            'chunk_points': self.chunk_points,
+            'compression': 'zlib' if self.compress else 'none',
+            'chunks': chunks,
+        }
+
+    def _write_chunk(self, codes:np.ndarray) -> list:
+        data = codes.tobytes()
+        if self.compress:
+            data = zlib.compress(data, self.level)
+        offset = self._file.tell()
+        self._file.write(data)
+        return [offset, len(data)]
+
+    def close(self):
+        ''' Write the header and footer and close the file '''
+        if self._file.closed:
+            return
+        header = json.dumps(self.header).encode()
+        offset = self._file.tell()
+        self._file.write(header)
+        self._file.write(_FOOTER.pack(offset, len(header), _FOOTER_MAGIC))
+        self._file.close()
+
+    def abort(self):
+        ''' Close and delete the unfinished file, e.g. after a failed download '''
+        if self._file.closed:
+            return
+        self._file.close()
+        os.remove(self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        # a capture missing data must not look complete: no footer on errors
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def save_capture(dso, filename:str,
+                 sources=(WaveSource.CHAN1,),
+                 mode:WaveMode=WaveMode.RAW,
+                 settings:bool=True, **kwargs) -> dict:
+    '''
+    Stop the scope (the wave setup sends :STOP) and write the codes of
+    sources from the current acquisition, their preambles and a settings
+    snapshot to filename. If a download fails the file is deleted.
+    Each source is written block by block as it downloads, so memory use
+    does not grow with the memory depth.
+
+    Args:
+        dso (Rigol_ds1000z): scope
+        filename (str): capture file to create
+        sources (list of WaveSource): sources to store
+        mode (WaveMode): Normal, Max, or Raw
+        settings (bool): include settings_snapshot(dso)
+        kwargs: passed to Rigol_ds1000z_CaptureWriter (chunk_points, compress, level)
+
+    Returns: the container header
+    '''
+    wave = dso.wave
+    with dso.transaction():
+        wave._setup_read(sources[0], mode) # stops the scope
+        snapshot = settings_snapshot(dso) if settings else {}
+        with Rigol_ds1000z_CaptureWriter(filename, snapshot, dso.idn(), **kwargs) as writer:
+            for source in sources:
+                wave.source = source
+                preamble = wave.preamble
+                writer.add_channel(source, _download_blocks(wave, preamble['points']), preamble)
+    return writer.header
+
+
+def _download_blocks(wave, points:int):
+    '''
+    Yield the codes of points 1..points of the current source one download
+    block at a time, so a channel is written without holding it in memory
+    (read_range() retries each block as read_data() does).
+    '''
+    for start in range(1, points + 1, wave.block_pts):
+        yield wave.read_range(start, min(start + wave.block_pts - 1, points))
+        wave.visa.checkpoint() # high priority threads may run between blocks
+
+
+class Rigol_ds1000z_Capture(_CaptureEdges):
+    '''
+    Lazy reader for capture containers. Nothing is read until asked for, and
+    only the chunks covering the requested range are inflated. edges(),
+    thresholds() and top_base() are memoized in edge_cache.
+
+    example:
+        capture = Rigol_ds1000z_Capture('run.rgc')
+        print(capture.channels, capture.settings['timebase']['scale'])
+        v = capture.volts('CHAN1', 1000000, 1001000)
+        t = capture.time('CHAN1', 1000000, 1001000)
+    '''
+
+    def __init__(self, filename:str):
+        self._file = open(filename, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = _FILE_HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            raise ValueError(f'{filename} is not a capture container')
+        offset, length, magic = _FOOTER.unpack_from(self._map, len(self._map) - _FOOTER.size)
+        if magic != _FOOTER_MAGIC:
+            raise ValueError(f'{filename} is incomplete (writer not closed)')
+        self.header = json.loads(self._map[offset:offset + length])
+        self.settings = self.header['settings']
+        self.idn = self.header['idn']
+        stat = os.stat(self._file.fileno())
+        self.cache_key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+
+    @property
+    def channels(self) -> list:
+        return list(self.header['channels'])
+
+    def preamble(self, name:str) -> dict:
+        return self.header['channels'][name]['preamble']
+
+    def __len__(self):
+        return len(self.header['channels'])
+
+    def points(self, name:str) -> int:
+        return self.header['channels'][name]['points']
+
+    def codes(self, name:str, start:int=0, stop:int=None) -> np.ndarray:
+        '''
+        Raw sample codes start..stop-1 (0-based) of channel name. For an
+        uncompressed chunk this is a read-only view of the mapped file.
+        '''
+        channel = self.header['channels'][name]
+        dtype = np.dtype(channel['dtype'])
+        start, stop, _ = slice(start, stop).indices(channel['points'])
+        if start >= stop:
+            return np.empty(0, dtype)
+        chunk_points = channel['chunk_points']
+        first, last = start // chunk_points, max(start, stop - 1) // chunk_points
+        parts = []
+        for chunk in range(first, last + 1):
+            offset, length = channel['chunks'][chunk]
+            if channel['compression'] == 'zlib':
+                codes = np.frombuffer(zlib.decompress(self._map[offset:offset + length]), dtype)
+            else:
+                codes = np.frombuffer(self._map, dtype, length // dtype.itemsize, offset)
+            base = chunk * chunk_points
+            parts.append(codes[max(start - base, 0):stop - base])
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def volts(self, name:str, start:int=0, stop:int=None) -> np.ndarray:
+        ''' Points start..stop-1 of channel name scaled to volts with its preamble '''
+        preamble = self.preamble(name)
+        codes = self.codes(name, start, stop)
+        return (codes - preamble['yorigin'] - preamble['yreference']) * preamble['yincrement']
+
+    def time(self, name:str, start:int=0, stop:int=None) -> np.ndarray:
+        ''' Sample times (s, relative to the first point) of points start..stop-1 '''
+        start, stop, _ = slice(start, stop).indices(self.points(name))
+        return np.arange(start, stop) * self.preamble(name)['xincrement']
+
+    def close(self):
+        try:
+            self._map.close()
+        except BufferError:
+            pass # views returned by codes() still in use; the map closes with them
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
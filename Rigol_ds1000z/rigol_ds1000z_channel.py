@@ -1,8 +1,9 @@
 from .rigol_visa import Rigol_visa
-from .rigol_ds1000z_constants import  OnOff, ChannelCoupling, ChannelUnits
+from .rigol_ds1000z_scpi import Rigol_scpi_Subsystem, scpi_property
+from .rigol_ds1000z_constants import ChannelBandwidth, ChannelCoupling, ChannelUnits
 # import numpy as _np
 
-class Rigol_ds1000z_Channel:
+class Rigol_ds1000z_Channel(Rigol_scpi_Subsystem):
     '''
     Handles the channels configuration (vertical axis).
     One instance of this class should be instanciated for each channel
@@ -12,53 +13,41 @@ class Rigol_ds1000z_Channel:
         self.visa_resource = visa_resource
         self.visa = Rigol_visa(visa_resource)
         self._chan = channel
+        self._scpi_format = {'n': channel}
 
-    @property
-    def bandwidth_limit(self) -> str:
+    @scpi_property(':CHANnel{n}:BWLimit', enum=ChannelBandwidth,
+                   aliases={True: ChannelBandwidth.LIMIT_20M, False: ChannelBandwidth.OFF})
+    def bandwidth_limit(self):
         '''
         Set or query the bandwidth limit parameter of the specified channel.
 
-        bw is {20M|OFF}
+        bw is {20M|OFF}, or True (20M) / False (OFF)
+
+        Returns ChannelBandwidth.LIMIT_20M or ChannelBandwidth.OFF
         '''
-        return self.visa.query(f':CHAN{self._chan}:BWLimit?')
-    @bandwidth_limit.setter
-    def bandwidth_limit(self, limit_on:bool=False):
-        bw = '20M' if limit_on else 'OFF'
-        self.visa.write(f':CHAN{self._chan}:BWLimit {bw}')
-        return
-    
-    @property
-    def coupling(self) -> ChannelCoupling:
+
+    @scpi_property(':CHANnel{n}:COUPling', enum=ChannelCoupling)
+    def coupling(self):
         '''
         Set or query the coupling mode of the specified channel.
 
         chan {1|2|3|4}
         coupling  {AC|DC|GND} 
         '''
-        return self.visa.query(f':CHAN{self._chan}:COUPling?')
-    @coupling.setter
-    def coupling(self, coupling:ChannelCoupling):
-        self.visa.write(f':CHAN{self._chan}:COUPling {coupling}')
-        return
-    
-    @property
-    def display(self) -> OnOff:
+
+    @scpi_property(':CHANnel{n}:DISPlay', bool)
+    def display(self):
         '''
         Enable or disable the specified channel or query the status of the specified channel.
 
         chan {1|2|3|4}
         on {True|False} 
 
-        Returns 1 (ON) or 0 (OFF) 
+        Returns True (ON) or False (OFF), which compare equal to 1 and 0
         '''
-        return int(self.visa.query(f':CHAN{self._chan}:DISPplay?'))
-    @display.setter
-    def display(self, chan_display:OnOff):
-        self.visa.write(f':CHAN{self._chan}:DISPplay {chan_display}')
-        return
-    
-    @property
-    def invert(self) -> int:
+
+    @scpi_property(':CHANnel{n}:INVert', bool)
+    def invert(self):
         '''
         Enable or disable the waveform invert of the specified channel or query the status of the
         waveform invert of the specified channel.
@@ -66,17 +55,11 @@ class Rigol_ds1000z_Channel:
         chan {1|2|3|4}
         on {True|False} 
 
-        Returns 0 (NORMAL) or 1 (INVERTED)  
+        Returns False (NORMAL) or True (INVERTED), which compare equal to 0 and 1
         '''
-        return self.visa.query(f':CHAN{self._chan}:INVert?')
-    @invert.setter
-    def invert(self, invert_on:bool):
-        inv_chan = 1 if invert_on else 0
-        self.visa.write(f':CHAN{self._chan}:INVert {inv_chan}')
-        return
-    
-    @property
-    def offset(self) -> float:
+
+    @scpi_property(':CHANnel{n}:OFFSet', float)
+    def offset(self):
         '''
         Set or query the vertical offset of the specified channel. The default unit is V.
 
@@ -92,15 +75,9 @@ class Rigol_ds1000z_Channel:
 
         Returns offset in scientific notation [Volts] 
         '''
-        return float(self.visa.query(f':CHAN{self._chan}:OFFSet?'))
-    @offset.setter
-    def offset(self, offset_value:float):
-        # TODO limit check
-        self.visa.write(f':CHAN{self._chan}:OFFSet {offset_value}')
-        return
 
-    @property
-    def range(self) -> float: 
+    @scpi_property(':CHANnel{n}:RANGe', float)
+    def range(self):
         '''
         Set or query the vertical range of the specified channel. The default unit is V.
 
@@ -116,15 +93,9 @@ class Rigol_ds1000z_Channel:
 
         Returns vertical scale in scientific notation [Volts] 
         '''
-        return float(self.visa.query(f':CHAN{self._chan}:RANGe?'))
-    @range.setter
-    def range(self, vertical_range:float):
-        # TODO limit check
-        self.visa.write(f':CHAN{self._chan}:RANGe {vertical_range}')
-        return
-    
-    @property
-    def delay_calibration_time(self) -> float: 
+
+    @scpi_property(':CHANnel{n}:TCAL', float)
+    def delay_calibration_time(self):
         '''
         :CHANnel<n>:TCAL
         Set or query the delay calibration time of the specified channel to calibrate the zero offset
@@ -151,14 +122,9 @@ class Rigol_ds1000z_Channel:
         CHANnel1:TCAL 0.00000002 /*Set the delay calibration time to 20ns*/
         :CHANnel1:TCAL? /*The query returns 2.000000e-08*/
         '''
-        return self.visa.query(f':CHAN{self._chan}:TCAL?')
-    @delay_calibration_time.setter
-    def delay_calibration_time(self, val:float):
-        self.visa.write(f':CHAN{self._chan}:TCAL {val}')
-        return
-    
-    @property
-    def scale(self) -> float:
+
+    @scpi_property(':CHANnel{n}:SCALe', float)
+    def scale(self):
         '''
         Set or query the vertical scale of the specified channel. The default unit is V.
 
@@ -181,14 +147,9 @@ class Rigol_ds1000z_Channel:
         CHANnel1:TCAL 0.00000002 /*Set the delay calibration time to 20ns*/
         :CHANnel1:TCAL? /*The query returns 2.000000e-08*/
         '''
-        return float(self.visa.query(f':CHAN{self._chan}:SCALe?'))
-    @scale.setter
-    def scale(self, vertical_scale:float):
-        self.visa.write(f':CHAN{self._chan}:SCALe {vertical_scale}')
-        return
-    
-    @property
-    def probe(self) -> float:
+
+    @scpi_property(':CHANnel{n}:PROBe', float)
+    def probe(self):
         '''
         Set or query the probe ratio of the specified channel.
 
@@ -198,14 +159,9 @@ class Rigol_ds1000z_Channel:
 
         Returns the probe ratio in scientific notation.
         '''
-        return float(self.visa.query(f':CHAN{self._chan}:PROBe?'))
-    @probe.setter
-    def probe(self, atten:float):
-        self.visa.write(f':CHAN{self._chan}:PROBe {atten}')
-        return
 
-    @property
-    def units(self) -> ChannelUnits:
+    @scpi_property(':CHANnel{n}:UNITs', enum=ChannelUnits)
+    def units(self):
         '''
         Set or query the amplitude display unit of the specified channel.
 
@@ -214,14 +170,9 @@ class Rigol_ds1000z_Channel:
 
         Returns VOLT, WATT, AMP, or UNKN
         '''
-        return self.visa.query(f':CHAN{self._chan}:UNITs?')
-    @units.setter
-    def units(self, units:ChannelUnits):
-        self.visa.write(f':CHAN{self._chan}:UNITs {units}')
-        return
-    
-    @property
-    def vernier(self) -> str:
+
+    @scpi_property(':CHANnel{n}:VERNier', bool)
+    def vernier(self):
         '''
         Enable or disable the fine adjustment of the vertical scale of the specified channel,
         or query the fine adjustment status of the vertical scale of the specified channel.
@@ -231,16 +182,5 @@ class Rigol_ds1000z_Channel:
         When the fine adjustment is on, you can adjust the vertical scale within
         a relatively smaller range using CHAN:SCALE to improve the vertical resolution.  
 
-        Returns 0 (OFF) or 1 (ON)
+        Returns False (OFF) or True (ON), which compare equal to 0 and 1
         '''
-        return self.visa.query(f':CHAN{self._chan}:VERNier?')
-    @vernier.setter
-    def vernier(self, vernier_on:bool):
-        vern_on = 1 if vernier_on else 0
-        self.visa.write(f':CHAN{self._chan}:VERNier {vern_on}')
-        return
-
-
-
-
-
@@ -1,4 +1,5 @@
 from enum import Enum, auto
+from functools import lru_cache
 from strenum import StrEnum
 
 '''
@@ -8,9 +9,12 @@ which sets the string equal to the property name, equivalent to
 CHAN1 = "CHAN1"
 '''
 
+@lru_cache(maxsize=None)
+def _class_values(in_class) -> frozenset:
+    return frozenset(item.value for item in in_class)
+
 def class_has_value(test_value, in_class) -> bool:
-    values = set(item.value for item in in_class)
-    return test_value in values
+    return test_value in _class_values(in_class)
 
 class AcquisitionMode(StrEnum):
     NORMAL = auto()
@@ -32,6 +36,10 @@ class AnalogSources(StrEnum):
     CHAN3 = auto()
     CHAN4 = auto()
 
+class ChannelBandwidth(StrEnum):
+    LIMIT_20M = "20M"
+    OFF = auto()
+
 class ChannelCoupling(StrEnum):
     AC = auto()
     DC = auto()
@@ -43,6 +51,51 @@ class ChannelUnits(StrEnum):
     AMP  = auto()
     UNKN = auto()
 
+class CursorAutoItem(StrEnum):
+    OFF = auto()
+    ITEM1 = auto()
+    ITEM2 = auto()
+    ITEM3 = auto()
+    ITEM4 = auto()
+    ITEM5 = auto()
+
+class CursorManualType(StrEnum):
+    X = auto()
+    Y = auto()
+
+class CursorMode(StrEnum):
+    OFF = auto()
+    MANUAL = "MAN"
+    TRACK = "TRAC"
+    AUTO = auto()
+    XY = auto()
+
+class CursorSource(StrEnum):
+    CHAN1 = auto()
+    CHAN2 = auto()
+    CHAN3 = auto()
+    CHAN4 = auto()
+    MATH = auto()
+    LA = auto()
+
+class CursorTimeUnit(StrEnum):
+    SECOND = "S"
+    HERTZ = "HZ"
+    DEGREE = "DEGR"
+    PERCENT = "PERC"
+
+class CursorTrackSource(StrEnum):
+    OFF = auto()
+    CHAN1 = auto()
+    CHAN2 = auto()
+    CHAN3 = auto()
+    CHAN4 = auto()
+    MATH = auto()
+
+class CursorVerticalUnit(StrEnum):
+    PERCENT = "PERC"
+    SOURCE = "SOUR"
+
 class DecoderChannel(StrEnum):
     CHAN1 = auto()
     CHAN2 = auto()
@@ -152,6 +205,13 @@ class MathOperations(StrEnum):
     ABS = auto()
     FILTER  = auto()
 
+class ImageFormat(StrEnum):
+    BMP24 = "bmp24"
+    BMP8 = "bmp8"
+    PNG = "png"
+    JPEG = "jpeg"
+    TIFF = "tiff"
+
 class LogicSources(StrEnum):
     CHAN1 = auto()
     CHAN2 = auto()
@@ -252,6 +312,7 @@ class MeasureSources(StrEnum):
     D13 = auto()
     D14 = auto()
     D15 = auto()
+    MATH = auto()
 
 class MeasureStatisticsDisplay(StrEnum):
     difference = "DIFF"
@@ -309,6 +370,10 @@ class SpiEdge(StrEnum):
     RISE = auto()
     FALL = auto()
 
+class SpiSelect(StrEnum):
+    CS = auto()
+    NCS = auto()
+
 class SpiTimeout(StrEnum):
     TIM = auto()
     CS  = auto()
@@ -317,6 +382,60 @@ class StatisticsMode(StrEnum):
     DIFFERENCE = "DIFF" 
     EXTREMUM = "EXTR"
 
+class TriggerStatus(StrEnum):
+    TRIGGERED = "TD"
+    WAIT = auto()
+    RUN = auto()
+    AUTO = auto()
+    STOP = auto()
+
+class TriggerCoupling(StrEnum):
+    AC = auto()
+    DC = auto()
+    LF_REJECT = "LFR"
+    HF_REJECT = "HFR"
+
+class TriggerSweep(StrEnum):
+    AUTO = auto()
+    NORMAL = auto()
+    SINGLE = auto()
+
+class TriggerSlope(StrEnum):
+    POSITIVE = "POS"
+    NEGATIVE = "NEG"
+    RISE_FALL = "RFAL"
+
+class TriggerPulseWhen(StrEnum):
+    PGREATER = "PGR"
+    PLESS = "PLES"
+    NGREATER = "NGR"
+    NLESS = "NLES"
+    PGLESS = "PGL"
+    NGLESS = "NGL"
+
+class TriggerSource(StrEnum):
+    CHAN1 = auto()
+    CHAN2 = auto()
+    CHAN3 = auto()
+    CHAN4 = auto()
+    AC = auto()
+    D0 = auto()
+    D1 = auto()
+    D2 = auto()
+    D3 = auto()
+    D4 = auto()
+    D5 = auto()
+    D6 = auto()
+    D7 = auto()
+    D8 = auto()
+    D9 = auto()
+    D10 = auto()
+    D11 = auto()
+    D12 = auto()
+    D13 = auto()
+    D14 = auto()
+    D15 = auto()
+
 class TriggerMode(StrEnum):
     EDGE = auto()
     PULSE = auto()
@@ -344,6 +463,11 @@ class UartParity(StrEnum):
     EVEN = auto()
     ODD = auto()
 
+class WaveFormat(StrEnum):
+    WORD = auto()
+    BYTE = auto()
+    ASCII = "ASC"
+
 class WaveMode(StrEnum):
     NORMAL = auto()
     MAXIMUM = auto()
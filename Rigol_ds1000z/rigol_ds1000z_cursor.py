@@ -1,58 +1,456 @@
+from .rigol_visa import Rigol_visa
+from .rigol_ds1000z_scpi import Rigol_scpi_Subsystem, scpi_property
+from .rigol_ds1000z_wave import Rigol_ds1000z_Wave
+from .rigol_ds1000z_constants import CursorMode, CursorManualType, CursorSource, CursorTimeUnit, \
+    CursorVerticalUnit, CursorTrackSource, CursorAutoItem
 
+'''
+The cursor readouts (:CURSor:<mode>:AXValue? ... YDELta?) are separate
+queries; snapshot() sends all those of the active mode as one compound
+query. Rigol_ds1000z_CursorEvaluator computes the same values on the host
+from a capture, for dashboards polling cursors faster than the scope can
+answer.
 
-# CURSor Commands
-# The :CURSor commands are used to measure the X-axis value (such as time) and Y-axis value (such as
-# voltage) of the waveform displayed on the screen.
-# Command List:
-#  :CURSor:MODE
-#  :CURSor:MANual
-#  :CURSor:TRACk
-#  :CURSor:AUTO
-#  :CURSor:XY
-
-# CURSor:MANual
-# Command List:
-#  :CURSor:MANual:TYPE
-#  :CURSor:MANual:SOURce
-#  :CURSor:MANual:TUNit
-#  :CURSor:MANual:VUNit
-#  :CURSor:MANual:AX
-#  :CURSor:MANual:BX
-#  :CURSor:MANual:AY
-#  :CURSor:MANual:BY
-#  :CURSor:MANual:AXValue?
-#  :CURSor:MANual:AYValue?
-#  :CURSor:MANual:BXValue?
-#  :CURSor:MANual:BYValue?
-#  :CURSor:MANual:XDELta?
-#  :CURSor:MANual:IXDELta?
-#  :CURSor:MANual:YDELta?
-# :CURSor:MANual:TYPE
-
-# :CURSor:TRACk
-# Command List:
-#  :CURSor:TRACk:SOURce1
-#  :CURSor:TRACk:SOURce2
-#  :CURSor:TRACk:AX
-#  :CURSor:TRACk:BX
-#  :CURSor:TRACk:AY?
-#  :CURSor:TRACk:BY?
-#  :CURSor:TRACk:AXValue?
-#  :CURSor:TRACk:AYValue?
-#  :CURSor:TRACk:BXValue?
-#  :CURSor:TRACk:BYValue?
-#  :CURSor:TRACk:XDELta?
-#  :CURSor:TRACk:YDELta?
-#  :CURSor:TRACk:IXDELTA?
-
-# :CURSor:AUTO
-# Command List:
-#  :CURSor:AUTO:ITEM
-#  :CURSor:AUTO:AX?
-#  :CURSor:AUTO:BX?
-#  :CURSor:AUTO:AY?
-#  :CURSor:AUTO:BY?
-#  :CURSor:AUTO:AXValue?
-#  :CURSor:AUTO:AYValue?
-#  :CURSor:AUTO:BXValue?
-#  :CURSor:AUTO:BYValue?
+Cursor positions are screen pixels: 5 to 594 horizontally (12 divisions
+of 50 pixels, the centre at 300) and 5 to 394 vertically (8 divisions, the
+centre at 200, 0 at the top). The scope returns 9.9E37 for a value that is
+not available.
+'''
+
+SCREEN_CENTRE_X = 300
+SCREEN_CENTRE_Y = 200
+PIXELS_PER_DIV = 50
+INVALID = 9.9e37
+
+# snapshot() keys and query headers (after :CURSor:<mode>:) of every mode
+_READOUTS = {
+    CursorMode.MANUAL: (('ax', 'AXValue'), ('bx', 'BXValue'), ('ay', 'AYValue'), ('by', 'BYValue'),
+                        ('x_delta', 'XDELta'), ('inverse_x_delta', 'IXDELta'), ('y_delta', 'YDELta')),
+    CursorMode.TRACK:  (('ax', 'AXValue'), ('bx', 'BXValue'), ('ay', 'AYValue'), ('by', 'BYValue'),
+                        ('x_delta', 'XDELta'), ('inverse_x_delta', 'IXDELTA'), ('y_delta', 'YDELta')),
+    CursorMode.AUTO:   (('ax', 'AXValue'), ('bx', 'BXValue'), ('ay', 'AYValue'), ('by', 'BYValue')),
+    CursorMode.XY:     (('ax', 'AXValue'), ('bx', 'BXValue'), ('ay', 'AYValue'), ('by', 'BYValue')),
+}
+_MODE_HEADERS = {CursorMode.MANUAL: 'MANual', CursorMode.TRACK: 'TRACk', CursorMode.AUTO: 'AUTO', CursorMode.XY: 'XY'}
+
+
+def _value(reply:str) -> float:
+    value = float(reply)
+    return None if abs(value) >= INVALID else value
+
+
+class Rigol_ds1000z_Cursor(Rigol_scpi_Subsystem):
+    '''
+    The :CURSor commands are used to measure the X-axis value (such as time)
+    and Y-axis value (such as voltage) of the waveform displayed on the screen.
+
+    The settings and readouts of each mode are in manual, track, auto and xy.
+
+    example:
+        dso.cursor.mode = CursorMode.MANUAL
+        dso.cursor.manual.set_many(source=CursorSource.CHAN1, ax=200, bx=400)
+        print(dso.cursor.snapshot())   # {'mode', 'ax', 'bx', 'ay', 'by', 'x_delta', ...}
+    '''
+
+    def __init__(self, visa_resource):
+        self.visa_resource = visa_resource
+        self.visa = Rigol_visa(visa_resource)
+        self.manual = self.Manual(self.visa)
+        self.track = self.Track(self.visa)
+        self.auto = self.Auto(self.visa)
+        self.xy = self.XY(self.visa)
+
+    @scpi_property(':CURSor:MODE', enum=CursorMode)
+    def mode(self):
+        '''
+        Set or query the cursor measurement mode.
+
+        <mode> {OFF|MANual|TRACk|AUTO|XY} default OFF
+        XY is only available when the horizontal time base is XY.
+        '''
+
+    def snapshot(self, mode:CursorMode=None) -> dict:
+        '''
+        Every cursor readout of the active mode in one compound query.
+        The mode is queried first unless given (or cached, see cache_enable()).
+
+        Returns: dict
+            'mode'
+            'ax', 'bx'        X values of cursors A and B
+            'ay', 'by'        Y values of cursors A and B
+            'x_delta', 'inverse_x_delta', 'y_delta'  (MANual and TRACk)
+            Values the scope reports as unavailable are None.
+        '''
+        mode = CursorMode(mode or self.mode)
+        snapshot = {'mode': mode}
+        if mode == CursorMode.OFF:
+            return snapshot
+        header = _MODE_HEADERS[mode]
+        readouts = _READOUTS[mode]
+        replies = self.visa.query_many([f':CURSor:{header}:{query}?' for _, query in readouts])
+        snapshot.update((name, _value(reply)) for (name, _), reply in zip(readouts, replies))
+        return snapshot
+
+    def config(self) -> dict:
+        '''
+        What Rigol_ds1000z_CursorEvaluator needs to compute the readouts of
+        the current cursors: mode, the mode's settings, the timebase and the
+        vertical scale of the cursor sources.
+
+        Returns: {'mode', 'settings', 'timebase': {'scale', 'offset'},
+                  'channels': {source: {'scale', 'offset'}}}
+        '''
+        mode = CursorMode(self.mode)
+        subsystem = {CursorMode.MANUAL: self.manual, CursorMode.TRACK: self.track,
+                     CursorMode.AUTO: self.auto, CursorMode.XY: self.xy}.get(mode)
+        settings = subsystem.get_many() if subsystem is not None else {}
+        if mode == CursorMode.TRACK:
+            settings.update(self.track.get_many(['ay', 'by']))
+        sources = [str(settings[name]) for name in ('source', 'source1', 'source2')
+                   if str(settings.get(name, 'OFF')).startswith('CHAN')]
+        queries = [':TIMebase:MAIN:SCALe?', ':TIMebase:MAIN:OFFSet?']
+        for source in sources:
+            queries += [f':{source}:SCALe?', f':{source}:OFFSet?']
+        replies = [float(reply) for reply in self.visa.query_many(queries)]
+        return {
+            'mode': mode,
+            'settings': settings,
+            'timebase': {'scale': replies[0], 'offset': replies[1]},
+            'channels': {source: {'scale': replies[2 + 2*i], 'offset': replies[3 + 2*i]}
+                         for i, source in enumerate(sources)},
+        }
+
+    class Manual(Rigol_scpi_Subsystem):
+        '''
+        :CURSor:MANual  cursors placed by hand, X (time) or Y (volts) pairs
+        '''
+        def __init__(self, visa:Rigol_visa):
+            self.visa = visa
+
+        @scpi_property(':CURSor:MANual:TYPE', enum=CursorManualType)
+        def type(self):
+            '''
+            Set or query the cursor type in manual cursor measurement mode.
+
+            <type> {X|Y} default X
+                X: a pair of vertical cursors measuring the X-axis parameters (time)
+                Y: a pair of horizontal cursors measuring the Y-axis parameters (volts)
+            '''
+
+        @scpi_property(':CURSor:MANual:SOURce', enum=CursorSource)
+        def source(self):
+            '''
+            Set or query the channel source of the manual cursor measurement.
+
+            <source> {CHANnel1|CHANnel2|CHANnel3|CHANnel4|MATH|LA} default CHANnel1
+            '''
+
+        @scpi_property(':CURSor:MANual:TUNit', enum=CursorTimeUnit)
+        def time_unit(self):
+            '''
+            Set or query the horizontal unit in the manual cursor measurement mode.
+
+            <unit> {S|HZ|DEGRee|PERCent} default S
+                DEGRee/PERCent: the current X cursor positions become 0 and 360°/100 %
+            '''
+
+        @scpi_property(':CURSor:MANual:VUNit', enum=CursorVerticalUnit)
+        def vertical_unit(self):
+            '''
+            Set or query the vertical unit in the manual cursor measurement mode.
+
+            <unit> {PERCent|SOURce} default SOURce
+            '''
+
+        @scpi_property(':CURSor:MANual:AX', int, limits=(5, 594))
+        def ax(self):
+            '''
+            Set or query the horizontal position of cursor A. Pixels, 5 to 594, default 100
+            '''
+
+        @scpi_property(':CURSor:MANual:BX', int, limits=(5, 594))
+        def bx(self):
+            '''
+            Set or query the horizontal position of cursor B. Pixels, 5 to 594, default 500
+            '''
+
+        @scpi_property(':CURSor:MANual:AY', int, limits=(5, 394))
+        def ay(self):
+            '''
+            Set or query the vertical position of cursor A. Pixels, 5 to 394, default 100
+            '''
+
+        @scpi_property(':CURSor:MANual:BY', int, limits=(5, 394))
+        def by(self):
+            '''
+            Set or query the vertical position of cursor B. Pixels, 5 to 394, default 300
+            '''
+
+        @scpi_property(':CURSor:MANual:AXValue', float, readonly=True, volatile=True)
+        def ax_value(self):
+            ''' Query the X value of cursor A, in the time_unit '''
+
+        @scpi_property(':CURSor:MANual:BXValue', float, readonly=True, volatile=True)
+        def bx_value(self):
+            ''' Query the X value of cursor B, in the time_unit '''
+
+        @scpi_property(':CURSor:MANual:AYValue', float, readonly=True, volatile=True)
+        def ay_value(self):
+            ''' Query the Y value of cursor A, in the vertical_unit '''
+
+        @scpi_property(':CURSor:MANual:BYValue', float, readonly=True, volatile=True)
+        def by_value(self):
+            ''' Query the Y value of cursor B, in the vertical_unit '''
+
+        @scpi_property(':CURSor:MANual:XDELta', float, readonly=True, volatile=True)
+        def x_delta(self):
+            ''' Query BX - AX '''
+
+        @scpi_property(':CURSor:MANual:IXDELta', float, readonly=True, volatile=True)
+        def inverse_x_delta(self):
+            ''' Query 1/|BX - AX| '''
+
+        @scpi_property(':CURSor:MANual:YDELta', float, readonly=True, volatile=True)
+        def y_delta(self):
+            ''' Query BY - AY '''
+
+    class Track(Rigol_scpi_Subsystem):
+        '''
+        :CURSor:TRACk  cursors A and B follow the waveforms of source1 and source2
+        '''
+        def __init__(self, visa:Rigol_visa):
+            self.visa = visa
+
+        @scpi_property(':CURSor:TRACk:SOURce1', enum=CursorTrackSource)
+        def source1(self):
+            '''
+            Set or query the channel source of cursor A in the track cursor measurement mode.
+
+            <source> {OFF|CHANnel1|CHANnel2|CHANnel3|CHANnel4|MATH} default CHANnel1
+            '''
+
+        @scpi_property(':CURSor:TRACk:SOURce2', enum=CursorTrackSource)
+        def source2(self):
+            '''
+            Set or query the channel source of cursor B in the track cursor measurement mode.
+
+            <source> {OFF|CHANnel1|CHANnel2|CHANnel3|CHANnel4|MATH} default CHANnel1
+            '''
+
+        @scpi_property(':CURSor:TRACk:AX', int, limits=(5, 594))
+        def ax(self):
+            '''
+            Set or query the horizontal position of cursor A. Pixels, 5 to 594, default 100
+            '''
+
+        @scpi_property(':CURSor:TRACk:BX', int, limits=(5, 594))
+        def bx(self):
+            '''
+            Set or query the horizontal position of cursor B. Pixels, 5 to 594, default 500
+            '''
+
+        @scpi_property(':CURSor:TRACk:AY', int, readonly=True, volatile=True)
+        def ay(self):
+            ''' Query the vertical position (pixels) of cursor A, where it meets source1 '''
+
+        @scpi_property(':CURSor:TRACk:BY', int, readonly=True, volatile=True)
+        def by(self):
+            ''' Query the vertical position (pixels) of cursor B, where it meets source2 '''
+
+        @scpi_property(':CURSor:TRACk:AXValue', float, readonly=True, volatile=True)
+        def ax_value(self):
+            ''' Query the X value of cursor A, s '''
+
+        @scpi_property(':CURSor:TRACk:BXValue', float, readonly=True, volatile=True)
+        def bx_value(self):
+            ''' Query the X value of cursor B, s '''
+
+        @scpi_property(':CURSor:TRACk:AYValue', float, readonly=True, volatile=True)
+        def ay_value(self):
+            ''' Query the Y value of cursor A, in the unit of source1 '''
+
+        @scpi_property(':CURSor:TRACk:BYValue', float, readonly=True, volatile=True)
+        def by_value(self):
+            ''' Query the Y value of cursor B, in the unit of source2 '''
+
+        @scpi_property(':CURSor:TRACk:XDELta', float, readonly=True, volatile=True)
+        def x_delta(self):
+            ''' Query BX - AX, s '''
+
+        @scpi_property(':CURSor:TRACk:IXDELTA', float, readonly=True, volatile=True)
+        def inverse_x_delta(self):
+            ''' Query 1/|BX - AX|, Hz '''
+
+        @scpi_property(':CURSor:TRACk:YDELta', float, readonly=True, volatile=True)
+        def y_delta(self):
+            ''' Query BY - AY '''
+
+    class Auto(Rigol_scpi_Subsystem):
+        '''
+        :CURSor:AUTO  cursors placed by the scope on one of the enabled measurements
+        '''
+        def __init__(self, visa:Rigol_visa):
+            self.visa = visa
+
+        @scpi_property(':CURSor:AUTO:ITEM', enum=CursorAutoItem)
+        def item(self):
+            '''
+            Set or query the measurement item the auto cursors mark, among the
+            last five enabled measurements.
+
+            <item> {OFF|ITEM1|ITEM2|ITEM3|ITEM4|ITEM5} default OFF
+            '''
+
+        @scpi_property(':CURSor:AUTO:AX', int, readonly=True, volatile=True)
+        def ax(self):
+            ''' Query the horizontal position (pixels) of cursor A '''
+
+        @scpi_property(':CURSor:AUTO:BX', int, readonly=True, volatile=True)
+        def bx(self):
+            ''' Query the horizontal position (pixels) of cursor B '''
+
+        @scpi_property(':CURSor:AUTO:AY', int, readonly=True, volatile=True)
+        def ay(self):
+            ''' Query the vertical position (pixels) of cursor A '''
+
+        @scpi_property(':CURSor:AUTO:BY', int, readonly=True, volatile=True)
+        def by(self):
+            ''' Query the vertical position (pixels) of cursor B '''
+
+        @scpi_property(':CURSor:AUTO:AXValue', float, readonly=True, volatile=True)
+        def ax_value(self):
+            ''' Query the X value of cursor A '''
+
+        @scpi_property(':CURSor:AUTO:BXValue', float, readonly=True, volatile=True)
+        def bx_value(self):
+            ''' Query the X value of cursor B '''
+
+        @scpi_property(':CURSor:AUTO:AYValue', float, readonly=True, volatile=True)
+        def ay_value(self):
+            ''' Query the Y value of cursor A '''
+
+        @scpi_property(':CURSor:AUTO:BYValue', float, readonly=True, volatile=True)
+        def by_value(self):
+            ''' Query the Y value of cursor B '''
+
+    class XY(Rigol_scpi_Subsystem):
+        '''
+        :CURSor:XY  cursors of the XY time base (only available in XY mode)
+        '''
+        def __init__(self, visa:Rigol_visa):
+            self.visa = visa
+
+        @scpi_property(':CURSor:XY:AX', int, limits=(5, 394))
+        def ax(self):
+            '''
+            Set or query the horizontal position of cursor A. Pixels, 5 to 394, default 100
+            '''
+
+        @scpi_property(':CURSor:XY:BX', int, limits=(5, 394))
+        def bx(self):
+            '''
+            Set or query the horizontal position of cursor B. Pixels, 5 to 394, default 300
+            '''
+
+        @scpi_property(':CURSor:XY:AY', int, limits=(5, 394))
+        def ay(self):
+            '''
+            Set or query the vertical position of cursor A. Pixels, 5 to 394, default 100
+            '''
+
+        @scpi_property(':CURSor:XY:BY', int, limits=(5, 394))
+        def by(self):
+            '''
+            Set or query the vertical position of cursor B. Pixels, 5 to 394, default 300
+            '''
+
+        @scpi_property(':CURSor:XY:AXValue', float, readonly=True, volatile=True)
+        def ax_value(self):
+            ''' Query the X value of cursor A '''
+
+        @scpi_property(':CURSor:XY:BXValue', float, readonly=True, volatile=True)
+        def bx_value(self):
+            ''' Query the X value of cursor B '''
+
+        @scpi_property(':CURSor:XY:AYValue', float, readonly=True, volatile=True)
+        def ay_value(self):
+            ''' Query the Y value of cursor A '''
+
+        @scpi_property(':CURSor:XY:BYValue', float, readonly=True, volatile=True)
+        def by_value(self):
+            ''' Query the Y value of cursor B '''
+
+
+class Rigol_ds1000z_CursorEvaluator:
+    '''
+    Host-side cursor readouts, computed from a capture instead of queried.
+
+    Takes the cursor configuration once (Rigol_ds1000z_Cursor.config())
+    and a capture with the Rigol_ds1000z_Capture interface (preamble() and
+    codes() of the cursor sources, RAW or NORMal preamble); snapshot() then
+    returns the same dict as Rigol_ds1000z_Cursor.snapshot() without any
+    SCPI traffic. Track cursors read the two samples around their time only.
+
+    Manual and track modes are supported, with the default units (time in s,
+    Y values in the source unit). Move cursors by changing
+    evaluator.settings ('ax', 'bx', 'ay', 'by' pixels).
+
+    example:
+        evaluator = Rigol_ds1000z_CursorEvaluator(dso.cursor.config(), Rigol_ds1000z_Capture('run.rgc'))
+        while True:
+            show(evaluator.snapshot())
+    '''
+
+    def __init__(self, config:dict, capture=None):
+        '''
+        Args:
+            config (dict): Rigol_ds1000z_Cursor.config()
+            capture: capture the track cursors read from
+        '''
+        self.mode = CursorMode(config['mode'])
+        if self.mode not in (CursorMode.OFF, CursorMode.MANUAL, CursorMode.TRACK):
+            raise ValueError(f'{self.mode} cursors cannot be evaluated on the host')
+        self.settings = dict(config['settings'])
+        self.timebase = config['timebase']
+        self.channels = config['channels']
+        self.capture = capture
+
+    def time(self, x:float) -> float:
+        ''' Time (s, relative to the trigger) at horizontal pixel x '''
+        return (x - SCREEN_CENTRE_X) / PIXELS_PER_DIV * self.timebase['scale'] + self.timebase['offset']
+
+    def volts(self, y:float, source:str) -> float:
+        ''' Value of source at vertical pixel y '''
+        channel = self.channels[str(source)]
+        return (SCREEN_CENTRE_Y - y) / PIXELS_PER_DIV * channel['scale'] - channel['offset']
+
+    def waveform(self, source:str, t:float) -> float:
+        ''' Value of source at time t (s, relative to the trigger), interpolated; None outside the capture '''
+        if self.capture is None or str(source) == CursorTrackSource.OFF:
+            return None
+        preamble = self.capture.preamble(str(source))
+        trigger_position = getattr(self.capture, 'settings', {}).get('trigger', {}).get('position')
+        position = t / preamble['xincrement'] + Rigol_ds1000z_Wave._trigger_index(preamble, trigger_position)
+        index = int(position // 1)
+        if index < 0 or index + 1 >= self.capture.points(str(source)):
+            return None
+        before, after = (float(code) for code in self.capture.codes(str(source), index, index + 2))
+        code = before + (after - before) * (position - index)
+        return (code - preamble['yorigin'] - preamble['yreference']) * preamble['yincrement']
+
+    def snapshot(self) -> dict:
+        ''' Same keys as Rigol_ds1000z_Cursor.snapshot() '''
+        snapshot = {'mode': self.mode}
+        if self.mode == CursorMode.OFF:
+            return snapshot
+        settings = self.settings
+        ax, bx = self.time(settings['ax']), self.time(settings['bx'])
+        if self.mode == CursorMode.MANUAL:
+            source = settings['source']
+            ay, by = self.volts(settings['ay'], source), self.volts(settings['by'], source)
+        else:
+            ay, by = self.waveform(settings['source1'], ax), self.waveform(settings['source2'], bx)
+        snapshot.update(ax=ax, bx=bx, ay=ay, by=by, x_delta=bx - ax,
+                        inverse_x_delta=1 / abs(bx - ax) if bx != ax else None,
+                        y_delta=by - ay if ay is not None and by is not None else None)
+        return snapshot
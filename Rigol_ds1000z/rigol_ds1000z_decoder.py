@@ -1,38 +1,40 @@
 from .rigol_visa import Rigol_visa
-from .rigol_ds1000z_constants import class_has_value, OnOff, Polarity, Endianess,Edge, \
+from .rigol_ds1000z_scpi import Rigol_scpi_Subsystem, scpi_property
+from .rigol_ds1000z_constants import Polarity, Endianess,Edge, \
     DecoderMode, DecoderFormat, DecoderChannel, \
-    UartParity, UartStopBits, I2CAddressMode, SpiEdge, SpiTimeout
+    UartParity, UartStopBits, I2CAddressMode, SpiEdge, SpiSelect, SpiTimeout
 
     
-class Rigol_ds1000z_Decoder:
-    def __init__(self, visa_resource, n_decoder):
-        self.visa_resource = visa_resource
-        self.visa = Rigol_visa(visa_resource)
+class _Decoder_Subsystem(Rigol_scpi_Subsystem):
+    ''' Settings group of one decoder; fills {n} of the headers with the decoder number '''
+    def __init__(self, visa:Rigol_visa, n_decoder:int):
+        self.visa = visa
         self._decoder = n_decoder
-        self.threshold = self.Threshold(self.visa)
-        self.uart = self.UART(self.visa)
-        self.i2c = self.I2C(self.visa)
-        self.spi = self.SPI(self.visa)
-        self.parallel = self.Parallel(self.visa)
+        self._scpi_format = {'n': n_decoder}
 
 
-
-    @property
-    def mode(self) -> DecoderMode:
+class Rigol_ds1000z_Decoder(_Decoder_Subsystem):
+    def __init__(self, visa_resource, n_decoder):
+        self.visa_resource = visa_resource
+        super().__init__(Rigol_visa(visa_resource), n_decoder)
+        self.threshold = self.Threshold(self.visa, n_decoder)
+        self.configure = self.Configure(self.visa, n_decoder)
+        self.uart = self.UART(self.visa, n_decoder)
+        self.i2c = self.I2C(self.visa, n_decoder)
+        self.spi = self.SPI(self.visa, n_decoder)
+        self.parallel = self.Parallel(self.visa, n_decoder)
+
+    @scpi_property(':DECoder{n}:MODE', enum=DecoderMode)
+    def mode(self):
         '''
         :DECODER{0|1}:MODE[?] <mode>
-        Set or query the decoder type for decoder 1
+        Set or query the decoder type
 
         <mode> literal {PARallel|UART|SPI|IIC}; Default: PARallel
         '''
-        return int(self.visa.query(f':DECoder{self._decoder}:MODE?'))
-    @mode.setter
-    def mode(self, mode:DecoderMode):
-        self.visa.write(f':DECoder{self._decoder}:MODE {mode}')
-        return
-    
-    @property
-    def display(self) -> OnOff:
+
+    @scpi_property(':DECoder{n}:DISPlay', bool)
+    def display(self):
         '''
         :DECODER{0|1}:DISPLAY[?] <display>
         Turn on or off the decoder or query the status of the decoder.
@@ -41,30 +43,18 @@ class Rigol_ds1000z_Decoder:
 
         returns 1 if enabled, 0 if disabled
         '''
-        return int(self.visa.query(f':DECoder{self._decoder}:DISPlay?'))
-    @display.setter
-    def display(self, display:OnOff):
-        self.visa.write(f':DECoder{self._decoder}:DISPlay {display}')
-        return
-    
-  
-    @property
-    def format(self) -> DecoderFormat:
+
+    @scpi_property(':DECoder{n}:FORMat', enum=DecoderFormat)
+    def format(self):
         '''
         :DECODER{0|1}:FORMAT[?] <format>
         Set or query the bus display format.
 
         <format> literal {HEX|ASCii|DEC|BIN|LINE} default ASCII
         '''
-        return int(self.visa.query(f':DECoder{self._decoder}:FORMat?'))
-    @format.setter
-    def format(self, format:DecoderFormat):
-        self.visa.write(f':DECoder{self._decoder}:FORMat {format}')
-        return
-    
-  
-    @property
-    def position(self) -> int:
+
+    @scpi_property(':DECoder{n}:POSition', int, limits=(50, 350))
+    def position(self):
         '''
         DECODER{0|1}:POSITION[?] <position>
         Set or query the vertical position of the bus on the screen.
@@ -73,20 +63,11 @@ class Rigol_ds1000z_Decoder:
         default     Decoder 1: 350
                     Decoder 2: 300
         '''
-        return int(self.visa.query(f':DECoder{self._decoder}:POSition?'))
-    @position.setter
-    def position(self, position:int):
-        if position < 50: position = 50
-        if position > 350: position = 350
-        self.visa.write(f':DECoder{self._decoder}:POSition {position}')
-        return
-    
-    class Threshold:
-        def __init__(self, visa:Rigol_visa):
-            self.visa = visa
 
-        @property
-        def chan1(self) -> float:
+    class Threshold(_Decoder_Subsystem):
+
+        @scpi_property(':DECoder{n}:THREshold:CHANnel1', float, limits=lambda self: self._threshold_limits(1))
+        def chan1(self):
             '''
             :DECODER{0:1}:THRESHOLD:CHANNEL1[?] <threshold>
             Set or query the threshold level of the specified analog channel.
@@ -94,16 +75,9 @@ class Rigol_ds1000z_Decoder:
             <threshold> Real (-4 x VerticalScale - VerticalOffset) to
                             ( 4 x VerticalScale - VerticalOffset)
             '''
-            return float(self.visa.query(f':DECoder{self._decoder}:THREshold:CHANnel1?'))
-        @chan1.setter
-        def chan1(self, threshold:float):
-            chan = 1
-            threshold = self._verify_threshold(chan, threshold) 
-            self.visa.write(f':DECoder{self._decoder}:THREshold:CHANnel{chan} {threshold}')
-            return
-        
-        @property
-        def chan2(self) -> float:
+
+        @scpi_property(':DECoder{n}:THREshold:CHANnel2', float, limits=lambda self: self._threshold_limits(2))
+        def chan2(self):
             '''
             :DECODER{0:1}:THRESHOLD:CHANNEL2[?] <threshold>
             Set or query the threshold level of the specified analog channel.
@@ -111,16 +85,9 @@ class Rigol_ds1000z_Decoder:
             <threshold> Real (-4 x VerticalScale - VerticalOffset) to
                             ( 4 x VerticalScale - VerticalOffset)
             '''
-            return float(self.visa.query(f':DECoder{self._decoder}:THREshold:CHANnel2?'))
-        @chan2.setter
-        def chan2(self, threshold:float):
-            chan = 2
-            threshold = self._verify_threshold(chan, threshold)
-            self.visa.write(f':DECoder{self._decoder}:THREshold:CHANnel{chan} {threshold}')
-            return
-        
-        @property
-        def chan3(self) -> float:
+
+        @scpi_property(':DECoder{n}:THREshold:CHANnel3', float, limits=lambda self: self._threshold_limits(3))
+        def chan3(self):
             '''
             :DECODER{0:1}:THRESHOLD:CHANNEL3[?] <threshold>
             Set or query the threshold level of the specified analog channel.
@@ -128,16 +95,9 @@ class Rigol_ds1000z_Decoder:
             <threshold> Real (-4 x VerticalScale - VerticalOffset) to
                             ( 4 x VerticalScale - VerticalOffset)
             '''
-            return float(self.visa.query(f':DECoder{self._decoder}:THREshold:CHANnel3?'))
-        @chan3.setter
-        def chan3(self, threshold:float):
-            chan = 3
-            threshold = self._verify_threshold(chan, threshold)
-            self.visa.write(f':DECoder{self._decoder}:THREshold:CHANnel{chan} {threshold}')
-            return
-        
-        @property
-        def chan4(self) -> float:
+
+        @scpi_property(':DECoder{n}:THREshold:CHANnel4', float, limits=lambda self: self._threshold_limits(4))
+        def chan4(self):
             '''
             :DECODER{0:1}:THRESHOLD:CHANNEL4[?] <threshold>
             Set or query the threshold level of the specified analog channel.
@@ -145,67 +105,40 @@ class Rigol_ds1000z_Decoder:
             <thresh> Real (-4 x VerticalScale - VerticalOffset) to
                         (4 x VerticalScale - VerticalOffset)
             '''
-            return float(self.visa.query(f':DECoder{self._decoder}:THREshold:CHANnel4?'))
-        @chan4.setter
-        def chan4(self, threshold:float):
-            chan = 4
-            threshold = self._verify_threshold(chan, threshold) 
-            self.visa.write(f':DECoder{self._decoder}:THREshold:CHANnel{chan} {threshold}')
-            return
-        
-        def _verify_threshold(self, chan, thresh):
-            v_scale = self.visa.query(f":CHAN{chan}:SCALe?")
-            v_offset = self.visa.query(f":CHAN{chan}:OFFSet?")
-            if thresh < (-4*v_scale - v_offset): thresh = (-4*v_scale - v_offset)
-            if thresh > ( 4*v_scale + v_offset): thresh = ( 4*v_scale + v_offset) 
-            return thresh
-        
-        
-        @property
-        def auto(self) -> OnOff:
+
+        def _threshold_limits(self, chan) -> tuple:
+            ''' Threshold range of analog channel chan, from its current scale and offset '''
+            v_scale, v_offset = (float(reply) for reply in
+                                 self.visa.query_many([f':CHAN{chan}:SCALe?', f':CHAN{chan}:OFFSet?']))
+            return (-4*v_scale - v_offset, 4*v_scale - v_offset)
+
+        @scpi_property(':DECoder{n}:THREshold:AUTO', bool)
+        def auto(self):
             '''
             :DECODER{0:1}:THRESHOLD:AUTO[?] <threshold>
             Turn on or off the auto threshold function of the analog channels, or query the status of
             the auto threshold function of the analog channels.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:THREshold:AUTO?'))
-        @auto.setter
-        def auto(self, auto_on_off:OnOff):
-            self.visa.write(f':DECoder{self._decoder}:THREshold:AUTO {auto_on_off}')
-            return
-    
-    class Configure:
-        def __init__(self, visa:Rigol_visa):
-            self.visa = visa
-            
-        @property
-        def label(self) -> OnOff:
+
+    class Configure(_Decoder_Subsystem):
+        @scpi_property(':DECoder{n}:CONFig:LABel', bool)
+        def label(self):
             '''
-            :DECODER{0:1}:CONFIG:LABEL[?] <threshold>
+            :DECODER{0:1}:CONFIG:LABEL[?] <label>
             Turn on or off the label display function, or query the status of the label display function.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:CONFig:LABel?'))
-        @label.setter
-        def label(self, label:OnOff):
-            self.visa.write(f':DECoder{self._decoder}:CONFig:LABel {label}')
-            return
-        
-        @property
-        def line(self) -> OnOff:
+
+        @scpi_property(':DECoder{n}:CONFig:LINE', bool)
+        def line(self):
             '''
-            Turn on or off the label display function, or query the status of the label display function.
+            Turn on or off the bus display function, or query the status of the bus display function.
 
             When this function is enabled, the bus will be displayed on the screen. You can send
             the :DECoder<n>:POSition command to adjust the vertical display position of the bus.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:CONFig:LINE?'))
-        @line.setter
-        def line(self, line:OnOff):
-            self.visa.write(f':DECoder{self._decoder}:CONFig:LINE {line}')
-            return
-        
-        @property
-        def format(self) -> OnOff:
+
+        @scpi_property(':DECoder{n}:CONFig:FORMat', bool)
+        def format(self):
             '''
             Turn on or off the format display function, or query the status of the format display function.
 
@@ -213,15 +146,9 @@ class Rigol_ds1000z_Decoder:
             right of the label display (when the bus display is turned on). You can send
             the :DECoder<n>:FORMat command to set the bus display format.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:CONFig:FORMAT?'))
-        @format.setter
-        def format(self, format:OnOff):
-            self.visa.write(f':DECoder{self._decoder}:CONFig:FORMAT {format}')
-            return
-        
-        
-        @property
-        def endian(self) -> OnOff:
+
+        @scpi_property(':DECoder{n}:CONFig:ENDian', bool)
+        def endian(self):
             '''
             Turn on or off the endian display function in serial bus decoding, or query the status of
             the endian display function in serial bus decoding.
@@ -231,30 +158,18 @@ class Rigol_ds1000z_Decoder:
 
             This command is invalid in parallel decoding.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:CONFig:ENDIan?'))
-        @endian.setter
-        def endian(self, endian:OnOff):
-            self.visa.write(f':DECoder{self._decoder}:CONFig:ENDIan {endian}')
-            return
-        
 
-        @property
-        def width(self) -> OnOff:
+        @scpi_property(':DECoder{n}:CONFig:WIDth', bool)
+        def width(self):
             '''
             Turn on or off the width display function, or query the status of the width display function.
 
             When this function is enabled, the width of each frame of data will be displayed at the
             right of the endian display (when the bus display is turned on).   
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:CONFig:WIDth?'))
-        @width.setter
-        def width(self, width:OnOff):
-            self.visa.write(f':DECoder{self._decoder}:CONFig:WIDth {width}')
-            return
-        
 
-        @property
-        def samplerate(self) -> float:
+        @scpi_property(':DECoder{n}:CONFig:SRATe', float, readonly=True, volatile=True)
+        def samplerate(self):
             '''
             :DECODER{0|1}:CONFIG:SRATE?
             Query the current digital sample rate.  
@@ -263,26 +178,20 @@ class Rigol_ds1000z_Decoder:
             data source is "Trace"; at this point, the digital sample rate is related to the horizontal
             time base. 
             '''
-            return float(self.visa.query(f':DECoder{self._decoder}:CONFig:SRATe?'))
-    
+
 # ==================================================================================
 # ========                        UART                                     =========
 # ==================================================================================
 
-    class UART:
-        def __init__(self, visa:Rigol_visa):
-            self.visa = visa
-            
+    class UART(_Decoder_Subsystem):
         def setup_uart(self, tx_chan:DecoderChannel, rx_chan:DecoderChannel, baud:int):
             '''
             Helper function to setup UART
             '''
-            self.uart_tx = tx_chan
-            self.uart_rx = rx_chan
-            self.uart_baud = baud
+            self.set_many(tx=tx_chan, rx=rx_chan, baud_rate=baud)
 
-        @property
-        def tx(self) -> DecoderChannel:
+        @scpi_property(':DECoder{n}:UART:TX', enum=DecoderChannel)
+        def tx(self):
             '''
             :DECODER{0|1}:UART:TX[?] <channel>
             Set or query the TX channel source of RS232 decoding. 
@@ -290,14 +199,9 @@ class Rigol_ds1000z_Decoder:
             When OFF is selected, no TX channel source will be set. The TX channel source and RX
             channel source (:DECoder<n>:UART:RX) cannot be both set to OFF.  
             '''
-            return (self.visa.query(f':DECoder{self._decoder}:UART:TX?'))
-        @tx.setter
-        def tx(self, channel:DecoderChannel):
-            self.visa.write(f':DECoder{self._decoder}:UART:TX {channel}')
-            return
-        
-        @property
-        def rx(self) -> DecoderChannel:
+
+        @scpi_property(':DECoder{n}:UART:RX', enum=DecoderChannel)
+        def rx(self):
             '''
             :DECODER{0|1}:UART:RX[?] <channel>
             Set or query the RX channel source of RS232 decoding. 
@@ -305,15 +209,9 @@ class Rigol_ds1000z_Decoder:
             When OFF is selected, no RX channel source will be set. The RX channel source and TX
             channel source (:DECoder<n>:UART:TX) cannot be both set to OFF.
             '''
-            return (self.visa.query(f':DECoder{self._decoder}:UART:RX?'))
-        @rx.setter
-        def rx(self, channel:DecoderChannel):
-            self.visa.write(f':DECoder{self._decoder}:UART:RX {channel}')
-            return
-        
-        
-        @property
-        def polarity(self) -> Polarity:
+
+        @scpi_property(':DECoder{n}:UART:POLarity', enum=Polarity)
+        def polarity(self):
             '''
             :DECODER{0|1}:UART:POLARITY[?] <polarity>
             Set or query the polarity of RS232 decoding.
@@ -321,27 +219,15 @@ class Rigol_ds1000z_Decoder:
             POSITIVE polarity high is 1 and low is 0.
             NEGATIVE polarity high is 0 and low is 1.  
             '''
-            return (self.visa.query(f':DECoder{self._decoder}:UART:POLarity?'))
-        @polarity.setter
-        def polarity(self, polarity:Polarity):
-            self.visa.write(f':DECoder{self._decoder}:UART:POLarity {polarity}')
-            return
 
-    
-        @property
-        def endian(self) -> Endianess:
+        @scpi_property(':DECoder{n}:UART:ENDian', enum=Endianess)
+        def endian(self):
             '''
             Set or query the endian of RS232 decoding.  
             '''
-            return (self.visa.query(f':DECoder{self._decoder}:UART:ENDIan?'))
-        @endian.setter
-        def endian(self, endianess:Endianess):
-            self.visa.write(f':DECoder{self._decoder}:UART:ENDIan {endianess}')
-            return
-        
 
-        @property
-        def baud_rate(self) -> int:
+        @scpi_property(':DECoder{n}:UART:BAUD', int, limits=(110, 20000000))
+        def baud_rate(self):
             '''
             Set or query the buad rate of RS232 decoding. The default unit is bps (baud per second).
 
@@ -349,100 +235,56 @@ class Rigol_ds1000z_Decoder:
 
             Baud rate must be <int> between 110 and 20M.  Default 9600
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:UART:BAUD?'))
-        @baud_rate.setter
-        def baud_rate(self, baud_rate:int):
-            if (baud_rate < 110): baud_rate = 110
-            if (baud_rate > 20000000): baud_rate = 20000000
-            self.visa.write(f':DECoder{self._decoder}:UART:BAUD {baud_rate}')
-            return
-        
 
-        @property
-        def frame_width(self) -> int:
+        @scpi_property(':DECoder{n}:UART:WIDTh', int, limits=(5, 8))
+        def frame_width(self):
             '''
             :DECODER{0|1}:UART:WIDTH[?] <frame_width>
             Set or query the width of each frame of data in RS232 decoding.
 
             frame_width is an integer between 5 and 8; default 8.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:UART:WIDth?'))
-        @frame_width.setter
-        def frame_width(self, frame_width:int):
-            if (frame_width < 5): frame_width = 5
-            if (frame_width > 8): frame_width = 8
-            self.visa.write(f':DECoder{self._decoder}:UART:WIDth {frame_width}')
-            return
-        
-        
-        @property
-        def stop_bit(self) -> UartStopBits:
+
+        @scpi_property(':DECoder{n}:UART:STOP', enum=UartStopBits)
+        def stop_bit(self):
             '''
             :DECODER{0|1}:UART:STOP[?] <stop_bit>
             Set or query the stop bit after each frame of data in RS232 decoding.
 
             stop_bit is 1, 1.5, or 2; Default 1.
             '''
-            return float(self.visa.query(f':DECoder{self._decoder}:UART:STOP?'))
-        @stop_bit.setter
-        def stop_bit(self, stop_bits:UartStopBits):
-            self.visa.write(f':DECoder{self._decoder}:UART:STOP {stop_bits}')
-            return
-        
 
-        @property
-        def parity(self) -> UartParity:
+        @scpi_property(':DECoder{n}:UART:PARity', enum=UartParity)
+        def parity(self):
             '''
             Set or query the even-odd check mode of the data transmission in RS232 decoding.
 
             Parity is {NONE|EVEN|ODD}; Default NONE
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:UART:PARity?'))
-        @parity.setter
-        def parity(self, parity:UartParity):
-            self.visa.write(f':DECoder{self._decoder}:UART:PARity {parity}')
-            return
-    
 
 # ==================================================================================
 # ========                        I2C                                      =========
 # ==================================================================================
-    class I2C:
-        def __init__(self, visa:Rigol_visa):
-            self.visa = visa
-            
+    class I2C(_Decoder_Subsystem):
         def setup_i2c(self, clock:DecoderChannel, data:DecoderChannel):
-            self.i2c_clock = clock
-            self.i2c_data  = data
+            self.set_many(clock=clock, data=data)
 
-        @property
-        def clock(self) -> DecoderChannel:
+        @scpi_property(':DECoder{n}:IIC:CLK', enum=DecoderChannel)
+        def clock(self):
             '''
             :DECoder{0|1}:IIC:CLK[?] <channel>
             Set or query the signal source of the clock channel in I2C decoding.
             '''
-            return (self.visa.query(f':DECoder{self._decoder}:IIC:CLK?'))
-        @clock.setter
-        def clock(self, channel:DecoderChannel):
-            self.visa.write(f':DECoder{self._decoder}:IIC:CLK {channel}')
-            return
 
-
-        @property
-        def data(self) -> DecoderChannel:
+        @scpi_property(':DECoder{n}:IIC:DATA', enum=DecoderChannel)
+        def data(self):
             '''
             :DECoder{0|1}:IIC:DATA[?] <channel>
             Set or query the signal source of the data channel in I2C decoding.
             '''
-            return (self.visa.query(f':DECoder{self._decoder}:IIC:DATA?'))
-        @data.setter
-        def data(self, channel:DecoderChannel):
-            self.visa.write(f':DECoder{self._decoder}:IIC:DATA {channel}')
-            return
-        
 
-        @property
-        def address_mode(self) -> I2CAddressMode:
+        @scpi_property(':DECoder{n}:IIC:ADDRess', enum=I2CAddressMode)
+        def address_mode(self):
             '''
             :DECODER{0|1}:IIC:ADDRESS[?] <address_mode>
             Set or query the address mode of I2C decoding.
@@ -452,76 +294,44 @@ class Rigol_ds1000z_Decoder:
             NORMal: the address bits (:TRIGger:IIC:AWIDth) does not include the R/W bit.
             RW: the address bits (:TRIGger:IIC:AWIDth) includes the R/W bit.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:IIC:ADDRess?'))
-        @address_mode.setter
-        def address_mode(self, address_mode:I2CAddressMode):
-            self.visa.write(f':DECoder{self._decoder}:IIC:ADDRess {address_mode}')
-            return
 
 # ==================================================================================
 # ========                        SPI                                      =========
 # ==================================================================================
-    class SPI:
-        def __init__(self, visa:Rigol_visa):
-            self.visa = visa
-            
+    class SPI(_Decoder_Subsystem):
         def setup_spi(self, clock:DecoderChannel, miso:DecoderChannel, mosi:DecoderChannel, cs:DecoderChannel):
-            self.spi_clock = clock
-            self.spi_miso  = miso
-            self.spi_mosi  = mosi
-            self.spi_cs    = cs
+            self.set_many(clock=clock, miso=miso, mosi=mosi, cs=cs)
 
-        @property
-        def clock(self) -> DecoderChannel:
+        @scpi_property(':DECoder{n}:SPI:CLK', enum=DecoderChannel)
+        def clock(self):
             '''
             :DECODER{0|1}:SPI:CLK[?] <channel>
             Set or query the signal source of the clock channel in SPI decoding.
             '''
-            return str(self.visa.query(f':DECoder{self._decoder}:SPI:CLK?'))
-        @clock.setter
-        def clock(self, channel:DecoderChannel):
-            self.visa.write(f':DECoder{self._decoder}:SPI:CLK {channel}')
-            return
 
-        @property
-        def miso(self) -> DecoderChannel:
+        @scpi_property(':DECoder{n}:SPI:MISO', enum=DecoderChannel)
+        def miso(self):
             '''
             :DECODER{0|1}:SPI:MISO[?] <channel>
-            Set or query the signal source of the clock channel in SPI decoding.
+            Set or query the signal source of the MISO data channel in SPI decoding.
             '''
-            return str(self.visa.query(f':DECoder{self._decoder}:SPI:MISO?'))
-        @miso.setter
-        def miso(self, channel:DecoderChannel):
-            self.visa.write(f':DECoder{self._decoder}:SPI:MISO {channel}')
-            return
-
 
-        @property
-        def mosi(self) -> DecoderChannel:
+        @scpi_property(':DECoder{n}:SPI:MOSI', enum=DecoderChannel)
+        def mosi(self):
             '''
             :DECODER{0|1}:SPI:MOSI[?] <channel>
-            Set or query the signal source of the clock channel in SPI decoding.
+            Set or query the signal source of the MOSI data channel in SPI decoding.
             '''
-            return str(self.visa.query(f':DECoder{self._decoder}:SPI:MOSI?'))
-        @mosi.setter
-        def mosi(self, channel:DecoderChannel):
-            self.visa.write(f':DECoder{self._decoder}:SPI:MOSI {channel}')
-            return
 
-        @property
-        def cs(self) -> DecoderChannel:
+        @scpi_property(':DECoder{n}:SPI:CS', enum=DecoderChannel)
+        def cs(self):
             '''
             :DECODER{0|1}:SPI:CS[?] <channel>
-            Set or query the signal source of the clock channel in SPI decoding.
+            Set or query the signal source of the CS channel in SPI decoding.
             '''
-            return str(self.visa.query(f':DECoder{self._decoder}:SPI:CS?'))
-        @cs.setter
-        def cs(self, channel:DecoderChannel):
-            self.visa.write(f':DECoder{self._decoder}:SPI:CS {channel}')
-            return
-        
-        @property
-        def cs_polarity(self) -> str:
+
+        @scpi_property(':DECoder{n}:SPI:SELect', enum=SpiSelect)
+        def cs_polarity(self):
             '''
             Set or query the CS polarity in SPI decoding.
 
@@ -529,21 +339,11 @@ class Rigol_ds1000z_Decoder:
 
             Returns NCS if negative, CS if positive
             '''
-            return str(self.visa.query(f':DECoder{self._decoder}:SPI:SELect?'))
-        @cs_polarity.setter
-        def cs_polarity(self, cs_polarity:Polarity):
-            if cs_polarity == "NEG":
-                pol = "NCS"
-            else:
-                pol = "CS"
-            self.visa.write(f':DECoder{self._decoder}:SPI:SELect {pol}')
-            return
-
 
-        @property
-        def frame_sync_mode(self) -> SpiTimeout:
+        @scpi_property(':DECoder{n}:SPI:MODE', enum=SpiTimeout)
+        def frame_sync_mode(self):
             '''
-            :DECoder{0|1}:SPI:ENDIAN[?] <endianess>
+            :DECoder{0|1}:SPI:MODE[?] <cs_timeout>
             Set or query the frame synchronization mode of SPI decoding.
 
             CS: it contains a chip select line (CS). You can perform frame synchronization
@@ -556,14 +356,9 @@ class Rigol_ds1000z_Decoder:
 
             <cs_timeout> Discrete {CS|TIMeout} TIMeout
             '''
-            return str(self.visa.query(f':DECoder{self._decoder}:SPI:MODE?'))
-        @frame_sync_mode.setter
-        def frame_sync_mode(self, frame_sync_timeout:SpiTimeout):
-            self.visa.write(f':DECoder{self._decoder}:SPI:MODE {frame_sync_timeout}')
-            return
-        
-        @property
-        def timeout(self) -> float:
+
+        @scpi_property(':DECoder{n}:SPI:TIMeout', float)
+        def timeout(self):
             '''
             :DECoder{0|1}:SPI:TIMEOUT[?] <timeout>
             Set or query the timeout time in the timeout mode of SPI decoding. The default unit is s.           
@@ -573,123 +368,70 @@ class Rigol_ds1000z_Decoder:
 
             This command is only valid in the timeout mode (:DECoder<n>:SPI:MODE).
             '''
-            return float(self.visa.query(f':DECoder{self._decoder}:SPI:TIMeout?'))
-        @timeout.setter
-        def timeout(self, timeout:float):
-            #todo: return if spi_frame_sync_mode is CS??
-            self.visa.write(f':DECoder{self._decoder}:SPI:TIMeout {timeout}')
-            return
-        
 
-        @property
-        def polarity(self) -> Polarity:
+        @scpi_property(':DECoder{n}:SPI:POLarity', enum=Polarity)
+        def polarity(self):
             '''
             :DECoder{0|1}:SPI:POLARITY[?] <polarity>
-            Set or query the timeout time in the timeout mode of SPI decoding. The default unit is s.           
+            Set or query the polarity of the SDA data line in SPI decoding.
 
-            The timeout time should be greater than the maximum pulse width of the clock and
-            lower than the idle time between frames.
-
-            This command is only valid in the timeout mode (:DECoder<n>:SPI:MODE).
+            POSITIVE polarity high is 1 and low is 0.
+            NEGATIVE polarity high is 0 and low is 1.
             '''
-            return float(self.visa.query(f':DECoder{self._decoder}:SPI:POLarity?'))
-        @polarity.setter
-        def polarity(self, polarity:Polarity):
-            self.visa.write(f':DECoder{self._decoder}:SPI:POLarity {polarity}')
-            return
-        
 
-        @property
-        def edge(self) -> SpiEdge:
+        @scpi_property(':DECoder{n}:SPI:EDGE', enum=SpiEdge)
+        def edge(self):
             '''
             :DECoder{0|1}:SPI:EDGE[?] <edge>
             Set or query the clock type (edge) when the instrument samples the data line in SPI decoding.
             '''
-            return float(self.visa.query(f':DECoder{self._decoder}:SPI:EDGE?'))
-        @edge.setter
-        def edge(self, edge:SpiEdge):
-            self.visa.write(f':DECoder{self._decoder}:SPI:EDGE {edge}')
-            return
-        
-        @property
-        def endian(self) -> Endianess:
+
+        @scpi_property(':DECoder{n}:SPI:ENDian', enum=Endianess)
+        def endian(self):
             '''
             :DECoder{0|1}:SPI:ENDIAN[?] <endianess>
             Set or query the endian of the SPI decoding data.
 
             LSB or MSB, default MSB
             '''
-            return float(self.visa.query(f':DECoder{self._decoder}:SPI:ENDian?'))
-        @endian.setter
-        def endian(self, endianess:Endianess):
-            self.visa.write(f':DECoder{self._decoder}:SPI:ENDian {endianess}')
-            return
-        
-        @property
-        def frame_width(self) -> int:
+
+        @scpi_property(':DECoder{n}:SPI:WIDTh', int, limits=(8, 32))
+        def frame_width(self):
             '''
             :DECoder{0|1}:SPI:WIDTh[?] <width>
             Set or query the number of bits of each frame of data in SPI decoding.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:SPI:WIDTh?'))
-        @frame_width.setter
-        def frame_width(self, width:int):
-            if width < 8:  width = 8
-            if width > 32: width = 32
-            self.visa.write(f':DECoder{self._decoder}:SPI:WIDTh {width}')
-            return
-    
-
 
 # ==================================================================================
 # ========                        PARALLEL                                 =========
 # ==================================================================================
 
-    class Parallel:
-        def __init__(self, visa:Rigol_visa):
-            self.visa = visa
-            
-        @property
-        def clock(self) -> DecoderChannel:
+    class Parallel(_Decoder_Subsystem):
+        @scpi_property(':DECoder{n}:PARallel:CLK', enum=DecoderChannel)
+        def clock(self):
             '''
             :DECoder<n>:PARallel:CLK
             Set or query the CLK channel source of parallel decoding.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:PARallel:CLK?'))
-        @clock.setter
-        def clock(self, channel:DecoderChannel):
-            self.visa.write(f':DECoder{self._decoder}:PARallel:CLK {channel}')
-            return
-        
 
-        @property
-        def edge(self) -> Edge:
+        @scpi_property(':DECoder{n}:PARallel:EDGE', enum=Edge)
+        def edge(self):
             '''
             :DECoder<n>:PARallel:EDGE
             Set or query the edge type of the clock channel when the instrument samples the data
             channel in parallel decoding.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:PARallel:EDGE?'))
-        @edge.setter
-        def edge(self, edge:Edge):
-            self.visa.write(f':DECoder{self._decoder}:PARallel:EDGE {edge}')
-            return
-        
-        @property
-        def width(self) -> int:
+
+        @scpi_property(':DECoder{n}:PARallel:WIDTh', int, limits=(1, 16))
+        def width(self):
             '''
             :DECoder<n>:PARallel:WIDTh
             Set or query the data width (namely the number of bits of each frame of data) of the
             parallel bus.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:PARallel:WIDTH?'))
-        @width.setter
-        def width(self, bit_width:int):
-            self.visa.write(f':DECoder{self._decoder}:PARallel:WIDTH {bit_width}')
-            return
-        
-        @property
-        def bitx(self) -> int:
+
+        @scpi_property(':DECoder{n}:PARallel:BITX', int, limits=(0, 15))
+        def bitx(self):
             '''
             :DECoder<n>:PARallel:BITX
             Set or query the data bit that requires a channel source on the parallel bus.
@@ -704,14 +446,9 @@ class Rigol_ds1000z_Decoder:
 
 
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:PARallel:BITX?'))
-        @bitx.setter
-        def bitx(self, bit_width:int):
-            self.visa.write(f':DECoder{self._decoder}:PARallel:BITX {bit_width}')
-            return
-        
-        @property
-        def bitx(self) -> DecoderChannel:
+
+        @scpi_property(':DECoder{n}:PARallel:SOURce', enum=DecoderChannel)
+        def bit_source(self):
             '''
             :DECoder<n>:PARallel:SOURce
             Set ro query the channel source of the data bit currently selected.
@@ -719,26 +456,16 @@ class Rigol_ds1000z_Decoder:
             Before sending this command, use the :DECoder<n>:PARallel:BITX command to select
             the desired data bit.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:PARallel:SOURce?'))
-        @bitx.setter
-        def bitx(self, channel:DecoderChannel):
-            self.visa.write(f':DECoder{self._decoder}:PARallel:SOURce {channel}')
-            return
 
-        @property
-        def polarity(self) -> Polarity:
+        @scpi_property(':DECoder{n}:PARallel:POLarity', enum=Polarity)
+        def polarity(self):
             '''
             :DECoder<n>:PARallel:POLarity
             Set ro query the data polarity of parallel decoding.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:PARallel:POLarity?'))
-        @polarity.setter
-        def polarity(self, polarity:Polarity):
-            self.visa.write(f':DECoder{self._decoder}:PARallel:POLarity {polarity}')
-            return
 
-        @property
-        def noise_rejection(self) -> OnOff:
+        @scpi_property(':DECoder{n}:PARallel:NREJect', bool)
+        def noise_rejection(self):
             '''
             :DECoder<n>:PARallel:NREJect
             Turn on or off the noise rejection function of parallel decoding, or query the status of the
@@ -750,15 +477,9 @@ class Rigol_ds1000z_Decoder:
             When the noise rejection is turned on, sending the :DECoder<n>:PARallel:NRTime
             command can set the desired rejection time.
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:PARallel:NREJect?'))
-        @noise_rejection.setter
-        def noise_rejection(self, noise_reject:OnOff):
-            self.visa.write(f':DECoder{self._decoder}:PARallel:NREJect {noise_reject}')
-            return
 
-    
-        @property
-        def noise_rejection_time(self) -> float:
+        @scpi_property(':DECoder{n}:PARallel:NRTime', float, limits=(0, 0.1))
+        def noise_rejection_time(self):
             '''
             :DECoder<n>:PARallel:NRTime
             Set or query the noise rejection time of parallel decoding. The default unit is s.
@@ -768,16 +489,9 @@ class Rigol_ds1000z_Decoder:
             Before sending this command, send the :DECoder<n>:PARallel:NREJect command to
             turn on the noise rejection function.            
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:PARallel:NRTime?'))
-        @noise_rejection_time.setter
-        def noise_rejection_time(self, time_s:float):
-            if time_s < 0: time_s = 0
-            if time_s > 0.1: time_s = 0.1
-            self.visa.write(f':DECoder{self._decoder}:PARallel:NRTime {time_s}')
-            return  
 
-        @property
-        def clock_compenstation_time(self) -> float:
+        @scpi_property(':DECoder{n}:PARallel:CCOMpensation', float, limits=(-0.1, 0.1))
+        def clock_compenstation_time(self):
             '''
             :DECoder<n>:PARallel:CCOMpensation
             Set or query the clock compensation time of parallel decoding. The default unit is s.
@@ -790,16 +504,9 @@ class Rigol_ds1000z_Decoder:
             This command is invalid when the CLK channel source is set to OFF
             (:DECoder<n>:PARallel:CLK).          
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:PARallel:CCOM?'))
-        @clock_compenstation_time.setter
-        def clock_compenstation_time(self, time_s:float):
-            if time_s < -0.1: time_s = -0.1
-            if time_s >  0.1: time_s =  0.1
-            self.visa.write(f':DECoder{self._decoder}:PARallel:CCOM {time_s}')
-            return  
 
-        @property
-        def plot_curve(self) -> OnOff:
+        @scpi_property(':DECoder{n}:PARallel:PLOT', bool)
+        def plot_curve(self):
             '''
             :DECoder<n>:PARallel:PLOT
             Turn on or off the curve function of parallel decoding, or query the status of the curve
@@ -808,8 +515,3 @@ class Rigol_ds1000z_Decoder:
             When this function is turned on, the variation trend of the bus data is displayed in vector
             diagram form.       
             '''
-            return int(self.visa.query(f':DECoder{self._decoder}:PARallel:PLOT?'))
-        @plot_curve.setter
-        def plot_curve(self, plot:OnOff):
-            self.visa.write(f':DECoder{self._decoder}:PARallel:PLOT {plot}')
-            return  
\ No newline at end of file
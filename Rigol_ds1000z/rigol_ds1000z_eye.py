@@ -0,0 +1,263 @@
+import numpy as np
+import math
+
+'''
+Eye diagram / persistence histogram.
+
+Every sample of a capture is binned by its time folded onto the unit
+interval (UI) and its BYTE code into a 2-D uint32 histogram:
+
+    rows     the 256 codes
+    columns  `span` UIs split in `bins` columns, the bit transitions at
+             0.5 and 1.5 UI so the eye opening sits in the middle
+
+Samples are folded modulo one UI and the UI is repeated `span` times, as
+on a scope's eye display (folding modulo the span would put a periodic
+pattern's same bit on the same columns every time); each sample thus
+counts once per UI shown. Binning is one np.bincount per chunk of points.
+The histogram only grows by addition, so histograms filled by different
+processes (e.g. the analyzers of Rigol_ds1000z_AnalysisPool) are combined
+with merge().
+'''
+
+_CODES = 256
+_CHUNK_POINTS = 1 << 20
+_CLOCK_FIT_PASSES = 4 # bit count / UI fit rounds of recover_clock()
+
+
+def crossings(codes:np.ndarray, threshold:float, xincrement:float=1.0) -> np.ndarray:
+    '''
+    Times of the threshold crossings (either direction) of codes, linearly
+    interpolated between the samples around each crossing.
+
+    Args:
+        codes: BYTE codes
+        threshold (float): crossing level, in codes
+        xincrement (float): sample interval, s
+
+    Returns: float64 array of crossing times, relative to codes[0], s
+    '''
+    above = codes > threshold
+    index = np.flatnonzero(above[1:] != above[:-1])
+    before = codes[index].astype(np.float64)
+    after = codes[index + 1].astype(np.float64)
+    return (index + (threshold - before) / (after - before)) * xincrement
+
+
+def recover_clock(edges:np.ndarray, unit_interval:float=None) -> tuple:
+    '''
+    Unit interval and phase of the data clock from crossing times.
+
+    Without unit_interval the UI is first estimated from the shortest
+    crossing intervals (single bits), then refined by a least squares fit of
+    edge time against bit number. Bit numbers count each interval as its
+    number of UIs (as rigol_ds1000z_jitter does), so the rounding error of
+    the estimate does not accumulate over the capture; the count and fit
+    are repeated with the refined UI until the count no longer changes.
+    The phase is the circular mean of the edge times modulo the UI, i.e. the
+    time of the average transition.
+
+    Args:
+        edges: crossing times, s (see crossings())
+        unit_interval (float): known UI, s; only the phase is recovered
+
+    Returns: (unit_interval, phase) in s
+    '''
+    if len(edges) < 3:
+        raise ValueError(f'{len(edges)} edges are not enough to recover the clock')
+    if unit_interval is None:
+        intervals = np.diff(edges)
+        shortest = np.percentile(intervals, 5)
+        unit_interval = float(np.median(intervals[intervals < 1.5 * shortest]))
+        bits, steps = np.zeros(len(edges)), None
+        for _ in range(_CLOCK_FIT_PASSES):
+            counted = np.rint(intervals / unit_interval)
+            if steps is not None and np.array_equal(counted, steps):
+                break
+            steps = counted
+            np.cumsum(steps, out=bits[1:])
+            unit_interval = float(np.polyfit(bits, edges, 1)[0])
+    angle = 2 * np.pi * edges / unit_interval
+    phase = math.atan2(np.sin(angle).mean(), np.cos(angle).mean()) * unit_interval / (2 * np.pi)
+    return unit_interval, phase % unit_interval
+
+
+class Rigol_ds1000z_Eye:
+    '''
+    Eye diagram accumulator (see the module notes).
+
+    example:
+        eye = Rigol_ds1000z_Eye(unit_interval=1/115200)
+        for segment in engine:
+            eye.add_segment(segment, WaveSource.CHAN1)
+        print(eye.metrics())
+        image = eye.histogram   # codes x columns, uint32
+    '''
+
+    def __init__(self, unit_interval:float=None, bins:int=256, span:int=2,
+                 threshold:float=None, recover_phase:bool=True):
+        '''
+        Args:
+            unit_interval (float): bit period, s; None recovers it from the first capture
+            bins (int): histogram columns over span UIs, a multiple of span
+            span (int): UIs shown
+            threshold (float): decision level in codes; None takes the middle
+                of the code range of the first capture
+            recover_phase (bool): realign every capture on its own edges
+                (captures triggered at arbitrary bit positions); False keeps
+                the phase of the first one
+        '''
+        self.unit_interval = unit_interval
+        if bins % span:
+            raise ValueError(f'bins ({bins}) must be a multiple of span ({span})')
+        self.bins = bins
+        self.span = span
+        self.threshold = threshold
+        self.recover_phase = recover_phase
+        self.phase = None
+        self.preamble = None
+        self.histogram = np.zeros((_CODES, bins), np.uint32)
+        self.captures = 0
+        self.samples = 0
+
+    def add(self, codes:np.ndarray, preamble:dict, t0:float=0.0, edges:np.ndarray=None):
+        '''
+        Bin one capture.
+
+        Args:
+            codes: BYTE codes
+            preamble (dict): preamble of the capture (xincrement, and the
+                vertical scale kept for metrics())
+            t0 (float): time of codes[0], s (e.g. the window offset)
+            edges: sorted threshold crossing times relative to codes[0], s,
+                when already known (see add_capture)
+        '''
+        codes = np.asarray(codes)
+        xinc = preamble['xincrement']
+        if self.preamble is None:
+            self.preamble = preamble
+        if self.threshold is None:
+            self.threshold = (int(codes.min()) + int(codes.max())) / 2
+        if self.unit_interval is None or self.phase is None or self.recover_phase:
+            edges = t0 + (crossings(codes, self.threshold, xinc) if edges is None else edges)
+            self.unit_interval, self.phase = recover_clock(edges, self.unit_interval)
+        # position of sample i in the UI: (t0 + i*xinc - phase) / UI + 0.5, mod 1
+        step = xinc / self.unit_interval
+        first = (t0 - self.phase) / self.unit_interval + 0.5
+        columns = self.bins // self.span
+        folded = np.zeros(_CODES * columns, np.int64)
+        size = min(len(codes), _CHUNK_POINTS)
+        ramp = np.arange(size, dtype=np.float64)
+        position, whole = np.empty(size), np.empty(size)
+        index, rows = np.empty(size, np.intp), np.empty(size, np.intp)
+        for start in range(0, len(codes), size):
+            chunk = codes[start:start + size]
+            n = len(chunk)
+            np.multiply(ramp[:n], step, out=position[:n])
+            position[:n] += first + start * step
+            np.floor(position[:n], out=whole[:n]) # mod 1, much faster than np.mod
+            position[:n] -= whole[:n]
+            position[:n] *= columns
+            index[:n] = position[:n]
+            np.minimum(index[:n], columns - 1, out=index[:n]) # float rounding at the wrap
+            rows[:n] = chunk
+            rows[:n] *= columns
+            index[:n] += rows[:n]
+            folded += np.bincount(index[:n], minlength=folded.size)
+        self.histogram += np.tile(folded.reshape(_CODES, columns), (1, self.span)).astype(np.uint32)
+        self.captures += 1
+        self.samples += len(codes)
+
+    def add_segment(self, segment:dict, source):
+        ''' Bin source of a Rigol_ds1000z_Segmented segment '''
+        preamble = segment['preamble'][source]
+        self.add(segment['data'][source], preamble, (segment['start'] - 1) * preamble['xincrement'])
+
+    def add_capture(self, capture, name:str):
+        '''
+        Bin channel name of a capture (Rigol_ds1000z_Capture, or the capture
+        handed to Rigol_ds1000z_AnalysisPool analyzers). The clock is
+        recovered from the capture's memoized edges(); without a threshold
+        the middle measure threshold is used.
+        '''
+        preamble = self.preamble or capture.preamble(name)
+        if self.threshold is None:
+            level = capture.thresholds(name)['mid']
+            self.threshold = capture._code(name, level)
+        else:
+            level = (self.threshold - preamble['yorigin'] - preamble['yreference']) * preamble['yincrement']
+        edges = capture.edges(name, level)
+        edges = np.sort(np.concatenate((edges['rising'], edges['falling']))) * capture.preamble(name)['xincrement']
+        self.add(capture.codes(name), capture.preamble(name), edges=edges)
+
+    def merge(self, other:'Rigol_ds1000z_Eye'):
+        ''' Add the histogram of other (same bins, span and unit interval) '''
+        if other.histogram.shape != self.histogram.shape or other.span != self.span:
+            raise ValueError('eye histograms with different bins or span')
+        if self.unit_interval is None:
+            self.unit_interval, self.phase = other.unit_interval, other.phase
+        elif other.unit_interval is not None and not math.isclose(other.unit_interval, self.unit_interval, rel_tol=1e-3):
+            raise ValueError(f'unit intervals {other.unit_interval} and {self.unit_interval} differ')
+        if self.threshold is None:
+            self.threshold = other.threshold
+        if self.preamble is None:
+            self.preamble = other.preamble
+        self.histogram += other.histogram
+        self.captures += other.captures
+        self.samples += other.samples
+
+    def reset(self):
+        self.histogram.fill(0)
+        self.captures = 0
+        self.samples = 0
+
+    def column_time(self) -> np.ndarray:
+        ''' Time of each column's left edge, relative to the eye centre, s '''
+        return (np.arange(self.bins) / self.bins * self.span - self.span / 2) * self.unit_interval
+
+    def metrics(self, floor:float=1e-3, centre_ui:float=0.1) -> dict:
+        '''
+        Eye opening.
+
+        Height: gap between the lowest code of the upper level and the
+        highest code of the lower level over the centre_ui wide columns in
+        the middle of the eye (keep it wider than one sample interval, or
+        some columns get no samples at all). Width: run of
+        columns around the centre without threshold crossings. Bins holding
+        less than floor times the busiest bin of the centre (of the
+        threshold rows) count as empty.
+
+        Returns: dict
+            'eye_height'     volts (codes without a preamble)
+            'eye_height_codes'
+            'eye_width'      s
+            'eye_width_ui'   fraction of a UI
+            'unit_interval'  s
+            'threshold'      codes
+            'samples'        samples binned
+        '''
+        hist = self.histogram
+        half = self.bins // 2
+        reach = max(1, int(round(centre_ui / 2 * self.bins / self.span)))
+        centre = hist[:, half - reach:half + reach].sum(axis=1)
+        centre = np.flatnonzero(centre > floor * centre.max())
+        upper = centre[centre > self.threshold]
+        lower = centre[centre <= self.threshold]
+        height = int(upper.min() - lower.max()) if len(upper) and len(lower) else 0
+        threshold = int(round(self.threshold))
+        band = hist[max(threshold - 1, 0):threshold + 2].sum(axis=0)
+        crossed = band > floor * band.max()
+        right = np.flatnonzero(crossed[half:])
+        left = np.flatnonzero(crossed[:half][::-1])
+        open_columns = (right[0] if len(right) else self.bins - half) + (left[0] if len(left) else half)
+        width_ui = open_columns * self.span / self.bins
+        yinc = self.preamble['yincrement'] if self.preamble else 1
+        return {
+            'eye_height': max(height, 0) * yinc,
+            'eye_height_codes': max(height, 0),
+            'eye_width': width_ui * self.unit_interval,
+            'eye_width_ui': width_ui,
+            'unit_interval': self.unit_interval,
+            'threshold': self.threshold,
+            'samples': self.samples,
+        }
@@ -0,0 +1,208 @@
+from .rigol_ds1000z_constants import WaveSource, WaveMode, TriggerSlope
+from .rigol_ds1000z_wave import Rigol_ds1000z_Wave
+from .rigol_ds1000z_search import find_edges
+import numpy as np
+
+'''
+Jitter and time interval error (TIE) over the full memory depth.
+
+:MEASure:ITEM PERiod gives statistics of the periods on screen. Here every
+edge of a RAW capture is timestamped (find_edges(), interpolated between
+the two samples around the crossing) and the series are built from them:
+
+    period          time between consecutive edges
+    cycle_to_cycle  difference of consecutive periods
+    tie             edge time minus the time of the same edge of the ideal
+                    clock, the least squares fit of edge time against
+                    cycle number (or a fixed nominal period)
+
+Cycle numbers count each interval as its number of median periods, so an
+edge lost in noise does not shift all the following ones by a cycle.
+Everything is a whole-array operation on the edges; spectra average
+Hann-windowed segments of the series (Welch), so a long series is
+transformed a segment at a time.
+'''
+
+_SEGMENT = 1 << 16
+
+
+class Rigol_ds1000z_Jitter:
+    '''
+    Period, cycle-to-cycle and TIE jitter of a clock (see the module notes).
+
+    example:
+        jitter = Rigol_ds1000z_Jitter.from_scope(dso, WaveSource.CHAN1)
+        print(jitter.statistics())          # {'period': {'mean', 'rms', 'pk_pk', ...}, 'tie': {...}, ...}
+        counts, bins = jitter.histogram('tie')
+        frequency, amplitude = jitter.spectrum('tie')
+    '''
+
+    SERIES = ('period', 'cycle_to_cycle', 'tie')
+
+    def __init__(self, positions:np.ndarray, preamble:dict, trigger_position:int=None,
+                 nominal_period:float=None):
+        '''
+        Args:
+            positions: sorted fractional sample positions of the edges (see find_edges)
+            preamble (dict): RAW preamble of the capture
+            trigger_position (int): trigger.position of the capture
+            nominal_period (float): ideal clock period, s; None fits it to the edges
+                (one slope: the clock period; RISE_FALL edges: half of it)
+        '''
+        if len(positions) < 3:
+            raise ValueError(f'{len(positions)} edges are not enough for jitter analysis')
+        self.preamble = preamble
+        # in place where possible: millions of edges make every temporary count
+        self.times = np.array(positions, np.float64)
+        self.times -= Rigol_ds1000z_Wave._trigger_index(preamble, trigger_position)
+        self.times *= preamble['xincrement']
+        intervals = np.diff(self.times)
+        estimate = nominal_period or float(np.median(intervals[:_SEGMENT]))
+        steps = intervals / estimate
+        np.rint(steps, out=steps)
+        self.cycles = np.zeros(len(self.times)) # float64 holds cycle numbers exactly
+        np.cumsum(steps, out=self.cycles[1:])
+        if nominal_period is None:
+            # least squares line through (cycle, time)
+            count = len(self.times)
+            mean_cycle, mean_time = self.cycles.mean(), self.times.mean()
+            self.unit_interval = float((np.dot(self.cycles, self.times) - count * mean_cycle * mean_time)
+                                       / (np.dot(self.cycles, self.cycles) - count * mean_cycle**2))
+        else:
+            self.unit_interval = float(nominal_period)
+        self.tie = self.cycles * self.unit_interval
+        np.subtract(self.times, self.tie, out=self.tie)
+        self.phase = float(self.tie.mean())
+        self.tie -= self.phase
+        if np.all(steps == 1):
+            self.period = intervals
+        else:
+            valid = steps > 0
+            self.period = intervals[valid] / steps[valid] # averaged over the cycles of a lost edge
+        self.cycle_to_cycle = np.diff(self.period)
+
+    @classmethod
+    def from_codes(cls, codes:np.ndarray, preamble:dict, level:float=None, hysteresis:float=0.0,
+                   slope:TriggerSlope=TriggerSlope.POSITIVE, trigger_position:int=None,
+                   nominal_period:float=None) -> 'Rigol_ds1000z_Jitter':
+        '''
+        Analyse the edges of slope in RAW BYTE codes.
+
+        Args:
+            level (float): threshold, volts; None takes the middle of the code range
+            hysteresis (float): total hysteresis band, volts
+        '''
+        codes = np.asarray(codes)
+        yinc = preamble['yincrement']
+        if level is None:
+            level_code = (int(codes.min()) + int(codes.max())) / 2
+        else:
+            level_code = level / yinc + preamble['yorigin'] + preamble['yreference']
+        rising, falling = find_edges(codes, level_code, hysteresis / yinc)
+        return cls(cls._slope(rising, falling, slope), preamble, trigger_position, nominal_period)
+
+    @classmethod
+    def from_scope(cls, dso, source:WaveSource=WaveSource.CHAN1, level:float=None, hysteresis:float=0.0,
+                   slope:TriggerSlope=TriggerSlope.POSITIVE, nominal_period:float=None) -> 'Rigol_ds1000z_Jitter':
+        ''' Download the full RAW memory of source and analyse it (see from_codes) '''
+        wave = dso.wave
+        with dso.transaction():
+            wave._setup_read(source, WaveMode.RAW)
+            preamble = wave.preamble
+            position = dso.trigger.position
+            codes = wave.read_data(1, preamble['points'])
+        return cls.from_codes(codes, preamble, level, hysteresis, slope, position, nominal_period)
+
+    @classmethod
+    def from_capture(cls, capture, name:str, level:float=None, hysteresis:float=0.0,
+                     slope:TriggerSlope=TriggerSlope.POSITIVE, nominal_period:float=None) -> 'Rigol_ds1000z_Jitter':
+        '''
+        Analyse channel name of a saved capture (Rigol_ds1000z_Capture or an
+        analysis pool capture) from its memoized edges(); the level
+        defaults to the middle measure threshold.
+        '''
+        edges = capture.edges(name, level, hysteresis)
+        position = capture.settings.get('trigger', {}).get('position')
+        return cls(cls._slope(edges['rising'], edges['falling'], slope), capture.preamble(name), position, nominal_period)
+
+    @staticmethod
+    def _slope(rising:np.ndarray, falling:np.ndarray, slope:TriggerSlope) -> np.ndarray:
+        slope = TriggerSlope(slope)
+        if slope == TriggerSlope.RISE_FALL:
+            return np.sort(np.concatenate((rising, falling)), kind='stable') # merges the two sorted runs
+        return rising if slope == TriggerSlope.POSITIVE else falling
+
+    def series(self, name:str) -> np.ndarray:
+        ''' 'period', 'cycle_to_cycle' or 'tie', s '''
+        if name not in self.SERIES:
+            raise ValueError(f'unknown jitter series {name}, expected one of {self.SERIES}')
+        return getattr(self, name)
+
+    def statistics(self) -> dict:
+        '''
+        Returns: dict
+            'edges', 'unit_interval' (s), 'frequency' (Hz)
+            'period', 'cycle_to_cycle', 'tie': {'count', 'mean', 'std', 'rms', 'min', 'max', 'pk_pk'}, s
+        '''
+        statistics = {
+            'edges': len(self.times),
+            'unit_interval': self.unit_interval,
+            'frequency': 1 / self.unit_interval,
+        }
+        for name in self.SERIES:
+            values = self.series(name)
+            low, high = (float(values.min()), float(values.max())) if len(values) else (np.nan, np.nan)
+            mean = float(values.mean()) if len(values) else np.nan
+            statistics[name] = {
+                'count': len(values),
+                'mean': mean,
+                'std': float(np.std(values)) if len(values) else np.nan,
+                'rms': float(np.sqrt(np.dot(values, values) / len(values))) if len(values) else np.nan,
+                'min': low,
+                'max': high,
+                'pk_pk': high - low,
+            }
+        return statistics
+
+    def histogram(self, name:str='tie', bins:int=256, range:tuple=None) -> tuple:
+        '''
+        Histogram of a series.
+
+        Args:
+            name (str): 'period', 'cycle_to_cycle' or 'tie'
+            bins (int): number of bins
+            range (tuple): (low, high) s; the span of the series by default
+
+        Returns: (counts, bin_edges) as np.histogram
+        '''
+        return np.histogram(self.series(name), bins, range)
+
+    def spectrum(self, name:str='tie', segment:int=_SEGMENT) -> tuple:
+        '''
+        Jitter spectrum of a series, one sample per clock cycle: the RMS
+        amplitude of the sine components (a periodic jitter of amplitude A
+        shows as A/sqrt(2) at its frequency). Averaged over Hann-windowed
+        segments overlapping by half.
+
+        The TIE of lost edges is interpolated from its neighbours.
+
+        Args:
+            name (str): 'period', 'cycle_to_cycle' or 'tie'
+            segment (int): points per segment (frequency resolution = clock
+                frequency / segment), capped at the series length
+
+        Returns: (frequency Hz, amplitude s) arrays
+        '''
+        values = self.series(name)
+        if name == 'tie' and self.cycles[-1] - self.cycles[0] + 1 != len(self.cycles):
+            values = np.interp(np.arange(self.cycles[0], self.cycles[-1] + 1), self.cycles, values)
+        segment = min(segment, len(values))
+        window = np.hanning(segment)
+        power = np.zeros(segment // 2 + 1)
+        starts = range(0, len(values) - segment + 1, max(segment // 2, 1))
+        for start in starts:
+            chunk = values[start:start + segment]
+            spectrum = np.fft.rfft((chunk - chunk.mean()) * window)
+            power += spectrum.real**2 + spectrum.imag**2
+        amplitude = np.sqrt(power / len(starts)) * np.sqrt(2) / window.sum()
+        return np.fft.rfftfreq(segment, self.unit_interval), amplitude
@@ -0,0 +1,210 @@
+import numpy as np
+import time
+
+'''
+Pass/fail mask testing.
+
+A mask is a set of polygons in (time s, volts): a waveform fails where a
+sample falls inside one of them. Before testing, every polygon is compiled
+for the sample grid of the capture (first time and xincrement) into two
+arrays with one entry per sample, the lowest and the highest voltage the
+polygon covers at that sample time (+inf/-inf where it does not reach).
+Testing a waveform is then two comparisons and an and per polygon, with no
+Python loop over samples.
+
+Polygons are taken as vertically convex: at each sample time the whole span
+between their lowest and highest edge is forbidden. Use several polygons for
+shapes with an overhang. Regions meant to extend to the top or bottom of
+the screen can use +/-inf (or any large value) as vertex voltages.
+'''
+
+
+class Rigol_ds1000z_MaskLimits:
+    '''
+    A mask compiled for one sample grid (see Rigol_ds1000z_Mask.compile).
+
+    lower, upper: 2-D arrays (polygon x sample) of the forbidden spans
+    '''
+
+    def __init__(self, t0:float, xincrement:float, lower:np.ndarray, upper:np.ndarray):
+        self.t0 = t0
+        self.xincrement = xincrement
+        self.lower = lower
+        self.upper = upper
+
+    @property
+    def points(self) -> int:
+        return self.lower.shape[1]
+
+    def violations(self, values:np.ndarray) -> np.ndarray:
+        ''' Boolean array, True where a sample of values (1-D, or 2-D one row per capture) is inside the mask '''
+        values = np.asarray(values)
+        failed = np.zeros(values.shape, bool)
+        for lower, upper in zip(self.lower, self.upper):
+            failed |= (values >= lower) & (values <= upper)
+        return failed
+
+    def evaluate(self, values:np.ndarray) -> dict:
+        '''
+        Test one waveform.
+
+        Returns: dict
+            'passed'         no sample inside the mask
+            'violations'     number of samples inside the mask
+            'first_failure'  index of the first failing sample, -1 if none
+        '''
+        failed = self.violations(values)
+        count = int(np.count_nonzero(failed))
+        return {
+            'passed': count == 0,
+            'violations': count,
+            'first_failure': int(failed.argmax()) if count else -1,
+        }
+
+    def evaluate_many(self, values:np.ndarray) -> dict:
+        '''
+        Test a batch of waveforms of the same grid in one pass.
+
+        Args:
+            values: 2-D array, one capture per row
+
+        Returns: dict of arrays, one entry per capture
+            'passed', 'violations', 'first_failure' (see evaluate())
+        '''
+        failed = self.violations(np.atleast_2d(values))
+        counts = np.count_nonzero(failed, axis=1)
+        return {
+            'passed': counts == 0,
+            'violations': counts,
+            'first_failure': np.where(counts > 0, failed.argmax(axis=1), -1),
+        }
+
+
+class Rigol_ds1000z_Mask:
+    '''
+    Pass/fail mask (see the module notes).
+
+    example:
+        mask = Rigol_ds1000z_Mask([
+            [(0, 3.6), (1e-3, 3.6), (1e-3, 10), (0, 10)],                      # overshoot
+            [(2e-4, 1.0), (3e-4, 0.8), (7e-4, 0.8), (8e-4, 1.0), (5e-4, 2.5)], # centre
+        ])
+        result = mask.evaluate(dso.wave.get_wavedata())
+        print(result['passed'], result['violations'], result['first_failure'])
+    '''
+
+    CACHE_SIZE = 8
+
+    def __init__(self, polygons:list, t_offset:float=0.0):
+        '''
+        Args:
+            polygons (list): polygons, each a list of (time s, volts) vertices
+            t_offset (float): added to every vertex time, e.g. to move a
+                mask drawn relative to the trigger onto get_wavedata() times
+        '''
+        self.polygons = [np.asarray(polygon, np.float64) + (t_offset, 0) for polygon in polygons]
+        for polygon in self.polygons:
+            if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3:
+                raise ValueError(f'a polygon needs at least 3 (time, volts) vertices, got {polygon.tolist()}')
+        self._compiled = {}
+
+    def compile(self, t0:float, xincrement:float, points:int) -> Rigol_ds1000z_MaskLimits:
+        '''
+        Forbidden spans of every polygon at times t0 + i*xincrement,
+        i < points. The last few compiled grids are cached.
+        '''
+        key = (t0, xincrement, points)
+        limits = self._compiled.get(key)
+        if limits is not None:
+            return limits
+        times = t0 + np.arange(points) * xincrement
+        lower = np.full((len(self.polygons), points), np.inf)
+        upper = np.full((len(self.polygons), points), -np.inf)
+        for lo, hi, polygon in zip(lower, upper, self.polygons):
+            for (x1, y1), (x2, y2) in zip(polygon, np.roll(polygon, -1, axis=0)):
+                if x1 > x2:
+                    x1, y1, x2, y2 = x2, y2, x1, y1
+                first = np.searchsorted(times, x1, side='left')
+                last = np.searchsorted(times, x2, side='right')
+                if first >= last:
+                    continue
+                if x1 == x2:
+                    y = np.array([min(y1, y2), max(y1, y2)])[:, None]
+                else:
+                    with np.errstate(invalid='ignore'): # inf vertices
+                        y = y1 + (times[first:last] - x1) * ((y2 - y1) / (x2 - x1))
+                    y = np.where(np.isnan(y), y1 if np.isinf(y1) else y2, y)[None, :]
+                np.minimum(lo[first:last], y.min(axis=0), out=lo[first:last])
+                np.maximum(hi[first:last], y.max(axis=0), out=hi[first:last])
+        if len(self._compiled) >= self.CACHE_SIZE:
+            del self._compiled[next(iter(self._compiled))]
+        limits = self._compiled[key] = Rigol_ds1000z_MaskLimits(t0, xincrement, lower, upper)
+        return limits
+
+    def _grid(self, wavedata) -> tuple:
+        ''' (volts, t0, xincrement) of a get_wavedata() result '''
+        t, v = wavedata
+        if len(t) < 2:
+            raise ValueError('waveform needs at least 2 points')
+        return np.asarray(v, np.float64), float(t[0]), float(t[1] - t[0])
+
+    def evaluate(self, wavedata) -> dict:
+        '''
+        Test one get_wavedata() result ([times, volts]).
+
+        Returns: dict
+            'passed', 'violations', 'first_failure' (see Rigol_ds1000z_MaskLimits.evaluate)
+            'first_failure_time'  time of the first failing sample, None if it passed
+        '''
+        v, t0, xinc = self._grid(wavedata)
+        result = self.compile(t0, xinc, len(v)).evaluate(v)
+        result['first_failure_time'] = t0 + result['first_failure'] * xinc if result['violations'] else None
+        return result
+
+    def evaluate_many(self, captures) -> dict:
+        '''
+        Test several captures. Captures sharing a sample grid are stacked and
+        tested together.
+
+        Args:
+            captures: list of get_wavedata() results
+
+        Returns: dict of lists, one entry per capture, in order
+            'passed', 'violations', 'first_failure'
+        '''
+        groups = {}
+        for i, capture in enumerate(captures):
+            v, t0, xinc = self._grid(capture)
+            groups.setdefault((t0, xinc, len(v)), []).append((i, v))
+        results = {'passed': [None] * len(captures), 'violations': [None] * len(captures),
+                   'first_failure': [None] * len(captures)}
+        for key, members in groups.items():
+            batch = self.compile(*key).evaluate_many(np.stack([v for _, v in members]))
+            for row, (i, _) in enumerate(members):
+                for name in results:
+                    results[name][i] = batch[name][row].item()
+        return results
+
+    def benchmark(self, points:int=1200000, captures:int=20, xincrement:float=1e-9) -> dict:
+        '''
+        Time evaluation of random waveforms spanning the mask's voltage range.
+
+        Returns: {'points', 'captures', 'seconds', 'captures_per_second', 'points_per_second'}
+        '''
+        vertices = np.concatenate(self.polygons)
+        finite = vertices[np.isfinite(vertices).all(axis=1)]
+        low, high = finite[:, 1].min(), finite[:, 1].max()
+        t0 = finite[:, 0].min()
+        limits = self.compile(t0, xincrement, points)
+        waves = np.random.default_rng(0).uniform(low, high, (captures, points))
+        start = time.perf_counter()
+        for wave in waves:
+            limits.evaluate(wave)
+        seconds = time.perf_counter() - start
+        return {
+            'points': points,
+            'captures': captures,
+            'seconds': seconds,
+            'captures_per_second': captures / seconds,
+            'points_per_second': captures * points / seconds,
+        }
@@ -1,9 +1,9 @@
 from .rigol_visa import Rigol_visa
-from .rigol_ds1000z_constants import OnOff, MathOperations, MathSources, LogicSources, \
+from .rigol_ds1000z_scpi import Rigol_scpi_Subsystem, scpi_property
+from .rigol_ds1000z_constants import MathOperations, MathSources, LogicSources, \
     AnalogSources, FFTWindows, FFTUnits, FFTMode, FxOperations
-import math
 
-class Rigol_ds1000z_Math:
+class Rigol_ds1000z_Math(Rigol_scpi_Subsystem):
     '''
     The :MATH commands are used to set the operations between the waveforms of multiple channels.
     Note:  The operations include the following types:
@@ -31,21 +31,17 @@ class Rigol_ds1000z_Math:
         self.visa_resource = visa_resource
         self.visa = Rigol_visa(visa_resource)
         self.fft = self.FFT(self.visa)
+        self.option = self.Option(self.visa)
 
-    @property
-    def display(self) -> OnOff:
+    @scpi_property(':MATH:DISPlay', bool)
+    def display(self):
         '''
         :MATH:DISPlay
         Enable or disable the math operation function or query the math operation status.
         '''
-        return int(self.visa.query(':MATH:DISPlay?'))
-    @display.setter
-    def display(self, display_on_off:OnOff):
-        self.visa.write(f':MATH:DISPlay {display_on_off}')
-        return
 
-    @property
-    def operation(self) -> MathOperations:
+    @scpi_property(':MATH:OPERator', enum=MathOperations)
+    def operation(self):
         '''
         :MATH:OPERator
         Set or query the operator of the math operation.
@@ -55,14 +51,9 @@ class Rigol_ds1000z_Math:
 
         <oper> see Constants - MathOperations
         '''
-        return (self.visa.query(':MATH:DISPlay?'))
-    @operation.setter
-    def operation(self, operator:MathOperations):
-        self.visa.write(f':MATH:DISPlay {operator}')
-        return
-    
-    @property
-    def source_A(self) -> MathSources:
+
+    @scpi_property(':MATH:SOURce1', enum=MathSources)
+    def source_A(self):
         '''
         :MATH:SOURce1
         Set or query the source or source A of algebraic operation/functional operation/the outer
@@ -85,14 +76,9 @@ class Rigol_ds1000z_Math:
         and :MATH:OPTion:FX:OPERator commands to set the sources and operator of the
         inner layer operation.
         '''
-        return (self.visa.query(':MATH:SOURce1?'))
-    @source_A.setter
-    def source_A(self, source:MathSources):
-        self.visa.write(f':MATH:SOURce1 {source}')
-        return
-    
-    @property
-    def source_B(self) -> MathSources:
+
+    @scpi_property(':MATH:SOURce2', enum=MathSources)
+    def source_B(self):
         '''
         :MATH:SOURce2
         Set or query the source or source B of algebraic operation/functional operation/the outer
@@ -114,28 +100,18 @@ class Rigol_ds1000z_Math:
         and :MATH:OPTion:FX:OPERator commands to set the sources and operator of the
         inner layer operation.
         '''
-        return (self.visa.query(':MATH:SOURce2?'))
-    @source_B.setter
-    def source_B(self, source:MathSources):
-        self.visa.write(f':MATH:SOURce2 {source}')
-        return
-    
-    @property
-    def logic_source_A(self) -> LogicSources:
+
+    @scpi_property(':MATH:LSOURce1', enum=LogicSources)
+    def logic_source_A(self):
         '''
         :MATH:LSOURce1
         Set or query source A of logic operation.
 
         The logic operations include A&&B, A||B, A^B, and !A.
         '''
-        return (self.visa.query(':MATH:LSOURce1?'))
-    @logic_source_A.setter
-    def logic_source_A(self, source:LogicSources):
-        self.visa.write(f':MATH:LSOURce1 {source}')
-        return
-    
-    @property
-    def logic_source_B(self) -> LogicSources:
+
+    @scpi_property(':MATH:LSOURce2', enum=LogicSources)
+    def logic_source_B(self):
         '''
         :MATH:LSOURce2
         Set or query source B of logic operation.
@@ -145,14 +121,9 @@ class Rigol_ds1000z_Math:
         This command is only applicable to logic operations that require two signal sources
         and is used to set source B.
         '''
-        return (self.visa.query(':MATH:LSOURce2?'))
-    @logic_source_B.setter
-    def logic_source_B(self, source:LogicSources):
-        self.visa.write(f':MATH:LSOURce2 {source}')
-        return
-    
-    @property
-    def scale(self) -> float:
+
+    @scpi_property(':MATH:SCALe', float)
+    def scale(self):
         '''
         :MATH:SCALe
         Set or query the vertical scale of the operation result. The unit depends on the operator
@@ -164,14 +135,9 @@ class Rigol_ds1000z_Math:
         scale of the source channel. For the integration (intg) and differential (diff) operations, it
         is also related to the current horizontal timebase.
         '''
-        return float(self.visa.query(':MATH:SCALe?'))
-    @scale.setter
-    def scale(self, scale:float):
-        self.visa.write(f':MATH:SCALe {scale}')
-        return
-    
-    @property
-    def offset(self) -> float:
+
+    @scpi_property(':MATH:OFFSet', float)
+    def offset(self):
         '''
         :MATH:OFFSet
         Set or query the vertical offset of the operation result. The unit depends on the operator
@@ -181,26 +147,15 @@ class Rigol_ds1000z_Math:
             Range: (-1000 x MathVerticalScale) to (1000 x MathVerticalScale)
             Step: MathVerticalScale/50
         '''
-        return float(self.visa.query(':MATH:OFFSet?'))
-    @offset.setter
-    def offset(self, offset:float):
-        self.visa.write(f':MATH:OFFSet {offset}')
-        return
-    
 
-    @property
-    def invert(self) -> OnOff:
+    @scpi_property(':MATH:INVert', bool)
+    def invert(self):
         '''
         :MATH:INVert
         Enable or disable the inverted display mode of the operation result, or query the inverted
         display mode status of the operation result.
         '''
-        return int(self.visa.query(':MATH:INVert?'))
-    @invert.setter
-    def invert(self, invert:OnOff):
-        self.visa.write(f':MATH:INVert {invert}')
-        return
-    
+
     def reset(self):
         '''
         :MATH:RESet
@@ -211,60 +166,41 @@ class Rigol_ds1000z_Math:
         self.visa.write(f':MATH:RESET')
         return
     
-    class FFT:
+    class FFT(Rigol_scpi_Subsystem):
         def __init__(self, visa:Rigol_visa):
             self.visa = visa
             
-        @property
-        def source(self) -> FFTSources:
+        @scpi_property(':MATH:FFT:SOURce', enum=AnalogSources)
+        def source(self):
             '''
             :MATH:FFT:SOURce
             Set or query the source of FFT operation/filter.
             '''
-            return (self.visa.query(':MATH:FFT:SOURCE?'))
-        @source.setter
-        def source(self, chan:FFTSources):
-            self.visa.write(f':MATH:FFT:SOURCE {chan}')
-            return
-    
-        @property
-        def window(self) -> FFTWindows:
+
+        @scpi_property(':MATH:FFT:WINDow', enum=FFTWindows)
+        def window(self):
             '''
             :MATH:FFT:WINDow
-            Set or query the source of FFT operation/filter.
+            Set or query the window function of the FFT operation.
             '''
-            return (self.visa.query(':MATH:FFT:WINDow?'))
-        @window.setter
-        def window(self, window_filter:FFTWindows):
-            self.visa.write(f':MATH:FFT:WINDow {window_filter}')
-            return
-            
-        @property
-        def split_display(self) -> OnOff:
+
+        @scpi_property(':MATH:FFT:SPLit', bool)
+        def split_display(self):
             '''
             :MATH:FFT:SPLit
-            Set or query the source of FFT operation/filter.
+            Enable or disable the half display mode of the FFT operation result (the FFT result
+            on half of the screen, the source channel on the other half), or query its status.
             '''
-            return int(self.visa.query(':MATH:FFT:SPLit?'))
-        @split_display.setter
-        def split_display(self, half_screen:OnOff):
-            self.visa.write(f':MATH:FFT:SPLit {half_screen}')
-            return
-        
-        @property
-        def units(self) -> FFTUnits:
+
+        @scpi_property(':MATH:FFT:UNIT', enum=FFTUnits)
+        def units(self):
             '''
             :MATH:FFT:UNIT
             Set or query the vertical unit of the FFT operation result.
             '''
-            return (self.visa.query(':MATH:FFT:UNIT?'))
-        @units.setter
-        def units(self, units:FFTUnits):
-            self.visa.write(f':MATH:FFT:UNIT {units}')
-            return
-        
-        @property
-        def horizontal_scale(self) -> float:
+
+        @scpi_property(':MATH:FFT:HSCale', float)
+        def horizontal_scale(self):
             '''
             :MATH:FFT:HSCale
             <scale> can be set to 1/1000, 1/400, 1/200, 1/100, 1/40, or 1/20 of the FFT sample rate.
@@ -278,14 +214,9 @@ class Rigol_ds1000z_Math:
             You can view the detailed information of the frequency spectrum by reducing the
             horizontal scale.
             '''
-            return float(self.visa.query(':MATH:FFT:HSCale?'))
-        @horizontal_scale.setter
-        def horizontal_scale(self, scale:float):
-            self.visa.write(f':MATH:FFT:HSCale {scale}')
-            return
-  
-        @property
-        def horizontal_center(self) -> float:
+
+        @scpi_property(':MATH:FFT:HCENter', float)
+        def horizontal_center(self):
             '''
             :MATH:FFT:HCENter
             <center> Set or query the center frequency of the FFT operation result, namely the frequency
@@ -301,35 +232,9 @@ class Rigol_ds1000z_Math:
 
             Step = Horizontal Scale of the FFT operation result/50.
             '''
-            return float(self.visa.query(':MATH:FFT:HCENter?'))
-        @horizontal_center.setter
-        def horizontal_center(self, center:float):
-            self.visa.write(f':MATH:FFT:HCENter {center}')
-            return
-        
-        @property
-        def horizontal_scale(self) -> float:
-            '''
-            :MATH:FFT:HSCale
-            <scale> can be set to 1/1000, 1/400, 1/200, 1/100, 1/40, or 1/20 of the FFT sample rate.
-            
-            When the FFT mode is set to TRACe, FFT sample rate equals to screen sample rate,
-            that is, 100/horizontal timebase.
-            
-            When the FFT mode is set to MEMory, FFT sample rate equals to memory sample
-            rate (:ACQuire:SRATe?).
-            
-            You can view the detailed information of the frequency spectrum by reducing the
-            horizontal scale.
-            '''
-            return float(self.visa.query(':MATH:FFT:HSCale?'))
-        @horizontal_scale.setter
-        def horizontal_scale(self, scale:float):
-            self.visa.write(f':MATH:FFT:HSCale {scale}')
-            return
-  
-        @property
-        def horizontal_mode(self) -> FFTMode:
+
+        @scpi_property(':MATH:FFT:MODE', enum=FFTMode)
+        def horizontal_mode(self):
             '''
             :MATH:FFT:MODE <mode>
             Set or Query the FFT Mode
@@ -340,18 +245,13 @@ class Rigol_ds1000z_Math:
             MEMory: denotes that the data source of the FFT operation is the data of the
             waveform in the memory.
             '''
-            return (self.visa.query(':MATH:FFT:MODE?'))
-        @horizontal_mode.setter
-        def horizontal_mode(self, mode:FFTMode):
-            self.visa.write(f':MATH:FFT:MODE {mode}')
-            return
-        
-    class Option:
+
+    class Option(Rigol_scpi_Subsystem):
         def __init__(self, visa:Rigol_visa):
             self.visa = visa
 
-        @property
-        def start_point(self) -> int:
+        @scpi_property(':MATH:OPTion:STARt', int, limits=(0, 1198))
+        def start_point(self):
             '''
             :MATH:OPTion:STARt
             Set or query the start point of the waveform math operation.
@@ -361,14 +261,9 @@ class Rigol_ds1000z_Math:
             
             Invalid for FFT.
             '''
-            return int(self.visa.query(':MATH:OPTion:STARt?'))
-        @start_point.setter
-        def start_point(self, start_pt:int):
-            self.visa.write(f':MATH:OPTion:STARt {start_pt}')
-            return
-    
-        @property
-        def end_point(self) -> int:
+
+        @scpi_property(':MATH:OPTion:END', int, limits=(1, 1199))
+        def end_point(self):
             '''
             :MATH:OPTion:END
             Set or query the end point of the waveform math operation.
@@ -378,44 +273,29 @@ class Rigol_ds1000z_Math:
             
             Invalid for FFT.
             '''
-            return int(self.visa.query(':MATH:OPTion:END?'))
-        @end_point.setter
-        def end_point(self, end_pt:int):
-            self.visa.write(f':MATH:OPTion:END {end_pt}')
-            return
-        
-        @property
-        def invert(self) -> OnOff:
+
+        @scpi_property(':MATH:OPTion:INVert', bool)
+        def invert(self):
             '''
             :MATH:OPTion:INVert
             Enable or disable the inverted display mode of the operation result, 
             or query the inverted display mode status of the operation result.
             '''
-            return int(self.visa.query(':MATH:OPTion:END?'))
-        @invert.setter
-        def invert(self, invert:OnOff):
-            self.visa.write(f':MATH:OPTion:END {invert}')
-            return
-        
-        @property
-        def vscale_logic(self) -> float:
+
+        @scpi_property(':MATH:OPTion:SENSitivity', float, limits=(0, 0.96))
+        def vscale_logic(self):
             '''
             :MATH:OPTion:SENSitivity
             Set or query the sensitivity of the logic operation. The default unit is div (namely the
             current vertical scale).
 
+            Range is 0 to 0.96 div, in 0.08 div steps.
+
             This command is only applicable to logic operations (A&&B, A||B, A^B, and !A)
             '''
-            return float(self.visa.query(':MATH:OPTion:SENSitivity?'))
-        @vscale_logic.setter
-        def vscale_logic(self, vertical_scale:float):
-            vertical_scale = math.ceil(vertical_scale/0.08)
-            self.visa.write(f':MATH:OPTion:SENSitivity {vertical_scale}')
-            return
-        
-        
-        @property
-        def diff_smoothing_window(self) -> int:
+
+        @scpi_property(':MATH:OPTion:DIStance', int, limits=(3, 201))
+        def diff_smoothing_window(self):
             '''
             :MATH:OPTion:DIStance
             Set or query the smoothing window width of differentiation operation (diff).
@@ -424,30 +304,17 @@ class Rigol_ds1000z_Math:
 
             This command is only applicable to differentiation operation (diff).
             '''
-            return int(self.visa.query(':MATH:OPTion:DIStance?'))
-        @diff_smoothing_window.setter
-        def diff_smoothing_window(self, window:int):
-            if window < 3: window = 3
-            if window > 201: window = 201
-            self.visa.write(f':MATH:OPTion:DIStance {window}')
-            return
-            
-        @property
-        def autoscale(self) -> OnOff:
+
+        @scpi_property(':MATH:OPTion:ASCale', bool)
+        def autoscale(self):
             '''
             :MATH:OPTion:ASCale
             Enable or disable the auto scale setting of the operation result or query the status of the
             auto scale setting.
             '''
-            return int(self.visa.query(':MATH:OPTion:ASCale?'))
-        @autoscale.setter
-        def autoscale(self, autoscaling:OnOff):
-            self.visa.write(f':MATH:OPTion:ASCale {autoscaling}')
-            return
-        
-                
-        @property
-        def threshold_A(self) -> float:
+
+        @scpi_property(':MATH:OPTion:THReshold1', float)
+        def threshold_A(self):
             '''
             :MATH:OPTion:THReshold1
             Set or query the threshold level of source A in logic operations. The default unit is V.
@@ -456,68 +323,41 @@ class Rigol_ds1000z_Math:
             ( 4 x VerticalScale - VerticalOffset)
             The step is VerticalScale/50
             '''
-            return float(self.visa.query(':MATH:OPTion:THReshold1?'))
-        @threshold_A.setter
-        def threshold_A(self, threshold:float):
-            self.visa.write(f':MATH:OPTion:THReshold1 {threshold}')
-            return
-                        
-        @property
-        def threshold_B(self) -> float:
+
+        @scpi_property(':MATH:OPTion:THReshold2', float)
+        def threshold_B(self):
             '''
             :MATH:OPTion:THReshold2
-            Set or query the threshold level of source A in logic operations. The default unit is V.
+            Set or query the threshold level of source B in logic operations. The default unit is V.
 
             (-4 x VerticalScale - VerticalOffset) to
             ( 4 x VerticalScale - VerticalOffset)
             The step is VerticalScale/50
             '''
-            return float(self.visa.query(':MATH:OPTion:THReshold2?'))
-        @threshold_B.setter
-        def threshold_B(self, threshold:float):
-            self.visa.write(f':MATH:OPTion:THReshold2 {threshold}')
-            return
 
-        @property
-        def fx_source_A(self) -> AnalogSources:
+        @scpi_property(':MATH:OPTion:FX:SOURce1', enum=AnalogSources)
+        def fx_source_A(self):
             '''
             :MATH:OPTion:FX:SOURce1
             Set or query source A of the inner layer operation of compound operation.
 
             <source> {CHANnel1|CHANnel2|CHANnel3|CHANnel4}
             '''
-            return float(self.visa.query(':MATH:OPTion:FX:SOURce1?'))
-        @fx_source_A.setter
-        def fx_source_A(self, source:AnalogSources):
-            self.visa.write(f':MATH:OPTion:FX:SOURce1 {source}')
-            return
-        
-        @property
-        def fx_source_B(self) -> AnalogSources:
+
+        @scpi_property(':MATH:OPTion:FX:SOURce2', enum=AnalogSources)
+        def fx_source_B(self):
             '''
             :MATH:OPTion:FX:SOURce2
             Set or query source B of the inner layer operation of compound operation.
 
             <source> {CHANnel1|CHANnel2|CHANnel3|CHANnel4}
             '''
-            return float(self.visa.query(':MATH:OPTion:FX:SOURce2?'))
-        @fx_source_B.setter
-        def fx_source_B(self, source:AnalogSources):
-            self.visa.write(f':MATH:OPTion:FX:SOURce2 {source}')
-            return
-        
-        
-        @property
-        def fx_operator(self) -> FxOperations:
+
+        @scpi_property(':MATH:OPTion:FX:OPERator', enum=FxOperations)
+        def fx_operator(self):
             '''
             :MATH:OPTion:FX:OPERator
-            et or query the operator of the inner layer operation of compound operation.
+            Set or query the operator of the inner layer operation of compound operation.
 
             <op> {ADD|SUBTract|MULTiply|DIVision}
             '''
-            return float(self.visa.query(':MATH:OPTion:FX:SOURce2?'))
-        @fx_operator.setter
-        def fx_operator(self, op:FxOperations):
-            self.visa.write(f':MATH:OPTion:FX:SOURce2 {op}')
-            return
-
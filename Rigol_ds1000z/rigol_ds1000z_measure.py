@@ -1,17 +1,18 @@
 from .rigol_visa import Rigol_visa
-from .rigol_ds1000z_constants import OnOff, MeasureItems, MeasureSources, Measurements, AnalogChannels, StatisticsMode, MeasureStatisticsType
+from .rigol_ds1000z_scpi import Rigol_scpi_Subsystem, scpi_property
+from .rigol_ds1000z_constants import MeasureItems, MeasureSources, Measurements, AnalogChannels, StatisticsMode, MeasureStatisticsType
 from typing import List
 
 
-class Rigol_ds1000z_Measure:
+class Rigol_ds1000z_Measure(Rigol_scpi_Subsystem):
     def __init__(self, visa_resource):
         self.visa_resource = visa_resource
         self.visa = Rigol_visa(visa_resource)
         self.setup = self.Setup(self.visa)
         self.statistic = self.Statistic(self.visa)
 
-    @property
-    def source(self) -> MeasureSources:
+    @scpi_property(':MEASure:SOURce', enum=MeasureSources)
+    def source(self):
         '''
         Set or query the source of the current measurement parameter.
 
@@ -19,15 +20,9 @@ class Rigol_ds1000z_Measure:
                 D9|D10|D11|D12|D13|D14|D15|
                 CHANnel1|CHANnel2|CHANnel3|CHANnel4|MATH}
         '''
-        return self.visa.query(f':MEAS:SOURce?')
-    @source.setter
-    def source(self, source:MeasureSources):
-        s = source.value
-        self.visa.write(f':MEAS:SOURce {s}')
-        return
 
-    @property
-    def counter_source(self) -> MeasureSources:
+    @scpi_property(':MEASure:COUNter:SOURce', enum=MeasureSources)
+    def counter_source(self):
         '''
         Set or query the source of the frequency counter, or disable the frequency counter. 
 
@@ -35,15 +30,9 @@ class Rigol_ds1000z_Measure:
                   D9|D10|D11|D12|D13|D14|D15|
                   CHANnel1|CHANnel2|CHANnel3|CHANnel4|OFF}
         '''
-        return self.visa.query(f':MEAS:COUNter:SOURce?')
-    @source.setter
-    def source(self, source:MeasureSources):
-        s = source.value
-        self.visa.write(f':MEAS:COUNter:SOURce {s}')
-        return
 
-    @property
-    def counter_value(self) -> MeasureItems:
+    @scpi_property(':MEASure:COUNter:VALue', float, readonly=True, volatile=True)
+    def counter_value(self):
         '''
         Query the measurement result of the frequency counter. The default unit is Hz
 
@@ -51,8 +40,7 @@ class Rigol_ds1000z_Measure:
         If the frequency counter is disabled, 0.0000000e+00 will be returned.
         Example -- :MEASure:COUNter:VALue? /*The query returns 1.000004e+03*/
         '''
-        return self.visa.query(f':MEAS:COUNter:VALue?')
-    
+
     # # clear and recover don't code well in @property/setter so I'm sticking to a standard method:
     # # mydso.measure.clear('ALL') # seems obvious
     # # mydso.measure.clear = 'ALL' # whaaaat???
@@ -85,8 +73,8 @@ class Rigol_ds1000z_Measure:
         self.visa.write(f':MEAS:RECover {item}')
         return
 
-    @property
-    def all_display(self) -> OnOff:
+    @scpi_property(':MEASure:ADISplay', bool)
+    def all_display(self):
         '''
         Enable or disable the all measurement function, 
         or query the status of the all measurement function. 
@@ -104,34 +92,23 @@ class Rigol_ds1000z_Measure:
         channel at the same time. You can send the :MEASure:AMSource command to set
         the source of the all measurement function. 
         '''
-        return int(self.visa.query(f':MEAS:ADISplay?'))
-    @all_display.setter
-    def all_display(self, display_all:OnOff):
-        self.visa.write(f':MEAS:ADISplay {display_all}')
-        return
-
 
-    @property
-    def all_measure_source(self) -> str:
+    @scpi_property(':MEASure:AMSource', enum=AnalogChannels)
+    def all_measure_source(self):
         '''
         Set or query the source(s) of the all measurement function
 
         <src> Discrete {CHANnel1|CHANnel2|CHANnel3|CHANnel4|MATH} 
         '''
-        return self.visa.query(f':MEAS:AMSource?')
-    @all_measure_source.setter
-    def all_measure_source(self, source:AnalogChannels):
-        self.visa.write(f':MEAS:AMSource {source}')
-        return
-    
+
     @property
-    def all_measure_source_list(self) -> str:
+    def all_measure_source_list(self) -> List[str]:
         '''
         Set or query the source(s) of the all measurement function
 
         <src> Discrete {CHANnel1|CHANnel2|CHANnel3|CHANnel4|MATH} 
         '''
-        return self.visa.query(f':MEAS:AMSource?')
+        return self.visa.query(f':MEAS:AMSource?').strip().split(',')
     @all_measure_source_list.setter
     def all_measure_source_list(self, sources:List[AnalogChannels]):
         if type(sources) != list:
@@ -143,12 +120,12 @@ class Rigol_ds1000z_Measure:
         self.visa.write(f':MEAS:AMSource {src_list_str}')
         return
 
-    class Setup:
+    class Setup(Rigol_scpi_Subsystem):
         def __init__(self, visa:Rigol_visa):
             self.visa = visa
 
-        @property
-        def max_threshold(self) -> int:
+        @scpi_property(':MEASure:SETup:MAX', int, limits=(7, 95))
+        def max_threshold(self):
             '''
             Set or query the upper limit of the threshold
             (expressed in the percentage of amplitude) 
@@ -156,18 +133,9 @@ class Rigol_ds1000z_Measure:
 
             <value> Integer 7 to 95 (default 90)
             '''
-            return self.visa.query(f':MEAS:SETup:MAX?')
-        @max_threshold.setter
-        def max_threshold(self, upper_limit:int):
-            if upper_limit < 7:
-                upper_limit = 7 
-            if upper_limit > 95:
-                upper_limit = 95 
-            self.visa.write(f':MEAS:SETup:MAX {upper_limit}')
-            return
 
-        @property
-        def mid_threshold(self) -> int:
+        @scpi_property(':MEASure:SETup:MID', int, limits=(6, 94))
+        def mid_threshold(self):
             '''
             Set or query the middle point of the threshold
             (expressed in the percentage of amplitude)
@@ -177,18 +145,9 @@ class Rigol_ds1000z_Measure:
 
             <value> Integer 6 to 94 (default 50)
             '''
-            return self.visa.query(f':MEAS:SETup:MID?')
-        @mid_threshold.setter
-        def mid_threshold(self, midpoint:int):
-            if midpoint < 6:
-                midpoint = 6 
-            if midpoint > 94:
-                midpoint = 94 
-            self.visa.write(f':MEAS:SETup:MID {midpoint}')
-            return
 
-        @property
-        def min_threshold(self) -> int:
+        @scpi_property(':MEASure:SETup:MIN', int, limits=(5, 93))
+        def min_threshold(self):
             '''
             Set or query the lower limit of the threshold
             (expressed in the percentage of amplitude)
@@ -196,20 +155,11 @@ class Rigol_ds1000z_Measure:
             
             The middle point must be lower than the upper limit and greater than the lower limit
 
-            <value> Integer 6 to 94 (default 50)
+            <value> Integer 5 to 93 (default 10)
             '''
-            return self.visa.query(f':MEAS:SETup:MIN?')
-        @min_threshold.setter
-        def min_threshold(self, lower_limit:int):
-            if lower_limit < 5:
-                lower_limit = 5 
-            if lower_limit > 93:
-                lower_limit = 93 
-            self.visa.write(f':MEAS:SETup:MIN {lower_limit}')
-            return
 
-        @property
-        def phase_source_a(self) -> MeasureSources:
+        @scpi_property(':MEASure:SETup:PSA', enum=MeasureSources)
+        def phase_source_a(self):
             '''
             Set or query source A of Phase 1→2 and Phase 1→2 measurements.
             
@@ -218,15 +168,9 @@ class Rigol_ds1000z_Measure:
                 D9|D10|D11|D12|D13|D14|D15|
                 CHANnel1|CHANnel2|CHANnel3|CHANnel4}
             '''
-            return self.visa.query(f':MEAS:SETup:PSA?')
-        @phase_source_a.setter
-        def phase_source_a(self, source:MeasureSources):
-            s = source.value
-            self.visa.write(f':MEAS:SETup:PSA {s}')
-            return
 
-        @property
-        def phase_source_b(self) -> MeasureSources:
+        @scpi_property(':MEASure:SETup:PSB', enum=MeasureSources)
+        def phase_source_b(self):
             '''
             Set or query source B of Phase 1→2 and Phase 1→2 measurements.
             
@@ -235,15 +179,9 @@ class Rigol_ds1000z_Measure:
                 D9|D10|D11|D12|D13|D14|D15|
                 CHANnel1|CHANnel2|CHANnel3|CHANnel4}
             '''
-            return self.visa.query(f':MEAS:SETup:PSB?')
-        @phase_source_b.setter
-        def phase_source_b(self, source:MeasureSources):
-            s = source.value
-            self.visa.write(f':MEAS:SETup:PSB {s}')
-            return
 
-        @property
-        def delay_source_a(self) -> MeasureSources:
+        @scpi_property(':MEASure:SETup:DSA', enum=MeasureSources)
+        def delay_source_a(self):
             '''
             Set or query source A of Delay 1→2 and Delay 1→2 measurements.
             
@@ -252,15 +190,9 @@ class Rigol_ds1000z_Measure:
                 D9|D10|D11|D12|D13|D14|D15|
                 CHANnel1|CHANnel2|CHANnel3|CHANnel4}
             '''
-            return self.visa.query(f':MEAS:SETup:DSA?')
-        @delay_source_a.setter
-        def delay_source_a(self, source:MeasureSources):
-            s = source.value
-            self.visa.write(f':MEAS:SETup:DSA {s}')
-            return
 
-        @property
-        def delay_source_b(self) -> MeasureSources:
+        @scpi_property(':MEASure:SETup:DSB', enum=MeasureSources)
+        def delay_source_b(self):
             '''
             Set or query source B of Delay 1→2 and Delay 1→2 measurements.
             
@@ -269,45 +201,27 @@ class Rigol_ds1000z_Measure:
                 D9|D10|D11|D12|D13|D14|D15|
                 CHANnel1|CHANnel2|CHANnel3|CHANnel4}
             '''
-            return self.visa.query(f':MEAS:SETup:DSB?')
-        @delay_source_b.setter
-        def delay_source_b(self, source:MeasureSources):
-            s = source.value
-            self.visa.write(f':MEAS:SETup:DSB {s}')
-            return
-        
 
-    class Statistic:
+    class Statistic(Rigol_scpi_Subsystem):
         def __init__(self, visa:Rigol_visa):
             self.visa = visa
 
-        @property
-        def display(self) -> str:
+        @scpi_property(':MEASure:STATistic:DISPlay', bool)
+        def display(self):
             '''
             Enable or disable the statistic function, 
             or query the status of the statistic function. 
             
             <bool> Bool {{1|ON}|{0|OFF}} 0|OFF
             '''
-            return self.visa.query(f':MEAS:STATistic:DISPlay?')
-        @display.setter
-        def display(self, display_on:bool):
-            disp_on = 1 if display_on else 0
-            self.visa.write(f':MEAS:STATistic:DISPlay {disp_on}')
-            return
 
-        @property
-        def mode(self) -> StatisticsMode:
+        @scpi_property(':MEASure:STATistic:MODE', enum=StatisticsMode)
+        def mode(self):
             '''
             Set or query the statistic mode. 
             
             <mode> Discrete {DIFFerence|EXTRemum} (Default EXTRem)
             '''
-            return self.visa.query(f':MEAS:STATistic:MODE?')
-        @mode.setter
-        def mode(self, mode:StatisticsMode):
-            self.visa.write(f':MEAS:STATistic:MODE {mode}')
-            return
 
         def reset(self):
             '''
@@ -316,7 +230,6 @@ class Rigol_ds1000z_Measure:
             self.visa.write(f':MEAS:STATistic:RESet')
             return
 
-
         def item_get(self, type:MeasureStatisticsType, item:Measurements, source:MeasureSources='') -> str:
             '''
             :MEAS:STATistic:ITEM? <type>,<item>[,<src>,<src>,...]
@@ -453,4 +366,3 @@ class Rigol_ds1000z_Measure:
 
     def fall_time(self, source:MeasureSources):
         return self.item_get(Measurements.FTIME, source=source)
-    
\ No newline at end of file
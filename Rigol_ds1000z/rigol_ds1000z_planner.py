@@ -0,0 +1,156 @@
+from .rigol_ds1000z_acquire import memory_depths
+import math
+
+'''
+Acquisition planning.
+
+The scope fills its acquisition memory over the 12 horizontal divisions:
+
+    memory depth = sample rate * 12 * timebase scale
+
+with the sample rate capped by the number of enabled analog channels and the
+memory depths limited to the MemoryDepth table entries for that number. The
+planner picks the smallest timebase scale (1-2-5 steps) covering the required
+window and the smallest memory depth giving the required sample rate over it,
+so the download is no bigger than needed.
+'''
+
+DIVISIONS = 12
+MIN_SCALE = 5e-9
+MAX_SCALE = 50.0
+MAX_SAMPLE_RATE = {1: 1e9, 2: 500e6, 3: 250e6, 4: 250e6}
+
+# points/s of a BYTE download when the link was never benchmarked (dso.tuning)
+DEFAULT_POINTS_PER_SECOND = {'USB': 1.0e6, 'TCPIP': 0.5e6}
+_BLOCK_HEADER_BYTES = 12 # '#9<9 digits>' and the terminating '\n'
+
+
+def timebase_scales() -> list:
+    ''' Timebase scales (s/div) the scope accepts, 5 ns to 50 s in 1-2-5 steps '''
+    scales = []
+    for decade in range(round(math.log10(MIN_SCALE)) - 1, round(math.log10(MAX_SCALE)) + 1):
+        for step in (1, 2, 5):
+            scale = float(f'{step}e{decade}')
+            if MIN_SCALE * (1 - 1e-9) <= scale <= MAX_SCALE * (1 + 1e-9):
+                scales.append(scale)
+    return scales
+
+
+class Rigol_ds1000z_Planner:
+    '''
+    Picks memory depth and timebase for a target sample rate (or time
+    resolution) and acquisition window, predicts the download and applies
+    the settings in one batch.
+
+    example:
+        planner = Rigol_ds1000z_Planner(dso)
+        plan = planner.plan(sample_rate=100e6, window=1e-3, channels=[1, 2])
+        print(plan['memory_depth'], plan['scale'], plan['download_seconds'])
+        planner.apply(plan)
+    '''
+
+    def __init__(self, dso):
+        '''
+        Args:
+            dso (Rigol_ds1000z): scope to plan for
+        '''
+        self._dso = dso
+
+    def _enabled_channels(self) -> list:
+        replies = self._dso.visa.query_many([f':CHANnel{chan}:DISPlay?' for chan in range(1, 5)])
+        return [chan for chan, reply in zip(range(1, 5), replies) if int(float(reply))]
+
+    def points_per_second(self) -> float:
+        ''' Download throughput of the link: the benchmarked one if any, else a default per interface '''
+        settings = self._dso.tuning.settings
+        if settings and settings.get('points_per_second'):
+            return float(settings['points_per_second'])
+        return DEFAULT_POINTS_PER_SECOND.get(self._dso.tuning.interface, min(DEFAULT_POINTS_PER_SECOND.values()))
+
+    def download(self, points:int, channels:int=1) -> dict:
+        '''
+        Predicted size and duration of a RAW BYTE download.
+
+        Args:
+            points (int): points per channel
+            channels (int): number of channels downloaded
+
+        Returns: {'bytes', 'seconds'}
+        '''
+        blocks = math.ceil(points / self._dso.wave.block_pts)
+        size = channels * (points + blocks * _BLOCK_HEADER_BYTES)
+        return {'bytes': size, 'seconds': channels * points / self.points_per_second()}
+
+    def plan(self, sample_rate:float=None, resolution:float=None, window:float=None,
+             channels:list=None, max_seconds:float=None) -> dict:
+        '''
+        Smallest memory depth and timebase giving at least sample_rate over
+        window with channels enabled.
+
+        Args:
+            sample_rate (float): required sample rate, Sa/s
+            resolution (float): required time between samples, s (instead of sample_rate)
+            window (float): required acquisition time, s; defaults to the
+                current 12 divisions
+            channels (list of int): analog channels to enable, default the
+                ones enabled now
+            max_seconds (float): download budget for all channels, s
+
+        Returns: dict
+            'channels'          channels to enable
+            'scale'             timebase scale, s/div
+            'memory_depth'      points per channel
+            'sample_rate'       predicted sample rate, Sa/s
+            'window'            acquired time, s
+            'download_bytes'    predicted bytes to read all channels
+            'download_seconds'  predicted time to read all channels
+
+        Raises ValueError if no setting meets the requirements or the budget.
+        '''
+        if resolution is not None:
+            sample_rate = 1 / resolution
+        if sample_rate is None:
+            raise ValueError('sample_rate or resolution is required')
+        channels = sorted(set(channels)) if channels is not None else self._enabled_channels()
+        if not channels:
+            raise ValueError('no analog channel enabled')
+        max_rate = MAX_SAMPLE_RATE[len(channels)]
+        if sample_rate > max_rate * (1 + 1e-9):
+            raise ValueError(f'{sample_rate:g} Sa/s exceeds {max_rate:g} Sa/s with {len(channels)} channels')
+        if window is None:
+            window = DIVISIONS * self._dso.timebase.scale
+        depths = memory_depths(len(channels))
+        for scale in timebase_scales():
+            if DIVISIONS * scale < window * (1 - 1e-9):
+                continue
+            # the first scale covering the window needs the fewest points
+            needed = sample_rate * DIVISIONS * scale
+            depth = next((depth for depth in depths if depth >= needed * (1 - 1e-9)), None)
+            if depth is None:
+                raise ValueError(f'{needed:.0f} points needed, {depths[-1]} available with {len(channels)} channels')
+            break
+        else:
+            raise ValueError(f'window {window:g} s exceeds {DIVISIONS * MAX_SCALE:g} s')
+        download = self.download(depth, len(channels))
+        if max_seconds is not None and download['seconds'] > max_seconds:
+            raise ValueError(f"download takes {download['seconds']:.3g} s, over the {max_seconds:g} s budget")
+        return {
+            'channels': channels,
+            'scale': scale,
+            'memory_depth': depth,
+            'sample_rate': float(f'{min(max_rate, depth / (DIVISIONS * scale)):.6g}'),
+            'window': float(f'{DIVISIONS * scale:.6g}'),
+            'download_bytes': download['bytes'],
+            'download_seconds': download['seconds'],
+        }
+
+    def apply(self, plan:dict):
+        '''
+        Enable the plan's channels, then set timebase and memory depth, as
+        one program message. The scope is left running (memory depth can
+        only be changed in RUN).
+        '''
+        commands = [f':CHANnel{chan}:DISPlay {int(chan in plan["channels"])}' for chan in range(1, 5)]
+        commands += [':RUN', f':TIMebase:MAIN:SCALe {plan["scale"]}', f':ACQuire:MDEPth {plan["memory_depth"]}']
+        with self._dso.transaction():
+            self._dso.visa.write_many(commands)
@@ -0,0 +1,196 @@
+from .rigol_ds1000z_constants import WaveSource, WaveMode
+import numpy as np
+import threading
+
+class Rigol_ds1000z_Pyramid:
+    '''
+    Zoomable min/max overview of a stopped RAW capture.
+
+    Each level k >= 1 holds the minimum and maximum sample code of every bin
+    of fanout**k memory points. The levels are filled incrementally as RAW
+    blocks arrive, so an overview is available long before a 24M point
+    download finishes, and range queries are answered from the coarsest
+    level that still gives the requested resolution. Only when a query
+    zooms down to individual points is raw data needed; it comes from the
+    local block cache or, failing that, is fetched from the scope (which
+    must still be stopped on the same capture).
+
+    Point indices are 0-based and ranges are half open: [start, stop).
+
+    example:
+        pyramid = Rigol_ds1000z_Pyramid(dso.wave, WaveSource.CHAN1)
+        pyramid.load(background=True)
+        overview = pyramid.query(0, pyramid.points, max_points=1200)
+        detail = pyramid.query(5_000_000, 5_000_600)  # raw points
+    '''
+
+    def __init__(self, wave, source=WaveSource.CHAN1, fanout:int=4, cache_raw:bool=True,
+                 block_pts:int=None):
+        '''
+        Args:
+            wave (Rigol_ds1000z_Wave): wave subsystem of the stopped scope
+            source (WaveSource): channel to load
+            fanout (int): points per bin at level 1, and bins merged per level above
+            cache_raw (bool): keep downloaded blocks so zooming in never re-reads the scope
+            block_pts (int): points per :WAV:DATA? block; defaults to wave.block_pts
+        '''
+        self.wave = wave
+        self.source = source
+        self.fanout = fanout
+        self.cache_raw = cache_raw
+        self.block_pts = block_pts or wave.block_pts
+        self.preamble = None
+        self.points = 0
+        self.levels = []
+        self._raw_blocks = {}
+        self._loaded = None
+        self._lock = threading.RLock()
+        self._thread = None
+
+    def _prepare(self):
+        self.wave._setup_read(self.source, WaveMode.RAW)
+        self.preamble = self.wave.preamble
+        self.points = self.preamble['points']
+        num_blocks = -(-self.points // self.block_pts)
+        self._loaded = np.zeros(num_blocks, dtype=bool)
+        self.levels = []
+        n_bins = self.points
+        while n_bins > self.fanout:
+            n_bins = -(-n_bins // self.fanout)
+            self.levels.append((np.full(n_bins, 255, dtype=np.uint8),
+                                np.zeros(n_bins, dtype=np.uint8)))
+
+    def load(self, background:bool=False):
+        '''
+        Read the preamble and stream the whole memory into the pyramid.
+
+        With background=True the blocks are read on a worker thread and the
+        call returns immediately; query() can be used while it runs and
+        join() waits for completion.
+        '''
+        with self._lock:
+            self._prepare()
+        if background:
+            self._thread = threading.Thread(target=self._load_blocks, daemon=True)
+            self._thread.start()
+        else:
+            self._load_blocks()
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _load_blocks(self):
+        for block in range(len(self._loaded)):
+            self._fetch_block(block)
+
+    @property
+    def progress(self) -> float:
+        ''' Fraction of the memory already folded into the pyramid '''
+        if self._loaded is None:
+            return 0.0
+        return float(self._loaded.mean())
+
+    def _fetch_block(self, block:int) -> np.ndarray:
+        with self._lock:
+            if block in self._raw_blocks:
+                return self._raw_blocks[block]
+        # downloaded without the lock, so query() keeps serving the overview
+        # meanwhile; a block fetched twice at once is folded in twice, harmlessly
+        offset = block * self.block_pts
+        stop = min(offset + self.block_pts, self.points)
+        with self.wave.visa.transaction():
+            self.wave._setup_read(self.source, WaveMode.RAW) # another reader may have moved the source
+            codes = self.wave.read_data(offset + 1, stop, self.block_pts)
+        with self._lock:
+            if not self._loaded[block]:
+                self.add_block(offset, codes)
+            elif self.cache_raw:
+                self._raw_blocks[block] = codes
+            return codes
+
+    def add_block(self, offset:int, codes:np.ndarray):
+        '''
+        Fold a run of raw codes starting at memory point offset (0-based) into
+        every level. Blocks may arrive in any order; whole download blocks
+        are marked loaded.
+        '''
+        with self._lock:
+            f = self.fanout
+            first_bin, last_bin = offset // f, (offset + len(codes) - 1) // f
+            edges = np.arange(first_bin*f, offset + len(codes), f)
+            edges[0] = offset
+            edges -= offset
+            if self.levels:
+                lvl_min, lvl_max = self.levels[0]
+                span = slice(first_bin, last_bin + 1)
+                np.minimum(lvl_min[span], np.minimum.reduceat(codes, edges), out=lvl_min[span])
+                np.maximum(lvl_max[span], np.maximum.reduceat(codes, edges), out=lvl_max[span])
+            for below, above in zip(self.levels, self.levels[1:]):
+                first_bin, last_bin = first_bin // f, last_bin // f
+                children = slice(first_bin*f, min((last_bin + 1)*f, len(below[0])))
+                edges = np.arange(0, children.stop - children.start, f)
+                above[0][first_bin:last_bin+1] = np.minimum.reduceat(below[0][children], edges)
+                above[1][first_bin:last_bin+1] = np.maximum.reduceat(below[1][children], edges)
+            if offset % self.block_pts == 0 and (len(codes) == self.block_pts or offset + len(codes) == self.points):
+                block = offset // self.block_pts
+                self._loaded[block] = True
+                if self.cache_raw:
+                    self._raw_blocks[block] = codes
+
+    def raw(self, start:int, stop:int) -> np.ndarray:
+        '''
+        Raw codes of points [start, stop), from the block cache where
+        possible and from the scope otherwise. The range is clipped to the
+        memory; an empty one gives an empty array.
+        '''
+        start, stop = max(0, start), min(stop, self.points)
+        if stop <= start:
+            return np.empty(0, np.uint8)
+        first, last = start // self.block_pts, (stop - 1) // self.block_pts
+        codes = np.concatenate([self._fetch_block(b) for b in range(first, last + 1)])
+        base = first * self.block_pts
+        return codes[start - base:stop - base]
+
+    def _to_volts(self, codes:np.ndarray) -> np.ndarray:
+        pre = self.preamble
+        return (codes.astype(np.float64) - pre['yorigin'] - pre['yreference']) * pre['yincrement']
+
+    def query(self, start:int=0, stop:int=None, max_points:int=1200) -> dict:
+        '''
+        Min/max envelope of points [start, stop) with at most max_points bins,
+        taken from the finest level that fits. Bins not loaded yet are NaN.
+        An empty range (after clipping to the memory) gives empty arrays.
+
+        Returns: dict
+            'level'       0 for raw points, k for bins of fanout**k points
+            'bin_points'  memory points per bin
+            'time'        time of the first point of each bin (xorigin based)
+            'min', 'max'  envelope in the channel's vertical units
+        '''
+        if stop is None:
+            stop = self.points
+        start = max(0, start)
+        stop = max(start, min(self.points, stop))
+        level = 0
+        while level < len(self.levels) and -(-(stop - start) // self.fanout**level) > max_points:
+            level += 1
+        pre = self.preamble
+        bin_points = self.fanout**level
+        if level == 0:
+            volts = self._to_volts(self.raw(start, stop))
+            index = np.arange(start, stop)
+            return {'level': 0, 'bin_points': 1, 'min': volts, 'max': volts,
+                    'time': pre['xorigin'] + index * pre['xincrement']}
+        first_bin, last_bin = start // bin_points, (stop - 1) // bin_points
+        with self._lock:
+            lvl_min = self.levels[level-1][0][first_bin:last_bin+1].copy()
+            lvl_max = self.levels[level-1][1][first_bin:last_bin+1].copy()
+        empty = lvl_min > lvl_max
+        v_min, v_max = self._to_volts(lvl_min), self._to_volts(lvl_max)
+        v_min[empty] = np.nan
+        v_max[empty] = np.nan
+        index = np.arange(first_bin, last_bin + 1) * bin_points
+        return {'level': level, 'bin_points': bin_points, 'min': v_min, 'max': v_max,
+                'time': pre['xorigin'] + index * pre['xincrement']}
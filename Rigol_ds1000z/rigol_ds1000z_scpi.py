@@ -0,0 +1,273 @@
+from enum import Enum
+
+'''
+Declarative SCPI settings.
+
+A setting is declared once, with its command header, value type and
+allowed values:
+
+    class Rigol_ds1000z_Channel(Rigol_scpi_Subsystem):
+        @scpi_property(':CHANnel{n}:COUPling', enum=ChannelCoupling)
+        def coupling(self):
+            # docstring of the setting
+
+and the descriptor provides the getter (query and parse the reply), the
+setter (validate, format and write) and the docstring. '{n}' style fields
+in the header are filled from the subsystem's _scpi_format dict; the
+formatted query and write strings are built once per instance.
+
+Value types:
+    float, int  numbers; limits=(low, high) clamps the value before it is
+                written (limits may also be a callable taking the
+                subsystem and returning the tuple)
+    bool        written as 1/0, accepts OnOff, True/False, 1/0 and ON/OFF
+    str         written as is, unless enum is given: then the value must be
+                one of the enum (or any iterable of strings) values, checked
+                against a precomputed lookup table, and replies are returned
+                as enum members (short form replies such as 'NORM' included);
+                aliases={value: member} maps further values, e.g. the bool an
+                older setter took, to members
+
+Subsystems deriving from Rigol_scpi_Subsystem also get:
+    get_many()/set_many()  several settings in one exchange
+    cache_enable()         serve repeated reads from the values last read
+                           or written instead of querying the scope
+'''
+
+_TRUE = frozenset(('1', 'ON', 'TRUE'))
+_FALSE = frozenset(('0', 'OFF', 'FALSE'))
+
+
+class _Choices:
+    '''
+    Lookup tables of the allowed values of a setting: exact values (any
+    case) and short form replies (the unique value starting with the reply).
+    '''
+
+    def __init__(self, enum):
+        self.enum = enum
+        members = list(enum) if isinstance(enum, type) else [str(value) for value in enum]
+        self.exact = {}
+        for member in members:
+            self.exact[str(member).upper()] = member
+            name = getattr(member, 'name', None)
+            if name is not None:
+                self.exact.setdefault(name.upper(), member)
+        self.short = {}
+        for member in members:
+            value = str(member).upper()
+            for length in range(1, len(value)):
+                prefix = value[:length]
+                self.short[prefix] = None if prefix in self.short else member
+
+    def value(self, value):
+        ''' Member for value (a member, its value or its name), or ValueError '''
+        try:
+            return self.exact[str(value).upper()]
+        except KeyError:
+            allowed = '|'.join(str(member) for member in dict.fromkeys(self.exact.values()))
+            raise ValueError(f'{value!r} is not one of {{{allowed}}}') from None
+
+    def parse(self, reply:str):
+        ''' Member matching a reply from the scope, the reply itself if none does '''
+        key = reply.upper()
+        member = self.exact.get(key)
+        if member is None:
+            member = self.short.get(key)
+        return reply if member is None else member
+
+
+class Rigol_scpi_Property:
+    '''
+    Descriptor for one SCPI setting (see the module notes).
+
+    Args:
+        header (str): command header, e.g. ':CHANnel{n}:SCALe'
+        type: float, int, bool or str
+        enum: StrEnum (or iterable of strings) of the allowed values
+        aliases (dict): {value: enum member} also accepted when writing
+        limits (tuple or callable): (low, high) clamping of numbers
+        readonly (bool): query only
+        volatile (bool): never cached and left out of get_many() by
+            default (status and measurement results)
+        doc (str): docstring
+    '''
+
+    def __init__(self, header:str, type=str, enum=None, limits=None,
+                 readonly:bool=False, volatile:bool=False, doc:str=None, aliases:dict=None):
+        self.header = header
+        self.type = type
+        self.choices = _Choices(enum) if enum is not None else None
+        self.aliases = aliases or {}
+        self.limits = limits
+        self.readonly = readonly
+        self.volatile = volatile
+        self.__doc__ = doc
+        self.name = None
+        self._constant = '{' not in header
+
+    def __call__(self, func):
+        ''' Decorator form: the decorated function only supplies name and docstring '''
+        self.__doc__ = func.__doc__
+        return self
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        if '_scpi_properties' not in owner.__dict__:
+            owner._scpi_properties = dict(getattr(owner, '_scpi_properties', {}))
+        owner._scpi_properties[name] = self
+
+    def command(self, obj) -> str:
+        ''' Header with the fields of obj filled in '''
+        if self._constant:
+            return self.header
+        headers = obj.__dict__.setdefault('_scpi_headers', {})
+        header = headers.get(self.name)
+        if header is None:
+            header = headers[self.name] = self.header.format(**obj._scpi_format)
+        return header
+
+    def parse(self, reply:str):
+        ''' Python value of a reply '''
+        reply = reply.strip()
+        if self.type is bool:
+            return reply.upper() in _TRUE
+        if self.type is int:
+            return int(float(reply))
+        if self.type is float:
+            return float(reply)
+        if self.choices is not None:
+            return self.choices.parse(reply)
+        return reply
+
+    def format(self, obj, value) -> str:
+        ''' Validated value, as sent to the scope '''
+        if self.type is bool:
+            if isinstance(value, Enum):
+                value = value.value
+            if isinstance(value, str):
+                if value.upper() not in _TRUE | _FALSE:
+                    raise ValueError(f'{self.name}: {value!r} is not ON or OFF')
+                value = value.upper() in _TRUE
+            return '1' if value else '0'
+        if self.type in (int, float):
+            value = self.type(value)
+            if self.limits is not None:
+                low, high = self.limits(obj) if callable(self.limits) else self.limits
+                value = min(max(value, low), high)
+            return str(value)
+        if self.choices is not None:
+            if self.aliases:
+                value = self.aliases.get(value, value)
+            return str(self.choices.value(value))
+        return str(value)
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        cache = obj._scpi_cache
+        if cache is not None and self.name in cache:
+            return cache[self.name]
+        value = self.parse(obj.visa.query(self.command(obj) + '?'))
+        if cache is not None and not self.volatile:
+            cache[self.name] = value
+        return value
+
+    def __set__(self, obj, value):
+        if self.readonly:
+            raise AttributeError(f'{self.name} is read only')
+        text = self.format(obj, value)
+        obj.visa.write(f'{self.command(obj)} {text}')
+        obj._cache_store(self.name, text)
+
+
+def scpi_property(header:str, type=str, enum=None, limits=None,
+                  readonly:bool=False, volatile:bool=False, aliases:dict=None) -> Rigol_scpi_Property:
+    ''' Rigol_scpi_Property as a decorator of a docstring-only method '''
+    return Rigol_scpi_Property(header, type, enum, limits, readonly, volatile, aliases=aliases)
+
+
+class Rigol_scpi_Subsystem:
+    '''
+    Base of the subsystems declaring their settings with scpi_property.
+    Derived classes set self.visa, and self._scpi_format when their headers
+    have fields.
+    '''
+
+    _scpi_properties = {}
+    _scpi_format = {}
+    _scpi_cache = None
+
+    @classmethod
+    def settings(cls, volatile:bool=False) -> list:
+        ''' Names of the declared settings '''
+        return [name for name, prop in cls._scpi_properties.items() if volatile or not prop.volatile]
+
+    def cache_enable(self, enable:bool=True):
+        '''
+        Serve reads of the settings from the last value read or written.
+        Only safe while nobody changes them from the front panel; call
+        invalidate() after an autoscale, *RST or a settings recall.
+        '''
+        self._scpi_cache = {} if enable else None
+
+    def invalidate(self, *names):
+        ''' Drop names (all settings if none given) from the cache '''
+        if self._scpi_cache is None:
+            return
+        if not names:
+            self._scpi_cache.clear()
+        for name in names:
+            self._scpi_cache.pop(name, None)
+
+    def _cache_store(self, name:str, text:str):
+        if self._scpi_cache is None:
+            return
+        prop = self._scpi_properties[name]
+        if prop.volatile:
+            return
+        self._scpi_cache[name] = prop.parse(text)
+
+    def get_many(self, names=None) -> dict:
+        '''
+        Read several settings in one exchange (one compound query).
+        Cached settings are not queried again.
+
+        Args:
+            names (list of str): settings to read, default all non volatile ones
+
+        Returns: {name: value}
+        '''
+        names = self.settings() if names is None else list(names)
+        props = [self._scpi_properties[name] for name in names]
+        cache = self._scpi_cache or {}
+        missing = [prop for prop in props if prop.name not in cache]
+        values = {}
+        if missing:
+            replies = self.visa.query_many([prop.command(self) + '?' for prop in missing])
+            for prop, reply in zip(missing, replies):
+                values[prop.name] = prop.parse(reply)
+                if self._scpi_cache is not None and not prop.volatile:
+                    self._scpi_cache[prop.name] = values[prop.name]
+        return {name: cache[name] if name in cache else values[name] for name in names}
+
+    def set_many(self, settings:dict=None, **kwargs):
+        '''
+        Write several settings as one program message. Every value is
+        validated before anything is sent.
+
+        example:
+            dso.channel[0].set_many(scale=0.5, offset=0, coupling=ChannelCoupling.DC)
+        '''
+        settings = dict(settings or {}, **kwargs)
+        commands = []
+        for name, value in settings.items():
+            prop = self._scpi_properties[name]
+            if prop.readonly:
+                raise AttributeError(f'{name} is read only')
+            commands.append((name, f'{prop.command(self)} {prop.format(self, value)}'))
+        if not commands:
+            return
+        self.visa.write_many([command for _, command in commands])
+        for name, command in commands:
+            self._cache_store(name, command.split(' ', 1)[1])
@@ -1,41 +1,90 @@
 from .rigol_visa import Rigol_visa
-import os
+from .rigol_ds1000z_constants import class_has_value, ImageFormat
+import io
+import time
 
 class Rigol_ds1000z_Screenshot:
     def __init__(self, visa_resource):
         self.visa_resource = visa_resource
         self.visa = Rigol_visa(visa_resource)
+        self.last_transfer = None
+        self.transfers = {}
 
 
-    def screenshot(self, filename = None, format='png'):
+    def screenshot(self, filename = None, format='png', stream=None,
+                   chunk_size:int=None, render_timeout:float=10.0):
         '''
         Downloads a screenshot from the oscilloscope.
 
+        The :DISPlay:DATA? block is streamed in chunks of its declared length
+        straight into the file or stream, so nothing is sliced blindly and a
+        full BMP24 never has to sit in memory twice. Only the wait for the
+        block header (the scope renders the image first) uses the longer
+        render_timeout; the chunks use the normal resource timeout, which is
+        restored even if the transfer fails.
+
         Args:
             filename (str): The name of the image file.  The appropriate
                 extension should be included (i.e. jpg, png, bmp or tif).
-            type (str): The format image that should be downloaded.  Options
+            format (ImageFormat): The format image that should be downloaded.  Options
                 are 'jpeg, 'png', 'bmp8', 'bmp24' and 'tiff'.  It appears that
                 'jpeg' takes <3sec to download while all the other formats take
                 <0.5sec.  Default is 'png'.
+            stream: writable binary stream to receive the image instead of a file
+            chunk_size (int): bytes per read, defaults to the resource chunk_size
+            render_timeout (float): seconds to wait for the image to be ready
+
+        Returns: the image bytes, or the number of bytes written when a
+            filename or stream is given
         '''
 
-        assert format in ('jpeg', 'png', 'bmp8', 'bmp24', 'tiff')
+        assert class_has_value(format, ImageFormat)
 
-        #Due to the up to 3s delay, we are setting timeout to None for this operation only
-        oldTimeout = self.visa_resource.timeout
-        self.visa_resource.timeout = None
+        if filename:
+            with open(filename, 'wb') as fs:
+                return self._transfer(fs, format, chunk_size, render_timeout)
+        if stream is not None:
+            return self._transfer(stream, format, chunk_size, render_timeout)
+        buffer = io.BytesIO()
+        self._transfer(buffer, format, chunk_size, render_timeout)
+        return buffer.getvalue()
 
-        raw_img = self.visa.query_raw(':disp:data? on,off,%s' % format, 3850780)[11:-4]
+    def _transfer(self, stream, format:ImageFormat, chunk_size:int, render_timeout:float) -> int:
+        start = time.perf_counter()
+        with self.visa.transaction():
+            num_bytes = self.visa.query_block_into(f':disp:data? on,off,{format}', stream,
+                                                   chunk_size, int(render_timeout*1000))
+        elapsed = time.perf_counter() - start
+        self.last_transfer = {
+            'format': str(format),
+            'bytes': num_bytes,
+            'seconds': elapsed,
+            'bytes_per_second': num_bytes / elapsed if elapsed else 0.0,
+        }
+        self.transfers.setdefault(str(format), []).append(elapsed)
+        return num_bytes
 
-        self.visa_resource.timeout = oldTimeout
+    def transfer_report(self) -> dict:
+        '''
+        Mean transfer time (s) per image format over every screenshot taken
+        so far, fastest first.
+        '''
+        means = {fmt: sum(times) / len(times) for fmt, times in self.transfers.items()}
+        return dict(sorted(means.items(), key=lambda item: item[1]))
+
+    def benchmark(self, formats=tuple(ImageFormat), repeats:int=3) -> dict:
+        '''
+        Download repeats screenshots in each format (discarding the images)
+        and return transfer_report() for them, fastest format first.
+        '''
+        for format in formats:
+            self.transfers.pop(str(format), None)
+            for _ in range(repeats):
+                self._transfer(_Discard(), format, None, 10.0)
+        return {fmt: t for fmt, t in self.transfer_report().items() if fmt in map(str, formats)}
 
-        if filename:
-            try:
-                os.remove(filename)
-            except OSError:
-                pass
-            with open(filename, 'wb') as fs:
-                fs.write(raw_img)
 
-        return raw_img
+class _Discard:
+    ''' Write-only sink for benchmark transfers '''
+    def write(self, data):
+        return len(data)
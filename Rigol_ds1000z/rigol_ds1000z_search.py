@@ -0,0 +1,225 @@
+from .rigol_ds1000z_constants import WaveMode, TriggerMode, TriggerSlope, TriggerPulseWhen
+from .rigol_ds1000z_wave import Rigol_ds1000z_Wave
+import numpy as np
+
+'''
+Software trigger search.
+
+The hardware trigger stops at the first event. find_edges() locates every
+threshold crossing of a RAW capture (optionally with hysteresis, so noise
+around the level does not count as edges), chunk by chunk, with the
+crossing time interpolated between the two samples around it.
+Rigol_ds1000z_SearchIndex keeps the edges and the pulses they delimit in
+sorted arrays, so queries such as "positive pulses wider than 2 us" are
+binary searches on the index instead of rescans of the capture.
+'''
+
+_CHUNK_POINTS = 1 << 20
+
+
+def _level_crossings(codes:np.ndarray, level:float, rising:bool) -> np.ndarray:
+    ''' Indices k where codes crosses level between k and k+1, in the given direction '''
+    above = codes > level
+    if rising:
+        return np.flatnonzero(~above[:-1] & above[1:])
+    return np.flatnonzero(above[:-1] & ~above[1:])
+
+
+def _interpolate(codes:np.ndarray, index:np.ndarray, level:float) -> np.ndarray:
+    ''' Fractional sample positions of the level crossings between index and index+1 '''
+    before = codes[index].astype(np.float64)
+    after = codes[index + 1].astype(np.float64)
+    return index + (level - before) / (after - before)
+
+
+def find_edges(codes:np.ndarray, level:float, hysteresis:float=0.0,
+               chunk_points:int=_CHUNK_POINTS) -> tuple:
+    '''
+    Rising and falling crossings of level.
+
+    With hysteresis, an edge only counts once the signal goes past
+    level +/- hysteresis/2 (a Schmitt trigger); its time is still that of
+    the last crossing of level itself before that.
+
+    Args:
+        codes: BYTE codes (or volts, with level and hysteresis in volts)
+        level (float): threshold, same unit as codes
+        hysteresis (float): total hysteresis band, same unit as codes
+        chunk_points (int): points processed at once (bounds the temporaries)
+
+    Returns: (rising, falling) float64 arrays of fractional sample positions (0-based)
+    '''
+    codes = np.asarray(codes)
+    raw = {True: [], False: []}
+    events = {True: [], False: []}
+    state = None # Schmitt trigger output at the end of the previous chunk
+    high, low = level + hysteresis / 2, level - hysteresis / 2
+    for start in range(0, len(codes), chunk_points):
+        # one sample of overlap so crossings at chunk boundaries are found
+        chunk = codes[start:start + chunk_points + 1]
+        for rising in (True, False):
+            index = _level_crossings(chunk, level, rising)
+            raw[rising].append(start + index)
+        if hysteresis <= 0:
+            continue
+        chunk = chunk[:chunk_points]
+        known = np.where(chunk >= high, 1, np.where(chunk <= low, 0, -1)).astype(np.int8)
+        last = np.where(known >= 0, np.arange(len(chunk)), -1)
+        np.maximum.accumulate(last, out=last)
+        current = np.where(last >= 0, known[np.maximum(last, 0)], -1 if state is None else state)
+        previous = np.concatenate(([-1 if state is None else state], current[:-1]))
+        for rising, value in ((True, 1), (False, 0)):
+            events[rising].append(start + np.flatnonzero((current == value) & (previous == 1 - value)))
+        state = current[-1]
+    result = []
+    for rising in (True, False):
+        crossings = np.concatenate(raw[rising]) if raw[rising] else np.zeros(0, np.intp)
+        if hysteresis > 0:
+            # last crossing of level before the sample where the band was left
+            qualified = np.concatenate(events[rising]) if events[rising] else np.zeros(0, np.intp)
+            crossings = crossings[np.searchsorted(crossings, qualified, 'left') - 1]
+        result.append(_interpolate(codes, crossings, level))
+    return tuple(result)
+
+
+class Rigol_ds1000z_SearchIndex:
+    '''
+    Index of every edge and pulse of one source of a RAW capture.
+
+    Times are in s relative to the trigger (the preamble's xorigin, or
+    trigger_position when given). Pulses run from an edge to the next edge
+    of the other direction: positive from rising to falling, negative from
+    falling to rising.
+
+    example:
+        index = Rigol_ds1000z_SearchIndex.from_scope(dso)   # current trigger source and level
+        wide = index.pulses(TriggerPulseWhen.PGREATER, width=2e-6)
+        print(len(wide['start']), wide['start'][:10])
+        print(index.trigger_events()[:10])                  # every event the trigger would fire on
+    '''
+
+    def __init__(self, codes:np.ndarray, preamble:dict, level:float, hysteresis:float=0.0,
+                 trigger_position:int=None, trigger:dict=None, edges:tuple=None):
+        '''
+        Args:
+            codes: RAW BYTE codes of the source
+            preamble (dict): RAW preamble of the capture
+            level (float): threshold, volts
+            hysteresis (float): total hysteresis band, volts
+            trigger_position (int): trigger.position of the capture
+            trigger (dict): trigger settings (trigger.get_many()) used by trigger_events()
+            edges (tuple): (rising, falling) sample positions already found
+                at level/hysteresis; codes are not scanned then
+        '''
+        self.preamble = preamble
+        self.level = level
+        self.hysteresis = hysteresis
+        self.trigger = trigger or {}
+        yinc = preamble['yincrement']
+        level_code = level / yinc + preamble['yorigin'] + preamble['yreference']
+        rising, falling = edges if edges is not None else find_edges(codes, level_code, hysteresis / yinc)
+        self._trigger_index = Rigol_ds1000z_Wave._trigger_index(preamble, trigger_position)
+        self.rising = self._time(rising)
+        self.falling = self._time(falling)
+        self.positive = self._pulses(self.rising, self.falling)
+        self.negative = self._pulses(self.falling, self.rising)
+
+    @classmethod
+    def from_scope(cls, dso, source=None, level:float=None, hysteresis:float=0.0) -> 'Rigol_ds1000z_SearchIndex':
+        '''
+        Download the full RAW memory of source and index it with the scope's
+        current trigger settings (source and level of the edge or pulse
+        trigger, unless given).
+        '''
+        trigger = dso.trigger.get_many()
+        pulse = trigger['mode'] == TriggerMode.PULSE
+        source = source or (trigger['pulse_source'] if pulse else trigger['edge_source'])
+        if level is None:
+            level = trigger['pulse_level'] if pulse else trigger['edge_level']
+        wave = dso.wave
+        with dso.transaction():
+            wave._setup_read(source, WaveMode.RAW)
+            preamble = wave.preamble
+            position = dso.trigger.position
+            codes = wave.read_data(1, preamble['points'])
+        return cls(codes, preamble, level, hysteresis, position, trigger)
+
+    @classmethod
+    def from_capture(cls, capture, name:str, level:float=None, hysteresis:float=0.0) -> 'Rigol_ds1000z_SearchIndex':
+        '''
+        Index channel name of a saved capture (Rigol_ds1000z_Capture or an
+        analysis pool capture), reusing its memoized edges(). The trigger
+        settings and level come from the capture's settings snapshot when
+        recorded, the level otherwise from the middle measure threshold.
+        '''
+        trigger = capture.settings.get('trigger', {})
+        if level is None:
+            level = trigger.get('pulse_level' if trigger.get('mode') == TriggerMode.PULSE else 'edge_level')
+        if level is None:
+            level = capture.thresholds(name)['mid']
+        edges = capture.edges(name, level, hysteresis)
+        return cls(None, capture.preamble(name), level, hysteresis, trigger.get('position'), trigger,
+                   (edges['rising'], edges['falling']))
+
+    def _time(self, positions:np.ndarray) -> np.ndarray:
+        return (positions - self._trigger_index) * self.preamble['xincrement']
+
+    @staticmethod
+    def _pulses(starts:np.ndarray, stops:np.ndarray) -> dict:
+        ''' Pulses from each start edge to the following stop edge, plus a width ordering '''
+        following = np.searchsorted(stops, starts, 'right')
+        complete = following < len(stops)
+        start, stop = starts[complete], stops[following[complete]]
+        width = stop - start
+        order = np.argsort(width, kind='stable')
+        return {'start': start, 'stop': stop, 'width': width, 'order': order, 'sorted_width': width[order]}
+
+    def edges(self, slope:TriggerSlope=TriggerSlope.POSITIVE, t_start:float=None, t_stop:float=None) -> np.ndarray:
+        '''
+        Times of the edges of slope (RISE_FALL for both) between t_start and t_stop.
+        '''
+        if slope == TriggerSlope.RISE_FALL:
+            times = np.sort(np.concatenate((self.rising, self.falling)))
+        else:
+            times = self.rising if slope == TriggerSlope.POSITIVE else self.falling
+        first = 0 if t_start is None else np.searchsorted(times, t_start, 'left')
+        last = len(times) if t_stop is None else np.searchsorted(times, t_stop, 'right')
+        return times[first:last]
+
+    def pulses(self, when:TriggerPulseWhen, width:float=None, upper:float=None, lower:float=None) -> dict:
+        '''
+        Pulses meeting a pulse width trigger condition, in time order.
+
+        Args:
+            when (TriggerPulseWhen): PGREATER/NGREATER (wider than width),
+                PLESS/NLESS (narrower than width), PGLESS/NGLESS (between
+                lower and upper)
+            width, upper, lower (float): pulse widths, s
+
+        Returns: {'start', 'stop', 'width'} arrays (times relative to the trigger, s)
+        '''
+        when = TriggerPulseWhen(when)
+        pulses = self.positive if when in (TriggerPulseWhen.PGREATER, TriggerPulseWhen.PLESS,
+                                           TriggerPulseWhen.PGLESS) else self.negative
+        widths = pulses['sorted_width']
+        if when in (TriggerPulseWhen.PGREATER, TriggerPulseWhen.NGREATER):
+            first, last = np.searchsorted(widths, width, 'right'), len(widths)
+        elif when in (TriggerPulseWhen.PLESS, TriggerPulseWhen.NLESS):
+            first, last = 0, np.searchsorted(widths, width, 'left')
+        else:
+            first, last = np.searchsorted(widths, lower, 'right'), np.searchsorted(widths, upper, 'left')
+        selected = np.sort(pulses['order'][first:last])
+        return {name: pulses[name][selected] for name in ('start', 'stop', 'width')}
+
+    def trigger_events(self) -> np.ndarray:
+        '''
+        Times at which the scope's trigger condition (the settings the index
+        was built with) is met: the edges of edge_slope in EDGE mode, the
+        end of each matching pulse in PULSE mode.
+        '''
+        trigger = self.trigger
+        if trigger.get('mode') == TriggerMode.PULSE:
+            when = TriggerPulseWhen(trigger['pulse_when'])
+            return self.pulses(when, trigger.get('pulse_width'), trigger.get('pulse_upper_width'),
+                               trigger.get('pulse_lower_width'))['stop']
+        return self.edges(trigger.get('edge_slope', TriggerSlope.POSITIVE))
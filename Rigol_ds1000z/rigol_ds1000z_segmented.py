@@ -0,0 +1,255 @@
+from .rigol_ds1000z_constants import WaveSource, WaveMode, WaveFormat
+from collections import deque
+import numpy as np
+import threading
+import time
+
+class Rigol_ds1000z_Segmented:
+    '''
+    Continuous segmented capture for intermittent-fault hunting.
+
+    The scope is configured once (RAW mode, BYTE format, source and window),
+    then the acquisition thread loops single() -> wait_for_trigger() ->
+    download window -> re-arm, pushing each segment into a ring buffer.
+    Other threads may use the scope between captures: when the shared
+    instrument lock shows another thread held it since the last download
+    (Rigol_visa_Lock.handoffs), or dso.wave downloaded other blocks in
+    between (download_stats), the setup is sent again inside that
+    download's transaction. A lone engine sends no setup per capture.
+    A separate consumer thread (or the caller, through get()) drains the
+    buffer so analysis never delays the next re-arm.
+
+    Each segment is a dict:
+        'index'    running capture number
+        'time'     perf_counter() time the scope was ready
+        'start'    first memory point of the window (1-based)
+        'data'     {source: numpy uint8 codes}
+        'preamble' {source: preamble dict}, read once on the first capture
+
+    example:
+        engine = Rigol_ds1000z_Segmented(dso, sources=[WaveSource.CHAN1], start=1, stop=50000)
+        engine.start(consumer=my_analysis)
+        ...
+        engine.stop()
+        print(engine.stats)
+    '''
+
+    def __init__(self, dso, sources=(WaveSource.CHAN1,), start:int=1, stop:int=None,
+                 buffer_size:int=64, trigger_timeout:float=10.0):
+        '''
+        Args:
+            dso (Rigol_ds1000z): scope to drive
+            sources (list of WaveSource): channels downloaded for every trigger
+            start (int): first memory point of the window (1-based)
+            stop (int): last memory point of the window; None for the full memory depth
+            buffer_size (int): ring buffer length; the oldest segment is
+                overwritten (and counted as an overrun) when the consumer falls behind
+            trigger_timeout (float): seconds to wait for each trigger before re-arming
+        '''
+        self._dso = dso
+        self.sources = list(sources)
+        self.window_start = start
+        self.window_stop = stop
+        self.trigger_timeout = trigger_timeout
+        self.preambles = {}
+        self._ring = deque(maxlen=buffer_size)
+        self._ready = threading.Condition()
+        self._halt = threading.Event()
+        self._threads = []
+        self._range_set = False # STARt/STOP of a single block window left in place
+        self._setup_handoffs = None # lock handoffs when the setup was last known good
+        self._setup_blocks = None # wave blocks downloaded by then
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._captures = 0
+        self._overruns = 0
+        self._timeouts = 0
+        self._wait_time = 0.0
+        self._dead_time = 0.0
+        self._first_ready = None
+        self._last_ready = None
+        self._disarmed_at = None
+
+    def arm(self):
+        '''
+        Send the one-off setup. Called by start(); call it directly when
+        driving the loop with capture() (capture() also sends it when needed).
+        '''
+        self._dso.stop()
+        with self._dso.transaction():
+            self._send_setup()
+            self._setup_handoffs = self._dso.wave.visa.lock.handoffs
+            self._setup_blocks = self._dso.wave.download_stats['blocks']
+        self.preambles = {}
+        self._reset_stats()
+
+    def _send_setup(self):
+        wave = self._dso.wave
+        wave.mode = WaveMode.RAW
+        wave.format = WaveFormat.BYTE
+        wave.source = self.sources[0]
+        self._range_set = False
+
+    def capture(self) -> dict:
+        '''
+        Run one single() -> wait -> download cycle and return the segment,
+        or None if no trigger arrived within trigger_timeout.
+        '''
+        self._dso.single()
+        armed = time.perf_counter()
+        if self._disarmed_at is not None:
+            self._dead_time += armed - self._disarmed_at
+        try:
+            self._dso.wait_for_trigger(timeout=self.trigger_timeout)
+        except TimeoutError:
+            self._timeouts += 1
+            self._disarmed_at = None
+            return None
+        ready = time.perf_counter()
+        self._wait_time += ready - armed
+        if self._first_ready is None:
+            self._first_ready = ready
+        self._last_ready = ready
+        self._disarmed_at = ready
+
+        segment = {
+            'index': self._captures,
+            'time': ready,
+            'start': self.window_start,
+            'data': self._download(),
+            'preamble': self.preambles,
+        }
+        self._captures += 1
+        return segment
+
+    def _download(self) -> dict:
+        wave = self._dso.wave
+        lock = wave.visa.lock
+        with wave.visa.transaction():
+            if lock.handoffs != self._setup_handoffs or wave.download_stats['blocks'] != self._setup_blocks:
+                self._send_setup() # somebody else may have changed it since the last capture
+            handoffs = lock.handoffs
+            single_source = len(self.sources) == 1
+            data = {}
+            for source in self.sources:
+                if not single_source:
+                    wave.source = source
+                if source not in self.preambles:
+                    self.preambles[source] = wave.preamble
+                if self.window_stop is None:
+                    self.window_stop = self.preambles[source]['points']
+                if self._range_set:
+                    # single source, single block: STARt/STOP are still in place
+                    data[source] = np.frombuffer(wave.data, 'B')
+                    continue
+                data[source] = wave.read_data(self.window_start, self.window_stop)
+                self._range_set = single_source and (self.window_stop - self.window_start < wave.block_pts)
+            # threads let in at a checkpoint during the download count as well
+            self._setup_handoffs = handoffs
+            self._setup_blocks = wave.download_stats['blocks']
+        return data
+
+    def start(self, consumer=None):
+        '''
+        Arm the scope and start the acquisition thread.
+
+        Args:
+            consumer (callable): called with each segment from its own thread;
+                when omitted segments are collected with get() or iteration
+        '''
+        self.arm()
+        self._halt.clear()
+        self._threads = [threading.Thread(target=self._acquire_loop, daemon=True)]
+        if consumer is not None:
+            self._threads.append(threading.Thread(target=self._consume_loop, args=(consumer,), daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        '''
+        Stop the loop and wait for the threads; segments still buffered stay
+        available through get().
+        '''
+        self._halt.set()
+        with self._ready:
+            self._ready.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _acquire_loop(self):
+        while not self._halt.is_set():
+            segment = self.capture()
+            if segment is None:
+                continue
+            with self._ready:
+                if len(self._ring) == self._ring.maxlen:
+                    self._overruns += 1
+                self._ring.append(segment)
+                self._ready.notify()
+
+    def _consume_loop(self, consumer):
+        while True:
+            segment = self.get()
+            if segment is None:
+                return
+            consumer(segment)
+
+    def get(self, timeout:float=None) -> dict:
+        '''
+        Pop the oldest buffered segment, waiting up to timeout seconds
+        (forever if None). Returns None on timeout or once the loop has
+        stopped and the buffer is empty.
+        '''
+        with self._ready:
+            if not self._ready.wait_for(lambda: self._ring or self._halt.is_set(), timeout):
+                return None
+            if self._ring:
+                return self._ring.popleft()
+            return None
+
+    def __iter__(self):
+        while True:
+            segment = self.get()
+            if segment is None:
+                return
+            yield segment
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def stats(self) -> dict:
+        '''
+        Throughput report:
+            'captures'             segments downloaded
+            'captures_per_second'  sustained rate between the first and last capture
+            'dead_time'            mean seconds per capture the scope was not armed
+                                   (download + re-arm overhead)
+            'dead_time_fraction'   dead time / total loop time
+            'trigger_rate'         estimated triggers per second (a lower bound,
+                                   from the mean armed -> ready wait)
+            'dropped_triggers'     estimated triggers that fell into dead time,
+                                   assuming a steady trigger rate
+            'timeouts'             arm cycles that saw no trigger
+            'overruns'             segments overwritten before they were consumed
+        '''
+        captures = self._captures
+        span = (self._last_ready - self._first_ready) if captures > 1 else 0.0
+        dead_time = self._dead_time / (captures - 1) if captures > 1 else 0.0
+        mean_wait = self._wait_time / captures if captures else 0.0
+        trigger_rate = 1.0 / mean_wait if mean_wait else 0.0
+        return {
+            'captures': captures,
+            'captures_per_second': (captures - 1) / span if span else 0.0,
+            'dead_time': dead_time,
+            'dead_time_fraction': self._dead_time / span if span else 0.0,
+            'trigger_rate': trigger_rate,
+            'dropped_triggers': self._dead_time * trigger_rate,
+            'timeouts': self._timeouts,
+            'overruns': self._overruns,
+        }
@@ -0,0 +1,185 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+'''
+Host-side sine fitting for gain/phase measurements.
+
+Least squares fit of  a*cos(wt) + b*sin(wt) + c  at a known (or detected)
+frequency, which is the same as a lock-in amplifier's I/Q demodulation
+but exact for non-integer numbers of periods.
+
+The *_batch functions take 2D arrays (one capture per row) and fit all rows
+at once; gain_phase_pool spreads many captures over a process pool.
+'''
+
+def detect_frequency(samples:np.ndarray, dt:float) -> float:
+    '''
+    Frequency of the strongest non-DC component, from the FFT peak refined
+    by parabolic interpolation of the log magnitude.
+    '''
+    return float(detect_frequencies(np.asarray(samples)[np.newaxis], dt)[0])
+
+
+def detect_frequencies(samples:np.ndarray, dt) -> np.ndarray:
+    '''
+    detect_frequency() for every row of samples (rows x points).
+    dt is a scalar or one value per row.
+    '''
+    samples = np.asarray(samples, dtype=np.float64)
+    n = samples.shape[-1]
+    window = np.hanning(n)
+    spectrum = np.abs(np.fft.rfft((samples - samples.mean(axis=-1, keepdims=True)) * window, axis=-1))
+    rows = np.arange(len(spectrum))
+    k = np.argmax(spectrum[:, 1:], axis=-1) + 1
+    inner = k < spectrum.shape[-1] - 1
+    k_inner = k[inner]
+    lo, mid, hi = (np.log(spectrum[rows[inner], k_inner + d] + 1e-300) for d in (-1, 0, 1))
+    denominator = lo - 2*mid + hi
+    shift = np.divide(0.5 * (lo - hi), denominator, out=np.zeros_like(lo), where=denominator != 0)
+    k = k.astype(np.float64)
+    k[inner] += shift
+    return k / (n * np.asarray(dt, dtype=np.float64))
+
+
+def fit_sine(samples:np.ndarray, dt:float, frequency:float) -> tuple:
+    '''
+    Amplitude and phase (radians, cosine reference at t=0) of the component
+    of samples at frequency.
+
+    Returns: (amplitude, phase, offset)
+    '''
+    samples = np.asarray(samples, dtype=np.float64)
+    wt = 2*np.pi*frequency*dt*np.arange(len(samples))
+    design = np.column_stack((np.cos(wt), np.sin(wt), np.ones_like(wt)))
+    (a, b, c), *_ = np.linalg.lstsq(design, samples, rcond=None)
+    return np.hypot(a, b), np.arctan2(-b, a), c
+
+
+def fit_sines(samples:np.ndarray, dt, frequency) -> tuple:
+    '''
+    fit_sine() for every row of samples (rows x points).
+
+    dt and frequency are scalars or one value per row. With one frequency and
+    dt for all rows the design matrix is shared and all rows are solved in a
+    single least squares call; otherwise the 3x3 normal equations of every
+    row are built from vectorized sums and solved together.
+
+    Returns: (amplitude, phase, offset) arrays, one value per row
+    '''
+    samples = np.asarray(samples, dtype=np.float64)
+    n = np.arange(samples.shape[-1])
+    step = 2*np.pi*np.asarray(frequency, dtype=np.float64)*np.asarray(dt, dtype=np.float64)
+    if step.ndim == 0:
+        wt = step * n
+        design = np.column_stack((np.cos(wt), np.sin(wt), np.ones_like(wt)))
+        (a, b, c), *_ = np.linalg.lstsq(design, samples.T, rcond=None)
+    else:
+        wt = np.broadcast_to(step, samples.shape[:1])[:, np.newaxis] * n
+        cos, sin = np.cos(wt), np.sin(wt)
+        normal = np.empty((len(samples), 3, 3))
+        normal[:, 0, 0] = np.einsum('ij,ij->i', cos, cos)
+        normal[:, 1, 1] = np.einsum('ij,ij->i', sin, sin)
+        normal[:, 0, 1] = normal[:, 1, 0] = np.einsum('ij,ij->i', cos, sin)
+        normal[:, 0, 2] = normal[:, 2, 0] = cos.sum(axis=-1)
+        normal[:, 1, 2] = normal[:, 2, 1] = sin.sum(axis=-1)
+        normal[:, 2, 2] = len(n)
+        rhs = np.stack((np.einsum('ij,ij->i', cos, samples),
+                        np.einsum('ij,ij->i', sin, samples),
+                        samples.sum(axis=-1)), axis=-1)
+        a, b, c = np.linalg.solve(normal, rhs[..., np.newaxis])[..., 0].T
+    return np.hypot(a, b), np.arctan2(-b, a), c
+
+
+def gain_phase(vin:np.ndarray, vout:np.ndarray, dt:float, frequency:float=None) -> dict:
+    '''
+    Gain and phase of vout relative to vin, both sampled simultaneously
+    with interval dt.
+
+    Args:
+        vin, vout (array): input and output samples
+        dt (float): sample interval (preamble xincrement)
+        frequency (float): stimulus frequency; detected from vin when omitted
+
+    Returns: dict
+        'frequency'  fit frequency in Hz
+        'vin', 'vout' fitted amplitudes (peak)
+        'gain_db'    20*log10(vout/vin)
+        'phase_deg'  phase of vout minus phase of vin, wrapped to (-180, 180]
+    '''
+    result = gain_phase_batch(np.asarray(vin)[np.newaxis], np.asarray(vout)[np.newaxis], dt, frequency)
+    return {key: float(value[0]) for key, value in result.items()}
+
+
+def gain_phase_batch(vin:np.ndarray, vout:np.ndarray, dt, frequency=None) -> dict:
+    '''
+    gain_phase() for a batch of captures (rows x points, one capture per row).
+
+    Args:
+        vin, vout (2D array): input and output samples, same shape
+        dt: sample interval, scalar or one per row
+        frequency: stimulus frequency, scalar or one per row; detected from vin when omitted
+
+    Returns: dict with the keys of gain_phase(), each an array with one value per row
+    '''
+    vin = np.asarray(vin, dtype=np.float64)
+    vout = np.asarray(vout, dtype=np.float64)
+    rows = len(vin)
+    if frequency is None:
+        frequency = detect_frequencies(vin, dt)
+    frequency = np.broadcast_to(np.asarray(frequency, dtype=np.float64), (rows,))
+    if np.ndim(dt) == 0 and np.all(frequency == frequency[0]):
+        amp, phase, _ = fit_sines(np.concatenate((vin, vout)), dt, frequency[0])
+    else:
+        dt = np.broadcast_to(np.asarray(dt, dtype=np.float64), (rows,))
+        amp, phase, _ = fit_sines(np.concatenate((vin, vout)), np.concatenate((dt, dt)),
+                                  np.concatenate((frequency, frequency)))
+    phase = np.degrees(phase[rows:] - phase[:rows])
+    phase = (phase + 180.0) % 360.0 - 180.0
+    phase[phase == -180.0] = 180.0
+    return {
+        'frequency': np.array(frequency),
+        'vin': amp[:rows],
+        'vout': amp[rows:],
+        'gain_db': 20*np.log10(amp[rows:] / amp[:rows]),
+        'phase_deg': phase,
+    }
+
+
+def _gain_phase_chunk(captures:list) -> list:
+    '''
+    Fit a list of (vin, vout, dt, frequency) captures, batching the ones of
+    equal length. Runs in the pool workers.
+    '''
+    results = [None] * len(captures)
+    groups = {}
+    for i, capture in enumerate(captures):
+        groups.setdefault((len(capture[0]), capture[3] is None), []).append(i)
+    for (_, detect), indices in groups.items():
+        batch = gain_phase_batch(
+            np.stack([captures[i][0] for i in indices]),
+            np.stack([captures[i][1] for i in indices]),
+            np.array([captures[i][2] for i in indices]),
+            None if detect else np.array([captures[i][3] for i in indices]))
+        for row, i in enumerate(indices):
+            results[i] = {key: float(value[row]) for key, value in batch.items()}
+    return results
+
+
+def gain_phase_pool(captures, processes:int=None, chunk_size:int=8) -> list:
+    '''
+    gain_phase() for many captures, fitted in batches across a process pool.
+
+    Args:
+        captures (iterable): (vin, vout, dt) or (vin, vout, dt, frequency) tuples;
+            captures may differ in length, dt and frequency
+        processes (int): pool size; None for one per CPU, 0 to fit in this process
+        chunk_size (int): captures sent to a worker at a time
+
+    Returns: list of gain_phase() dicts, in the order of captures
+    '''
+    captures = [tuple(capture) + (None,) * (4 - len(capture)) for capture in captures]
+    chunks = [captures[i:i + chunk_size] for i in range(0, len(captures), chunk_size)]
+    if processes == 0 or len(chunks) <= 1:
+        return [result for chunk in map(_gain_phase_chunk, chunks) for result in chunk]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return [result for chunk in pool.map(_gain_phase_chunk, chunks) for result in chunk]
@@ -0,0 +1,265 @@
+from .rigol_ds1000z_constants import ImageFormat
+import numpy as np
+import hashlib
+import struct
+import time
+import zlib
+
+'''
+Timelapse container layout (little endian):
+
+    b'RGLTLAPS' <version:u16> <tile:u16>
+    records:  <type:1s> <time:f64> <length:u32> <payload>
+        b'K' keyframe  <header_len:u32> <BMP header + palette> zlib(pixel array)
+        b'D' delta     zlib(<count:u16> <tile index:u16>*count <tile pixels>...)
+    index:    b'I' record, payload = (<offset:u64> <type:1s> <time:f64>)*n
+    footer:   <index offset:u64> b'RGLTLIDX'
+
+A file whose recorder was not closed has no index/footer; the reader then
+rebuilds the index by scanning the records.
+'''
+
+_MAGIC = b'RGLTLAPS'
+_FOOTER_MAGIC = b'RGLTLIDX'
+_VERSION = 1
+_FILE_HEADER = struct.Struct('<8sHH')
+_RECORD = struct.Struct('<1sdI')
+_INDEX_ENTRY = struct.Struct('<Q1sd')
+_FOOTER = struct.Struct('<Q8s')
+
+
+def _split_bmp(image:bytes) -> tuple:
+    '''
+    Split a BMP file into (header bytes, pixel array as rows x row bytes).
+    '''
+    pixel_offset, = struct.unpack_from('<I', image, 10)
+    height, = struct.unpack_from('<i', image, 22)
+    pixels = np.frombuffer(image, np.uint8, offset=pixel_offset)
+    rows = abs(height)
+    return image[:pixel_offset], pixels[:rows * (len(pixels) // rows)].reshape(rows, -1)
+
+
+def _tile_slices(shape:tuple, tile:int) -> list:
+    rows, cols = shape
+    return [(slice(r, r + tile), slice(c, c + tile))
+            for r in range(0, rows, tile) for c in range(0, cols, tile)]
+
+
+class Rigol_ds1000z_Timelapse:
+    '''
+    Timelapse screenshot recorder.
+
+    Pulls BMP8 screenshots at a fixed cadence, drops frames whose pixels
+    did not change (hash check) and stores only the changed tiles of the
+    others, zlib compressed, in one indexed container file. A full keyframe
+    is written every keyframe_interval stored frames so any frame can be
+    rebuilt with a bounded number of deltas (see Rigol_ds1000z_TimelapseReader).
+
+    example:
+        with Rigol_ds1000z_Timelapse(dso.screenshot, 'scope.tlp', interval=1.0) as rec:
+            rec.record(duration=24*3600)
+    '''
+
+    def __init__(self, screenshot, filename:str, interval:float=1.0, tile:int=16,
+                 keyframe_interval:int=600, format=ImageFormat.BMP8):
+        '''
+        Args:
+            screenshot (Rigol_ds1000z_Screenshot): screenshot subsystem to pull frames from
+            filename (str): container file to create
+            interval (float): seconds between screenshots
+            tile (int): tile edge in pixels for change detection
+            keyframe_interval (int): stored frames between full keyframes
+            format (ImageFormat): BMP8 (default) or BMP24
+        '''
+        self.screenshot = screenshot
+        self.interval = interval
+        self.tile = tile
+        self.keyframe_interval = keyframe_interval
+        self.format = format
+        self.frames_seen = 0
+        self.frames_stored = 0
+        self._index = []
+        self._header = None
+        self._pixels = None
+        self._digest = None
+        self._since_keyframe = 0
+        self._file = open(filename, 'wb')
+        self._file.write(_FILE_HEADER.pack(_MAGIC, _VERSION, tile))
+
+    def add_frame(self, image:bytes, timestamp:float=None) -> bool:
+        '''
+        Store one BMP frame if it differs from the previous one.
+
+        Returns True if the frame was stored, False if it was skipped.
+        '''
+        timestamp = time.time() if timestamp is None else timestamp
+        self.frames_seen += 1
+        digest = hashlib.blake2b(image, digest_size=16).digest()
+        if digest == self._digest:
+            return False
+        self._digest = digest
+        header, pixels = _split_bmp(image)
+        if (header != self._header or self._pixels.shape != pixels.shape
+                or self._since_keyframe >= self.keyframe_interval):
+            self._write(b'K', timestamp, struct.pack('<I', len(header)) + header
+                        + zlib.compress(pixels.tobytes()))
+            self._header = header
+            self._since_keyframe = 0
+        else:
+            changed = self._changed_tiles(pixels)
+            if not len(changed):
+                return False
+            slices = _tile_slices(pixels.shape, self.tile)
+            payload = struct.pack(f'<H{len(changed)}H', len(changed), *changed)
+            payload += b''.join(pixels[slices[i]].tobytes() for i in changed)
+            self._write(b'D', timestamp, zlib.compress(payload))
+        self._pixels = pixels.copy()
+        self._since_keyframe += 1
+        self.frames_stored += 1
+        return True
+
+    def _changed_tiles(self, pixels:np.ndarray) -> np.ndarray:
+        ''' Indices (in _tile_slices order) of the tiles that differ from the last frame '''
+        tile = self.tile
+        rows, cols = pixels.shape
+        n_rows, n_cols = -(-rows // tile), -(-cols // tile)
+        diff = np.zeros((n_rows*tile, n_cols*tile), dtype=bool)
+        diff[:rows, :cols] = pixels != self._pixels
+        return np.flatnonzero(diff.reshape(n_rows, tile, n_cols, tile).any(axis=(1, 3)))
+
+    def _write(self, kind:bytes, timestamp:float, payload:bytes):
+        self._index.append((self._file.tell(), kind, timestamp))
+        self._file.write(_RECORD.pack(kind, timestamp, len(payload)))
+        self._file.write(payload)
+
+    def capture(self) -> bool:
+        ''' Take one screenshot and add it; returns True if it was stored '''
+        return self.add_frame(self.screenshot.screenshot(format=self.format))
+
+    def record(self, duration:float=None, frames:int=None):
+        '''
+        Capture at the configured interval until duration seconds have
+        passed or frames screenshots were taken (whichever comes first;
+        forever if neither is given).
+        '''
+        start = time.perf_counter()
+        next_shot = start
+        taken = 0
+        while (duration is None or time.perf_counter() - start < duration) and \
+              (frames is None or taken < frames):
+            self.capture()
+            taken += 1
+            next_shot += self.interval
+            time.sleep(max(0.0, next_shot - time.perf_counter()))
+
+    def close(self):
+        ''' Write the index and footer and close the file '''
+        if self._file.closed:
+            return
+        index_offset = self._file.tell()
+        payload = b''.join(_INDEX_ENTRY.pack(*entry) for entry in self._index)
+        self._file.write(_RECORD.pack(b'I', 0.0, len(payload)))
+        self._file.write(payload)
+        self._file.write(_FOOTER.pack(index_offset, _FOOTER_MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Rigol_ds1000z_TimelapseReader:
+    '''
+    Random access to the frames of a timelapse container.
+
+    example:
+        reader = Rigol_ds1000z_TimelapseReader('scope.tlp')
+        print(len(reader), reader.times[0], reader.times[-1])
+        open('frame.bmp', 'wb').write(reader.frame(1234))
+    '''
+
+    def __init__(self, filename:str):
+        self._file = open(filename, 'rb')
+        magic, version, self.tile = _FILE_HEADER.unpack(self._file.read(_FILE_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f'{filename} is not a timelapse container')
+        self._index = self._read_index()
+        self.times = [entry[2] for entry in self._index]
+        self._keyframes = [i for i, entry in enumerate(self._index) if entry[1] == b'K']
+        self._cached = None # (frame number, header, pixels)
+
+    def _read_index(self) -> list:
+        self._file.seek(0, 2)
+        size = self._file.tell()
+        if size >= _FILE_HEADER.size + _FOOTER.size:
+            self._file.seek(size - _FOOTER.size)
+            index_offset, magic = _FOOTER.unpack(self._file.read(_FOOTER.size))
+            if magic == _FOOTER_MAGIC:
+                self._file.seek(index_offset)
+                kind, _, length = _RECORD.unpack(self._file.read(_RECORD.size))
+                payload = self._file.read(length)
+                return [_INDEX_ENTRY.unpack_from(payload, i) for i in range(0, length, _INDEX_ENTRY.size)]
+        # not closed cleanly: rebuild the index from the records
+        index = []
+        offset = _FILE_HEADER.size
+        while offset + _RECORD.size <= size:
+            self._file.seek(offset)
+            kind, timestamp, length = _RECORD.unpack(self._file.read(_RECORD.size))
+            if kind not in (b'K', b'D') or offset + _RECORD.size + length > size:
+                break
+            index.append((offset, kind, timestamp))
+            offset += _RECORD.size + length
+        return index
+
+    def __len__(self):
+        return len(self._index)
+
+    def _payload(self, n:int) -> bytes:
+        offset, _, _ = self._index[n]
+        self._file.seek(offset)
+        _, _, length = _RECORD.unpack(self._file.read(_RECORD.size))
+        return self._file.read(length)
+
+    def frame(self, n:int) -> bytes:
+        ''' Rebuild stored frame n as a complete BMP file '''
+        header, pixels = self._pixels(n)
+        return header + pixels.tobytes()
+
+    def frame_at(self, timestamp:float) -> bytes:
+        ''' The frame on screen at timestamp (the last one stored at or before it) '''
+        n = int(np.searchsorted(self.times, timestamp, side='right')) - 1
+        return self.frame(max(n, 0))
+
+    def _pixels(self, n:int) -> tuple:
+        if n < 0:
+            n += len(self)
+        keyframe = self._keyframes[int(np.searchsorted(self._keyframes, n, side='right')) - 1]
+        if self._cached is not None and keyframe <= self._cached[0] <= n:
+            first, header, pixels = self._cached
+            pixels = pixels.copy()
+        else:
+            payload = self._payload(keyframe)
+            header_len, = struct.unpack_from('<I', payload)
+            header = payload[4:4 + header_len]
+            height, = struct.unpack_from('<i', header, 22)
+            pixels = np.frombuffer(zlib.decompress(payload[4 + header_len:]), np.uint8)
+            pixels = pixels.reshape(abs(height), -1).copy()
+            first = keyframe
+        slices = _tile_slices(pixels.shape, self.tile)
+        for i in range(first + 1, n + 1):
+            payload = zlib.decompress(self._payload(i))
+            count, = struct.unpack_from('<H', payload)
+            tiles = struct.unpack_from(f'<{count}H', payload, 2)
+            pos = 2 + 2*count
+            for t in tiles:
+                target = pixels[slices[t]]
+                size = target.size
+                target[...] = np.frombuffer(payload, np.uint8, size, pos).reshape(target.shape)
+                pos += size
+        self._cached = (n, header, pixels)
+        return header, pixels.copy()
+
+    def close(self):
+        self._file.close()
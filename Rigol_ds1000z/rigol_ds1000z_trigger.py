@@ -1,7 +1,9 @@
 from .rigol_visa import Rigol_visa
-from .rigol_ds1000z_constants import TriggerMode
+from .rigol_ds1000z_scpi import Rigol_scpi_Subsystem, scpi_property
+from .rigol_ds1000z_constants import TriggerMode, TriggerStatus, TriggerCoupling, TriggerSweep, \
+    TriggerSource, TriggerSlope, TriggerPulseWhen
 
-class Rigol_ds1000z_Trigger:
+class Rigol_ds1000z_Trigger(Rigol_scpi_Subsystem):
     '''
     Handles the trigger configuration.
     '''
@@ -10,8 +12,8 @@ class Rigol_ds1000z_Trigger:
         self.visa_resource = visa_resource
         self.visa = Rigol_visa(visa_resource)
 
-    @property
-    def mode(self) -> str:
+    @scpi_property(':TRIGger:MODE', enum=TriggerMode)
+    def mode(self):
         '''
         Select or query the trigger type.
 
@@ -19,74 +21,50 @@ class Rigol_ds1000z_Trigger:
                 PATTern|DELay|TIMeout|DURation|SHOLd|
                 RS232|IIC|SPI}
         '''
-        return self.visa.query(':TRIGger:MODE?')
-    @mode.setter
-    def mode(self, mode:TriggerMode):
-        self.visa.write(f':TRIGger:MODE {mode}')
-        return
 
-    @property
-    def coupling(self) -> str:
+    @scpi_property(':TRIGger:COUPling', enum=TriggerCoupling)
+    def coupling(self):
         '''
         Select or query the trigger coupling type
 
         <couple> Discrete {AC|DC|LFReject|HFReject} default=DC
         '''
-        return self.visa.query(':TRIGger:COUPling?')
-    @coupling.setter
-    def coupling(self, mode:str):
-        self.visa.write(f':TRIGger:COUPling {mode}')
-        return
 
-    @property
-    def status(self) -> str:
-        return self.visa.query(f':TRIGger:STATus?')
+    @scpi_property(':TRIGger:STATus', enum=TriggerStatus, readonly=True, volatile=True)
+    def status(self):
+        '''
+        Query the current trigger status.
+
+        Returns TD, WAIT, RUN, AUTO or STOP
+        '''
 
-    @property
-    def sweep(self) -> str:
+    @scpi_property(':TRIGger:SWEep', enum=TriggerSweep)
+    def sweep(self):
         '''
         Set or query the trigger mode
 
         <sweep> Discrete {AUTO|NORMal|SINGle} default=AUTO
         '''
-        return self.visa.query(':TRIGger:SWEep?')
-    @sweep.setter
-    def sweep(self, sweep:str):
-        self.visa.write(f':TRIGger:SWEep {sweep}')
-        return
-    
-    @property
-    def holdoff(self) -> str:
+
+    @scpi_property(':TRIGger:HOLDoff', float, limits=(16e-9, 10))
+    def holdoff(self):
         '''
         Set or query the trigger holdoff time. The default unit is s.
 
         <holdoff> float 16ns to 10s default=16ns
         '''
-        return self.visa.query(':TRIGger:HOLDoff?')
-    @holdoff.setter
-    def holdoff(self, holdoff:float):
-        self.visa.write(f':TRIGger:HOLDoff {holdoff}')
-        return
-    
-    @property
-    def noise_reject(self) -> bool:
+
+    @scpi_property(':TRIGger:NREJect', bool)
+    def noise_reject(self):
         '''
         Enable or disable noise rejection,
         or query the status of noise rejection
 
         <bool> Bool {{1|ON}|{0|OFF}} 0|OFF
         '''
-        nr = self.visa.query(':TRIGger:NREJect?')
-        nr_bool = True if nr else False
-        return nr_bool
-    @noise_reject.setter
-    def noise_reject(self, nr_enabled:bool):
-        nr = 1 if nr_enabled else 0
-        self.visa.write(f':TRIGger:NREJect {nr}')
-        return
-    
-    @property
-    def position(self) -> int:
+
+    @scpi_property(':TRIGger:POSition', int, readonly=True, volatile=True)
+    def position(self):
         '''
         Query the position in the internal memory that corresponds to the waveform trigger
         position.
@@ -100,46 +78,29 @@ class Rigol_ds1000z_Trigger:
         internal memory that corresponds to the trigger position
 
         '''
-        nr = self.visa.query(':TRIGger:POSition?')
-        nr_bool = True if nr else False
-        return nr_bool
 
-    @property
-    def edge_source(self) -> str:
+    @scpi_property(':TRIGger:EDGe:SOURce', enum=TriggerSource)
+    def edge_source(self):
         '''
-        Enable or disable noise rejection,
-        or query the status of noise rejection
+        Set or query the trigger source in edge trigger
 
         <source> Discrete
             {D0|D1|D2|D3|D4|D5|D6|D7|D8|
             D9|D10|D11|D12|D13|D14|D15|
             CHANnel1|CHANnel2|CHANnel3|CHANnel4|AC}
-            CHANnel1
-        '''
-        nr = self.visa.query(':TRIGger:EDGe:SOURce?')
-        nr_bool = True if nr else False
-        return nr_bool
-    @edge_source.setter
-    def edge_source(self, source:str):
-        self.visa.write(f':TRIGger:EDGe:SOURce {source}')
-        return
-    
-    @property
-    def edge_slope(self) -> str:
+            default=CHANnel1
         '''
-        Enable or disable noise rejection,
-        or query the status of noise rejection
+
+    @scpi_property(':TRIGger:EDGe:SLOPe', enum=TriggerSlope)
+    def edge_slope(self):
+        '''
+        Set or query the edge type in edge trigger
 
         <slope> Discrete {POSitive|NEGative|RFALl} default=POSitive
         '''
-        return self.visa.query(':TRIGger:EDGe:SLOPe?')
-    @edge_slope.setter
-    def edge_slope(self, slope:str):
-        self.visa.write(f':TRIGger:EDGe:SLOPe {slope}')
-        return
-    
-    @property
-    def edge_level(self) -> float:
+
+    @scpi_property(':TRIGger:EDGe:LEVel', float)
+    def edge_level(self):
         '''
         Set or query the trigger level in edge trigger. 
         The unit is the same as the current
@@ -149,14 +110,9 @@ class Rigol_ds1000z_Trigger:
                      ( 5 x VerticalScale - OFFSet) 
                      default = 0
         '''
-        return self.visa.query(':TRIGger:EDGe:LEVel?')
-    @edge_level.setter
-    def edge_level(self, level:str):
-        self.visa.write(f':TRIGger:EDGe:LEVel {level}')
-        return
-    
-    @property
-    def pulse_source(self) -> str:
+
+    @scpi_property(':TRIGger:PULSe:SOURce', enum=TriggerSource)
+    def pulse_source(self):
         '''
         Set or query the trigger source in pulse width trigger
 
@@ -165,14 +121,9 @@ class Rigol_ds1000z_Trigger:
             D9|D10|D11|D12|D13|D14|D15|
             CHANnel1|CHANnel2|CHANnel3|CHANnel4}
         '''
-        return self.visa.query(':TRIGger:PULSe:SOURce?')
-    @pulse_source.setter
-    def pulse_source(self, source:str):
-        self.visa.write(f':TRIGger:PULSe:SOURce {source}')
-        return
 
-    @property
-    def pulse_when(self) -> str:
+    @scpi_property(':TRIGger:PULSe:WHEN', enum=TriggerPulseWhen)
+    def pulse_when(self):
         '''
         Set or query the trigger condition in pulse width trigger
 
@@ -180,14 +131,9 @@ class Rigol_ds1000z_Trigger:
                         NLESs|PGLess|NGLess} 
              default = PGReater
         '''
-        return float(self.visa.query(':TRIGger:PULSe:WHEN?'))
-    @pulse_when.setter
-    def pulse_when(self, when:str):
-        self.visa.write(f':TRIGger:PULSe:WHEN {when}')
-        return
 
-    @property
-    def pulse_width(self) -> float:
+    @scpi_property(':TRIGger:PULSe:WIDTh', float, limits=(8e-9, 10))
+    def pulse_width(self):
         '''
         Set or query the pulse width in pulse width trigger. 
         The default unit is s
@@ -195,17 +141,27 @@ class Rigol_ds1000z_Trigger:
         <width> Real 8ns to 10s PGReater, NGReater: 1μs
                                       PLESs, NLESs: 2μs
         '''
-        return float(self.visa.query(':TRIGger:PULSe:WIDTh?'))
-    @pulse_width.setter
-    def pulse_width(self, width:float):
-        self.visa.write(f':TRIGger:PULSe:WIDTh {width}')
-        return
 
-#  :TRIGger:PULSe:UWIDth
-#  :TRIGger:PULSe:LWIDth
+    @scpi_property(':TRIGger:PULSe:UWIDth', float, limits=(16e-9, 10))
+    def pulse_upper_width(self):
+        '''
+        Set or query the upper limit of the pulse width when the trigger
+        condition is PGLess or NGLess. The default unit is s
+
+        <width> Real 16ns to 10s default = 2μs
+        '''
 
-    @property
-    def pulse_level(self) -> float:
+    @scpi_property(':TRIGger:PULSe:LWIDth', float, limits=(8e-9, 9.99))
+    def pulse_lower_width(self):
+        '''
+        Set or query the lower limit of the pulse width when the trigger
+        condition is PGLess or NGLess. The default unit is s
+
+        <width> Real 8ns to 9.99s default = 992ns
+        '''
+
+    @scpi_property(':TRIGger:PULSe:LEVel', float)
+    def pulse_level(self):
         '''
         Set or query the trigger level in pulse width trigger.
         The unit is the same as the current amplitude unit
@@ -213,12 +169,6 @@ class Rigol_ds1000z_Trigger:
         <level> Real (-5 x VerticalScale - OFFSet) to
                      ( 5 x VerticalScale - OFFSet) 
         '''
-        return float(self.visa.query(':TRIGger:PULSe:LEVEl?'))
-    @pulse_level.setter
-    def pulse_level(self, level:float):
-        self.visa.write(f':TRIGger:PULSe:LEVEl {level}')
-        return
-
 
 # TODO: TRIGger:SLOPe
 # Command List:
@@ -0,0 +1,140 @@
+from .rigol_ds1000z_constants import WaveSource, WaveMode
+import json
+import os
+import time
+
+class Rigol_ds1000z_Tuning:
+    '''
+    Transfer tuning: picks the :WAV:STARt/STOP block size and the transport
+    read chunk size that give the highest throughput on the current link
+    (USBTMC and LAN behave very differently), stores the result per
+    instrument serial number and interface, and applies it.
+
+    The block size goes to dso.wave.block_pts (every wave download, and
+    pyramid/segmented downloads that do not set their own) and the chunk size
+    to the VISA resource (wave blocks and screenshots). Stored settings are
+    applied by load(), or on start by Rigol_ds1000z(load_tuning=True).
+
+    example:
+        dso.tuning.benchmark()   # once per scope and connection, ~1 minute
+        # later sessions
+        dso = Rigol_ds1000z(load_tuning=True)
+
+    benchmark() can also be run against a Rigol_visa_Replay (or any other
+    simulated resource) to compare settings offline.
+    '''
+
+    DEFAULT_FILE = os.path.join(os.path.expanduser('~'), '.rigol_ds1000z_tuning.json')
+    BLOCK_SIZES = (31250, 62500, 125000, 250000)
+    CHUNK_SIZES = (20480, 65536, 262144, 1048576)
+
+    def __init__(self, dso, filename:str=None):
+        '''
+        Args:
+            dso (Rigol_ds1000z): scope to tune
+            filename (str): tuning file, defaults to ~/.rigol_ds1000z_tuning.json
+        '''
+        self._dso = dso
+        self.filename = filename or self.DEFAULT_FILE
+        self.settings = None
+        self._serial = None
+
+    @property
+    def serial(self) -> str:
+        ''' Serial number from *IDN? (queried once) '''
+        if self._serial is None:
+            fields = self._dso.idn().split(',')
+            self._serial = fields[2].strip() if len(fields) > 2 else fields[0].strip()
+        return self._serial
+
+    @property
+    def interface(self) -> str:
+        ''' 'USB', 'TCPIP', ... from the VISA resource name '''
+        name = str(getattr(self._dso.visa_resource, 'resource_name', ''))
+        return name.split('::')[0].rstrip('0123456789') or 'UNKNOWN'
+
+    def apply(self, settings:dict):
+        ''' Use settings {'block_pts', 'chunk_size'} for all following downloads '''
+        self._dso.wave.block_pts = settings['block_pts']
+        self._dso.visa_resource.chunk_size = settings['chunk_size']
+        self.settings = settings
+
+    def _read_file(self) -> dict:
+        ''' The stored settings; a missing or unreadable file holds none '''
+        try:
+            with open(self.filename) as fs:
+                stored = json.load(fs)
+        except (OSError, ValueError):
+            return {}
+        return stored if isinstance(stored, dict) else {}
+
+    def load(self) -> dict:
+        '''
+        Apply the stored settings for this scope and interface, if any.
+        A missing or unreadable tuning file counts as no settings.
+
+        Returns: the settings applied, or None
+        '''
+        stored = self._read_file()
+        if not stored:
+            return None
+        entry = stored.get(self.serial)
+        settings = entry.get(self.interface) if isinstance(entry, dict) else None
+        if not isinstance(settings, dict) or not {'block_pts', 'chunk_size'} <= settings.keys():
+            return None
+        self.apply(settings)
+        return settings
+
+    def save(self, settings:dict):
+        ''' Store settings for this scope and interface '''
+        stored = self._read_file()
+        stored.setdefault(self.serial, {})[self.interface] = settings
+        with open(self.filename, 'w') as fs:
+            json.dump(stored, fs, indent=2)
+
+    def benchmark(self, points:int=1000000, block_sizes=BLOCK_SIZES, chunk_sizes=CHUNK_SIZES,
+                  source:WaveSource=WaveSource.CHAN1, repeats:int=1, save:bool=True) -> dict:
+        '''
+        Time a RAW download of points points for every block size and chunk
+        size combination, then apply (and save) the fastest.
+        The scope is stopped; the capture in memory is only read.
+
+        Args:
+            points (int): points per timed download (clipped to the memory depth)
+            block_sizes (list of int): :WAV:STARt/STOP block sizes to try
+            chunk_sizes (list of int): VISA read chunk sizes to try, bytes
+            source (WaveSource): source to read
+            repeats (int): downloads per combination; the fastest counts
+            save (bool): store the winner in the tuning file
+
+        Returns: dict, the chosen settings plus 'results', one entry per combination
+        '''
+        wave = self._dso.wave
+        resource = self._dso.visa_resource
+        wave._setup_read(source, WaveMode.RAW)
+        points = min(points, wave.preamble['points'])
+        old_chunk_size = resource.chunk_size
+        results = []
+        try:
+            for chunk_size in chunk_sizes:
+                resource.chunk_size = chunk_size
+                for block_pts in block_sizes:
+                    seconds = float('inf')
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        wave.read_data(1, points, block_pts)
+                        seconds = min(seconds, time.perf_counter() - start)
+                    results.append({
+                        'block_pts': block_pts,
+                        'chunk_size': chunk_size,
+                        'seconds': seconds,
+                        'points_per_second': points / seconds if seconds else float('inf'),
+                    })
+        finally:
+            resource.chunk_size = old_chunk_size
+        best = max(results, key=lambda result: result['points_per_second'])
+        settings = dict(best, interface=self.interface, measured=time.time())
+        self.apply(settings)
+        if save:
+            self.save(settings)
+        return dict(settings, results=results)
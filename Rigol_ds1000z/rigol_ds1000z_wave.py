@@ -1,6 +1,9 @@
 from .rigol_visa import Rigol_visa
 from .rigol_ds1000z_constants import WaveSource, WaveMode, WaveFormat
+import pyvisa as _visa
 import numpy as np
+import math
+import time
 
 class Rigol_ds1000z_Wave():
     '''
@@ -11,6 +14,15 @@ class Rigol_ds1000z_Wave():
     def __init__(self, visa_resource):
         self.visa_resource = visa_resource
         self.visa = Rigol_visa(visa_resource)
+        self.block_pts = self.MAX_BLOCK_POINTS[WaveFormat.BYTE]
+        self.retries = 3
+        self.retry_backoff = 0.05
+        self.download_stats = dict.fromkeys(
+            ('blocks', 'points', 'retries', 'timeouts', 'short_blocks', 'failed', 'resumed'), 0)
+        self._resume = {} # {read key: blocks read so far} of the last failed read_data()
+        self._read_setup = {} # source, mode and format last sent
+        self._last_preamble = None
+        self._acquisition = 0 # bumped by new_acquisition()
 
     @property
     def source(self) -> WaveSource:
@@ -26,6 +38,7 @@ class Rigol_ds1000z_Wave():
     @source.setter
     def source(self, source:WaveSource):
         self.visa.write(f':WAVeform:SOURce {source}')
+        self._update_read_setup('source', source)
         return
     
     @property
@@ -39,6 +52,7 @@ class Rigol_ds1000z_Wave():
     @mode.setter
     def mode(self, mode:WaveMode):
         self.visa.write(f':WAVeform:MODE {mode}')
+        self._update_read_setup('mode', mode)
         return
     
     @property
@@ -52,6 +66,7 @@ class Rigol_ds1000z_Wave():
     @format.setter
     def format(self, format:WaveFormat):
         self.visa.write(f':WAVeform:FORMat {format}')
+        self._update_read_setup('format', format)
         return
     
     @property
@@ -71,8 +86,11 @@ class Rigol_ds1000z_Wave():
         When the memory depth of the scope is greater than the number of points 
         that can be read, one must perform multiple block reads using START and STOP
         to define the blocks.
+
+        Returns the data bytes of the block with the #<n><length> header and
+        the terminator stripped.
         '''
-        return self.visa.write_read_raw(f':WAVeform:DATA?')
+        return self.visa.query_block(f':WAVeform:DATA?')
 
     @property
     def x_increment(self) -> float:
@@ -211,64 +229,235 @@ class Rigol_ds1000z_Wave():
             'yorigin': float(pre[8]),
             'yreference': float(pre[9]),
         }
+        if pre_dict != self._last_preamble:
+            self._resume.clear()
+        self._last_preamble = pre_dict
         return pre_dict
     
     # Helper scripts
 
+    def new_acquisition(self):
+        '''
+        Drop the blocks kept for resuming a failed read_data(): the memory
+        now holds (or will hold) another acquisition. Called by the scope's
+        run(), single(), autoscale() and clear().
+        '''
+        self._acquisition += 1
+        self._resume.clear()
+
+    def _update_read_setup(self, name:str, value):
+        if self._read_setup.get(name) != value:
+            self._resume.clear()
+        self._read_setup[name] = value
+
+    # Most points a single :WAVeform:DATA? block can return per format
+    MAX_BLOCK_POINTS = {
+        WaveFormat.BYTE: 250000,
+        WaveFormat.WORD: 125000,
+        WaveFormat.ASCII: 15625,
+    }
+
+    def read_data(self, start:int, stop:int, block_pts:int=None,
+        progress=None,
+        ) -> np.ndarray:
+        '''
+        Read points start..stop (1-based, inclusive) of the current source as
+        raw BYTE codes, issuing one STARt/STOP/DATA? exchange per block of at
+        most block_pts points.
+
+        A block that times out or arrives short is retried on its own (input
+        flushed, STARt/STOP re-issued) up to self.retries times, waiting
+        self.retry_backoff s, doubling per attempt. If a block still fails,
+        the blocks read so far are kept and the next call for the same range
+        resumes from the failed block, as long as source, mode, format and
+        the preamble last read are unchanged and the scope has not acquired
+        again (run(), single(), autoscale() and clear() of the scope call
+        new_acquisition()). Acquisitions started from the front panel are not
+        seen, so re-read the preamble or call new_acquisition() after one.
+
+        Source, mode and format must already be set; nothing else is sent.
+
+        Args:
+            start, stop (int): first and last point, 1-based
+            block_pts (int): points per block, defaults to self.block_pts
+                (see rigol_ds1000z_tuning)
+            progress (callable): called as progress(points_done, points_total)
+                after every block
+
+        Returns: numpy uint8 array of stop - start + 1 codes
+        '''
+        block_pts = block_pts or self.block_pts
+        setup = tuple(self._read_setup.get(name) for name in ('source', 'mode', 'format'))
+        preamble = tuple(self._last_preamble.values()) if self._last_preamble else None
+        key = (setup, preamble, self._acquisition, start, stop, block_pts)
+        blocks = self._resume.pop(key, [])
+        self._resume.clear()
+        done = sum(len(block) for block in blocks)
+        total = stop - start + 1
+        self.download_stats['resumed'] += bool(blocks)
+        for block_start in range(start + done, stop+1, block_pts):
+            try:
+                blocks.append(self.read_range(block_start, min(block_start + block_pts - 1, stop)))
+            except (_visa.errors.VisaIOError, ValueError):
+                self._resume = {key: blocks}
+                raise
+            done += len(blocks[-1])
+            if progress is not None:
+                progress(done, total)
+            self.visa.checkpoint() # high priority threads may run between blocks
+        if len(blocks) == 1:
+            return blocks[0]
+        return np.concatenate(blocks)
+
+    def read_range(self, start:int, stop:int) -> np.ndarray:
+        '''
+        One STARt/STOP/DATA? exchange (at most MAX_BLOCK_POINTS points),
+        with the timeout/short block recovery described in read_data().
+
+        Returns: numpy uint8 array of stop - start + 1 codes
+        '''
+        stats = self.download_stats
+        for attempt in range(self.retries + 1):
+            try:
+                with self.visa.transaction():
+                    self.start = start
+                    self.stop = stop
+                    block = np.frombuffer(self.data, 'B')
+                if len(block) != stop - start + 1:
+                    stats['short_blocks'] += 1
+                    raise ValueError(f'block {start}..{stop}: {len(block)} of {stop - start + 1} points')
+                stats['blocks'] += 1
+                stats['points'] += len(block)
+                return block
+            except (_visa.errors.VisaIOError, ValueError) as err:
+                if isinstance(err, _visa.errors.VisaIOError):
+                    stats['timeouts'] += 1
+                if attempt == self.retries:
+                    stats['failed'] += 1
+                    raise
+                stats['retries'] += 1
+                self.visa.flush()
+                time.sleep(self.retry_backoff * 2**attempt)
+
     def get_wavedata(self, 
         source=WaveSource.CHAN1, 
         mode=WaveMode.NORMAL,
+        progress=None,
         ) -> list: 
         '''
         Download the captured voltage points from the oscilloscope.
+        Failed blocks are retried and resumed, see read_data().
 
         Args:
             source (WaveSource): channel, digital, or Math source
             mode (WaveMode): Normal, Max, or Raw
+            progress (callable): progress(points_done, points_total) after every block
             format is fixed as BYTE 
 
         Returns: 2D list
             list[0] time values
             list[1] voltage values
         '''
-        # assert mode in ('norm', 'raw')
+        with self.visa.transaction():
+            self._setup_read(source, mode)
+
+            preamble = self.preamble
+            datas = self.read_data(1, preamble['points'], progress=progress)
+
+        v = (datas - preamble['yorigin'] - preamble['yreference']) * preamble['yincrement']
+        t = np.arange(preamble['points']) * preamble['xincrement']
+        return_list = [t.tolist(), v.tolist()]
+        return return_list
+
+    def get_volts(self,
+        sources=(WaveSource.CHAN1, WaveSource.CHAN2),
+        mode=WaveMode.RAW,
+        ) -> tuple:
+        '''
+        Download several sources of the same acquisition (the scope is
+        stopped first) as one numpy array, e.g. CH1/CH2 for gain/phase fitting.
 
-        # Setup scope
+        Args:
+            sources (list of WaveSource): sources to read, all with the same point count
+            mode (WaveMode): Normal, Max, or Raw
+
+        Returns: (sample interval in s, 2D numpy array of volts, one row per source)
+        '''
+        rows = []
+        with self.visa.transaction():
+            self._setup_read(sources[0], mode)
+            for source in sources:
+                self.source = source
+                preamble = self.preamble
+                datas = self.read_data(1, preamble['points'])
+                rows.append((datas - preamble['yorigin'] - preamble['yreference']) * preamble['yincrement'])
+        return preamble['xincrement'], np.stack(rows)
+
+    def _setup_read(self, source:WaveSource, mode:WaveMode):
         self.visa.write(f':stop') # can't access parent
         self.source = source
         self.mode = mode
-        format = WaveFormat.BYTE
-        self.format = format
-
-        preamble = self.preamble
-
-        readout_pts_byte_format = 250000
-        readout_pts_word_format = 125000
-        readout_pts_ascii_format = 15625
-
-        readout_pts = readout_pts_byte_format
-        num_blocks = preamble['points'] // readout_pts # floor division
-        last_block_pts = preamble['points'] % readout_pts # modulo
-
-        datas = []
-        for i in range(num_blocks+1):
-            if i < num_blocks:
-                self.start = (1+i*readout_pts)
-                self.stop = (readout_pts*(i+1))
-            else:
-                if last_block_pts:
-                    self.start = (1+num_blocks*readout_pts)
-                    self.stop = (num_blocks*readout_pts+last_block_pts)
-                else:
-                    break
-            mydata = self.visa.write_read_raw(':wav:data?')
-            mydata2 = self.data
-            data = self.data[11:]
-            data = np.frombuffer(data, 'B')
-            datas.append(data)
-
-        datas = np.concatenate(datas)
+        self.format = WaveFormat.BYTE
+
+    def window_points(self, t_start:float, t_stop:float, preamble:dict, trigger_position:int=None) -> tuple:
+        '''
+        Convert a time window relative to the trigger into the RAW memory
+        point range (1-based, inclusive) for :WAV:STARt/:WAV:STOP.
+
+        Args:
+            t_start, t_stop (float): window edges in seconds, relative to the
+                trigger (negative = before the trigger)
+            preamble (dict): RAW mode preamble of the capture
+            trigger_position (int): trigger.position of the capture; values
+                <= 0 (not triggered / outside memory) fall back to xorigin
+
+        Returns: (start, stop), clipped to the memory depth
+        '''
+        xinc = preamble['xincrement']
+        trigger_index = self._trigger_index(preamble, trigger_position)
+        first = trigger_index + math.ceil(t_start / xinc)
+        last = trigger_index + math.floor(t_stop / xinc)
+        start = max(1, int(round(first)) + 1)
+        stop = min(preamble['points'], int(round(last)) + 1)
+        if start > stop:
+            raise ValueError(f'window {t_start}..{t_stop} s is outside the captured memory')
+        return start, stop
+
+    @staticmethod
+    def _trigger_index(preamble:dict, trigger_position:int=None) -> float:
+        ''' 0-based memory index of the trigger point '''
+        if trigger_position is not None and trigger_position > 0:
+            return trigger_position
+        return -preamble['xorigin'] / preamble['xincrement']
+
+    def get_window(self, t_start:float, t_stop:float,
+        source=WaveSource.CHAN1,
+        preamble:dict=None,
+        trigger_position:int=None,
+        ) -> list:
+        '''
+        Download only the RAW points between t_start and t_stop seconds
+        relative to the trigger, instead of the whole memory depth.
+
+        Args:
+            t_start, t_stop (float): window edges in seconds relative to the trigger
+            source (WaveSource): channel, digital, or Math source
+            preamble (dict): RAW preamble already read for this capture; queried when omitted
+            trigger_position (int): trigger.position of this capture; queried when omitted
+
+        Returns: 2D list
+            list[0] time values relative to the trigger
+            list[1] voltage values
+        '''
+        with self.visa.transaction():
+            self._setup_read(source, WaveMode.RAW)
+            if preamble is None:
+                preamble = self.preamble
+            if trigger_position is None:
+                trigger_position = int(self.visa.query(':TRIGger:POSition?'))
+            start, stop = self.window_points(t_start, t_stop, preamble, trigger_position)
+            datas = self.read_data(start, stop)
+
         v = (datas - preamble['yorigin'] - preamble['yreference']) * preamble['yincrement']
-        t = np.arange(0, preamble['points']*preamble['xincrement'], preamble['xincrement'])
-        return_list = [t.tolist(), v.tolist()]
-        return return_list
\ No newline at end of file
+        t = (np.arange(start - 1, stop) - self._trigger_index(preamble, trigger_position)) * preamble['xincrement']
+        return [t.tolist(), v.tolist()]
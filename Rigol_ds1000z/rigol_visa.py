@@ -1,28 +1,427 @@
 
 import pyvisa as _visa
+from contextlib import contextmanager
+from functools import lru_cache
+import heapq
+import itertools
+import threading
+import time
+import weakref
+
+# Transport monitors: callables monitor(header, op, num_bytes, seconds), called
+# once per command (write/query) or separate read, with the SCPI header it
+# belongs to; a block reply read in several transfers counts as one.
+# While the list is empty the transport does no timing at all.
+_monitors = []
+
+def add_monitor(monitor):
+    ''' Register a transport monitor (see rigol_visa_stats for the built-in one) '''
+    _monitors.append(monitor)
+
+def remove_monitor(monitor):
+    _monitors.remove(monitor)
+
+@lru_cache(maxsize=1024)
+def scpi_header(cmd:str) -> str:
+    '''
+    Normalise the header of a SCPI command to its upper-case short form,
+    so ':WAVeform:DATA?', ':wav:data?' and ':WAV:DATA?' all map to ':WAV:DATA?'.
+
+    Short form rule: the first four letters of each node, or three if the
+    fourth is a vowel; numeric suffixes are kept (CHANnel1 -> CHAN1).
+
+    A compound message (see query_many) maps to the ';' joined headers of
+    its commands, e.g. ':CHAN1:SCAL?;:CHAN1:OFFS?'.
+    '''
+    if ';' in cmd:
+        return ';'.join(scpi_header(part) for part in cmd.split(';') if part.strip())
+    header = cmd.strip().split(' ', 1)[0].upper()
+    if not header.startswith((':', '*')):
+        header = ':' + header
+    query = header.endswith('?')
+    nodes = []
+    for node in header.rstrip('?').split(':'):
+        digits = len(node) - len(node.rstrip('0123456789'))
+        name, suffix = (node[:-digits], node[-digits:]) if digits else (node, '')
+        if len(name) > 4 and not name.startswith('*'):
+            name = name[:3] if name[3] in 'AEIOU' else name[:4]
+        nodes.append(name + suffix)
+    return ':'.join(nodes) + ('?' if query else '')
+
+
+# Concurrency model
+#
+# All Rigol_visa wrappers of one VISA resource (the driver creates one per
+# subsystem) share one reentrant Rigol_visa_Lock, so a scope object can be
+# used from several threads:
+#  - every transport call (write, query, a whole block read, ...) is atomic;
+#  - multi-command sequences that must not be interleaved run inside
+#    Rigol_visa.transaction() / Rigol_ds1000z.transaction(); the waveform and
+#    screenshot downloads already do;
+#  - long transactions call checkpoint() at safe points (between waveform
+#    blocks). Threads running at PRIORITY_HIGH (see priority()) that wait for
+#    the lock get it there, for one call or transaction each, before the
+#    download resumes. High priority work must not change settings the
+#    interrupted sequence depends on (waveform source/mode, channel scale, ...):
+#    queries such as measurements and counter reads are the intended use.
+
+PRIORITY_NORMAL = 0
+PRIORITY_HIGH = 10
+
+_thread_state = threading.local()
+
+@contextmanager
+def priority(level:int=PRIORITY_HIGH):
+    '''
+    Run the transport calls this thread makes inside the block at priority
+    level; PRIORITY_HIGH calls may interleave with other threads'
+    transactions at their checkpoints.
+
+    example:
+        with rigol_visa.priority():
+            while polling:
+                frequency = dso.measure.counter_value
+    '''
+    previous = getattr(_thread_state, 'priority', PRIORITY_NORMAL)
+    _thread_state.priority = level
+    try:
+        yield
+    finally:
+        _thread_state.priority = previous
+
+
+class Rigol_visa_Lock:
+    '''
+    Reentrant lock handed out in priority order (FIFO within a priority),
+    with checkpoint() to let higher priority waiters in during a long hold.
+    As a context manager it acquires at the calling thread's priority().
+
+    handoffs counts the times the lock went to a different thread than its
+    previous owner: a thread finding it unchanged since it last held the
+    lock knows nobody else has sent commands in between.
+    '''
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._owner = None
+        self._count = 0
+        self._last_owner = None
+        self.handoffs = 0
+        self._waiters = [] # heap of (-priority, sequence, thread id)
+        self._sequence = itertools.count()
+
+    def _wait_turn(self, priority:float, owner:int, count:int):
+        entry = (-priority, next(self._sequence), owner)
+        heapq.heappush(self._waiters, entry)
+        self._condition.wait_for(lambda: self._owner is None and self._waiters[0] is entry)
+        heapq.heappop(self._waiters)
+        self._take(owner, count)
+        self._condition.notify_all()
+
+    def _take(self, owner:int, count:int):
+        if owner != self._last_owner:
+            self.handoffs += 1
+            self._last_owner = owner
+        self._owner = owner
+        self._count = count
+
+    def acquire(self, priority:int=None):
+        if priority is None:
+            priority = getattr(_thread_state, 'priority', PRIORITY_NORMAL)
+        me = threading.get_ident()
+        with self._condition:
+            if self._owner == me:
+                self._count += 1
+                return
+            if self._owner is None and not self._waiters:
+                self._take(me, 1)
+                return
+            self._wait_turn(priority, me, 1)
+
+    def release(self):
+        with self._condition:
+            if self._owner != threading.get_ident():
+                raise RuntimeError('cannot release un-acquired lock')
+            self._count -= 1
+            if not self._count:
+                self._owner = None
+                self._condition.notify_all()
+
+    def checkpoint(self, priority:int=PRIORITY_HIGH) -> bool:
+        '''
+        Called by the owner at a safe point: if threads of at least priority
+        are waiting, release the lock completely, let them run, and take it
+        back ahead of every waiter of lower priority.
+
+        Returns: True if other threads ran
+        '''
+        me = threading.get_ident()
+        with self._condition:
+            if self._owner != me or not self._waiters or -self._waiters[0][0] < priority:
+                return False
+            count = self._count
+            self._owner = None
+            self._count = 0
+            self._condition.notify_all()
+            self._wait_turn(priority - 0.5, me, count)
+            return True
+
+    def owned(self) -> bool:
+        return self._owner == threading.get_ident()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+_resource_locks = weakref.WeakKeyDictionary()
+_resource_locks_by_id = {}
+_registry_lock = threading.Lock()
+
+def resource_lock(visa_resource) -> Rigol_visa_Lock:
+    ''' The Rigol_visa_Lock shared by every wrapper of visa_resource '''
+    with _registry_lock:
+        try:
+            lock = _resource_locks.get(visa_resource)
+            if lock is None:
+                lock = _resource_locks[visa_resource] = Rigol_visa_Lock()
+        except TypeError: # not weak-referenceable
+            lock = _resource_locks_by_id.setdefault(id(visa_resource), Rigol_visa_Lock())
+        return lock
 
 
 class Rigol_visa:
     # def __init__(self, visa_resource:_visa.resources.Resource): # not sure this is the right type hint
     def __init__(self, visa_resource):
         self.visa_resource = visa_resource
+        self.lock = resource_lock(visa_resource)
+        self._header = ''
+        self._batch = None # bytes read so far inside _one_call()
+        self._compound_queries = True
         return
 
+    @contextmanager
+    def transaction(self):
+        '''
+        Hold the instrument lock for a multi-command sequence so no other
+        thread's commands land in between (except at checkpoint()s).
+
+        example:
+            with dso.visa.transaction():
+                dso.wave.source = WaveSource.CHAN2
+                preamble = dso.wave.preamble
+        '''
+        with self.lock:
+            yield self
+
+    def checkpoint(self) -> bool:
+        ''' Let waiting high priority threads in, if this thread holds the lock '''
+        return self.lock.checkpoint()
+
+    def _notify(self, op:str, num_bytes:int, start:float):
+        if self._batch is not None:
+            if op != 'write':
+                self._batch += num_bytes
+            return
+        seconds = time.perf_counter() - start
+        for monitor in _monitors:
+            monitor(self._header, op, num_bytes, seconds)
+
+    @contextmanager
+    def _one_call(self, op:str):
+        '''
+        Report the transport calls made inside the block (e.g. a command and
+        the transfers of its block reply) to the monitors as one op.
+        '''
+        if not _monitors or self._batch is not None:
+            yield
+            return
+        self._batch = 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            num_bytes, self._batch = self._batch, None
+        self._notify(op, num_bytes, start)
+
     def write(self, cmd):
-        self.visa_resource.write(cmd)
+        with self.lock:
+            if _monitors:
+                self._header = scpi_header(cmd)
+                start = time.perf_counter()
+                self.visa_resource.write(cmd)
+                self._notify('write', len(cmd), start)
+                return
+            self.visa_resource.write(cmd)
         return
 
     def read(self):
-        return self.visa_resource.read().strip()
+        with self.lock:
+            if _monitors:
+                start = time.perf_counter()
+                reply = self.visa_resource.read()
+                self._notify('read', len(reply), start)
+                return reply.strip()
+            return self.visa_resource.read().strip()
 
     def read_raw(self, num_bytes:int=None):
-        return self.visa_resource.read_raw(num_bytes)
+        with self.lock:
+            if _monitors:
+                start = time.perf_counter()
+                reply = self.visa_resource.read_raw(num_bytes)
+                self._notify('read', len(reply), start)
+                return reply
+            return self.visa_resource.read_raw(num_bytes)
+
+    def read_bytes(self, count:int) -> bytes:
+        with self.lock:
+            if _monitors:
+                start = time.perf_counter()
+                reply = self.visa_resource.read_bytes(count)
+                self._notify('read', len(reply), start)
+                return reply
+            return self.visa_resource.read_bytes(count)
 
     def query(self, cmd):
-        return self.visa_resource.query(cmd)
+        with self.lock:
+            if _monitors:
+                self._header = scpi_header(cmd)
+                start = time.perf_counter()
+                reply = self.visa_resource.query(cmd)
+                self._notify('query', len(reply), start)
+                return reply
+            return self.visa_resource.query(cmd)
+
+    def query_many(self, cmds:list) -> list:
+        '''
+        Send several queries as one ';' separated program message and split
+        the ';' separated reply, saving a round trip per query.
+
+        If the instrument does not answer the compound message with one
+        field per query, the queries are sent one at a time instead (and
+        from then on for this wrapper).
+
+        Returns: list of reply strings, one per query, whitespace stripped
+        '''
+        with self.lock:
+            if len(cmds) > 1 and self._compound_queries:
+                try:
+                    fields = self.query(';'.join(cmds)).strip().split(';')
+                    if len(fields) == len(cmds):
+                        return [field.strip() for field in fields]
+                except _visa.errors.VisaIOError:
+                    pass
+                self._compound_queries = False
+                self.flush()
+            return [self.query(cmd).strip() for cmd in cmds]
+
+    def write_many(self, cmds:list):
+        '''
+        Send several commands as one ';' separated program message, or one at
+        a time once the instrument was found not to take compound messages
+        (see query_many).
+        '''
+        with self.lock:
+            if self._compound_queries:
+                self.write(';'.join(cmds))
+            else:
+                for cmd in cmds:
+                    self.write(cmd)
+
+    def flush(self):
+        ''' Discard anything left unread in the instrument output queue '''
+        with self.lock:
+            try:
+                self.visa_resource.clear()
+            except (AttributeError, NotImplementedError, _visa.errors.VisaIOError):
+                pass
 
     def write_read_raw(self, cmd, num_bytes:int=None):
-        self.write(cmd)
-        return self.read_raw(num_bytes)
+        with self.lock:
+            self.write(cmd)
+            return self.read_raw(num_bytes)
+
+    def read_block(self) -> bytes:
+        '''
+        Read an IEEE 488.2 definite length block (#<n><length><data>) and
+        return the data bytes only.
+
+        Reads continue until the declared length has arrived, so a block split
+        across several transfers (or cut short by a termination character that
+        happens to appear in the binary data) is reassembled; the trailing
+        terminator is dropped.
+        '''
+        with self.lock, self._one_call('read'):
+            raw = bytearray(self.read_raw())
+            if raw[:1] != b'#':
+                raise ValueError(f'expected a #<n><length> block header, got {bytes(raw[:12])!r}')
+            n = int(raw[1:2])
+            length = int(raw[2:2+n])
+            begin = 2 + n
+            while len(raw) < begin + length:
+                raw += self.read_raw()
+        return bytes(raw[begin:begin+length])
+
+    def query_block(self, cmd) -> bytes:
+        with self.lock, self._one_call('query'):
+            self.write(cmd)
+            return self.read_block()
+
+    def query_block_into(self, cmd, stream, chunk_size:int=None, header_timeout_ms:int=None) -> int:
+        ''' Send cmd and stream its block reply into stream (see read_block_into) '''
+        with self.lock, self._one_call('query'):
+            self.write(cmd)
+            return self.read_block_into(stream, chunk_size, header_timeout_ms)
+
+    @contextmanager
+    def scoped_timeout(self, timeout_ms:int):
+        '''
+        Use timeout_ms (finite, in ms) as the resource timeout for the
+        duration of one operation and restore the previous value afterwards,
+        even if the operation fails.
+        '''
+        with self.lock:
+            old_timeout = self.visa_resource.timeout
+            self.visa_resource.timeout = timeout_ms
+            try:
+                yield
+            finally:
+                self.visa_resource.timeout = old_timeout
+
+    def read_block_into(self, stream, chunk_size:int=None, header_timeout_ms:int=None) -> int:
+        '''
+        Stream an IEEE 488.2 definite length block into a writable binary
+        stream (file, BytesIO, ...) chunk by chunk, without holding the whole
+        block in memory.
+
+        Args:
+            stream: object with a write(bytes) method
+            chunk_size (int): bytes per read; defaults to the resource chunk_size
+            header_timeout_ms (int): timeout for the block header only, for
+                replies the instrument has to prepare first (e.g. screenshots);
+                the data chunks use the normal resource timeout
+
+        Returns: number of data bytes written
+        '''
+        with self.lock, self._one_call('read'):
+            if header_timeout_ms is None:
+                header = self.read_bytes(2)
+            else:
+                with self.scoped_timeout(header_timeout_ms):
+                    header = self.read_bytes(2)
+            if header[:1] != b'#':
+                raise ValueError(f'expected a #<n><length> block header, got {header!r}')
+            length = int(self.read_bytes(int(header[1:2])))
+            chunk_size = chunk_size or getattr(self.visa_resource, 'chunk_size', 20480)
+            remaining = length
+            while remaining:
+                chunk = self.read_bytes(min(chunk_size, remaining))
+                stream.write(chunk)
+                remaining -= len(chunk)
+            self.read_bytes(1) # trailing terminator
+        return length
 
     
\ No newline at end of file
@@ -0,0 +1,114 @@
+from . import rigol_visa
+from contextlib import contextmanager
+import bisect
+import sys
+import threading
+
+class Rigol_visa_Stats:
+    '''
+    Transport monitor that aggregates call counts, bytes and a latency
+    histogram per SCPI header (short form, e.g. :WAV:DATA?, :MEAS:ITEM?).
+
+    Register it with rigol_visa.add_monitor() or use profile(). For
+    Prometheus/OpenTelemetry style exporters either register a monitor of
+    your own (any callable taking header, op, num_bytes, seconds) or
+    publish snapshot(), which is cumulative and uses the same bucket
+    layout as a Prometheus histogram.
+    '''
+
+    # Histogram bucket upper bounds in seconds: 10 us to 100 s, 4 per decade
+    BUCKETS = [10**(e/4) for e in range(-20, 9)]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.headers = {}
+
+    def __call__(self, header:str, op:str, num_bytes:int, seconds:float):
+        with self._lock:
+            entry = self.headers.get(header)
+            if entry is None:
+                entry = self.headers[header] = {
+                    'calls': 0, 'writes': 0, 'reads': 0,
+                    'bytes_out': 0, 'bytes_in': 0, 'seconds': 0.0,
+                    'buckets': [0] * (len(self.BUCKETS) + 1),
+                }
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            if op == 'write':
+                entry['writes'] += 1
+                entry['bytes_out'] += num_bytes
+            else:
+                entry['writes'] += op == 'query'
+                entry['reads'] += 1
+                entry['bytes_in'] += num_bytes
+            entry['buckets'][bisect.bisect_left(self.BUCKETS, seconds)] += 1
+
+    def reset(self):
+        with self._lock:
+            self.headers = {}
+
+    def snapshot(self) -> dict:
+        '''
+        Copy of the counters per header. 'buckets' is a list of
+        (upper bound in s, cumulative count) pairs ending with ('+Inf', calls).
+        '''
+        with self._lock:
+            snap = {}
+            for header, entry in self.headers.items():
+                cumulative, running = [], 0
+                for bound, count in zip(self.BUCKETS + ['+Inf'], entry['buckets']):
+                    running += count
+                    cumulative.append((bound, running))
+                snap[header] = dict(entry, buckets=cumulative)
+            return snap
+
+    def _percentile(self, buckets:list, fraction:float) -> float:
+        ''' Upper bucket bound below which fraction of the calls fall '''
+        target = fraction * sum(buckets)
+        running = 0
+        for bound, count in zip(self.BUCKETS, buckets):
+            running += count
+            if running >= target:
+                return bound
+        return float('inf')
+
+    def report(self, top:int=None) -> str:
+        '''
+        Table of headers ranked by total transport time.
+        Latency percentiles are bucket upper bounds.
+        '''
+        with self._lock:
+            rows = sorted(self.headers.items(), key=lambda item: item[1]['seconds'], reverse=True)
+        total = sum(entry['seconds'] for _, entry in rows) or 1.0
+        lines = [f"{'header':<24}{'calls':>8}{'total s':>10}{'%':>6}{'mean ms':>10}"
+                 f"{'p50 ms':>9}{'p99 ms':>9}{'kB in':>11}{'MB/s':>8}"]
+        for header, entry in rows[:top]:
+            seconds = entry['seconds']
+            lines.append(
+                f"{header:<24}{entry['calls']:>8}{seconds:>10.3f}{100*seconds/total:>6.1f}"
+                f"{1e3*seconds/entry['calls']:>10.3f}"
+                f"{1e3*self._percentile(entry['buckets'], 0.50):>9.3g}"
+                f"{1e3*self._percentile(entry['buckets'], 0.99):>9.3g}"
+                f"{entry['bytes_in']/1e3:>11.1f}"
+                f"{entry['bytes_in']/seconds/1e6 if seconds else 0.0:>8.2f}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def profile(print_report:bool=True, top:int=20, file=None):
+    '''
+    Instrument every Rigol_visa transport call made inside the block and
+    print the ranked report when it exits.
+
+    example:
+        with profile() as stats:
+            dso.wave.get_wavedata(mode=WaveMode.RAW)
+    '''
+    stats = Rigol_visa_Stats()
+    rigol_visa.add_monitor(stats)
+    try:
+        yield stats
+    finally:
+        rigol_visa.remove_monitor(stats)
+        if print_report:
+            print(stats.report(top), file=file or sys.stdout)
@@ -0,0 +1,301 @@
+import pyvisa as _visa
+from collections import deque
+import hashlib
+import struct
+import threading
+import time
+import zlib
+
+'''
+SCPI traffic record and replay.
+
+Rigol_visa_Recorder wraps a pyvisa resource and logs every write and every
+reply to a compact binary trace; Rigol_visa_Replay reads the trace back and
+behaves like the resource, so the whole Rigol_ds1000z object graph can run
+offline:
+
+    scope = rm.open_resource(...)
+    with Rigol_visa_Recorder(scope, 'run.trace') as recorder:
+        dso = Rigol_ds1000z(visa_resource=recorder)
+        ...
+
+    dso = Rigol_ds1000z(visa_resource=Rigol_visa_Replay('run.trace', speed=None))
+
+Trace layout (little endian):
+    b'RGLTRACE' <version:u16> <name_len:u16> <resource name>
+    records: <op:1s> <time:f64> <duration:f32> <kind:u8> <payload or blob id>
+        op    b'W' write, b'R' reply bytes, b'S' wait_for_srq() outcome
+              (b'' served, b'N' NotImplementedError, else the VISA error code)
+        kind  0: inline <length:u32> <bytes>
+              1: blob   <blob id:u32>
+    blobs:   b'X' <blob id:u32> <length:u32> zlib(bytes)
+Replies of BLOB_MIN bytes or more (waveform blocks, screenshots) are stored
+once as a blob and referenced by id, so repeated identical downloads cost a
+few bytes each.
+'''
+
+_MAGIC = b'RGLTRACE'
+_VERSION = 1
+_RECORD = struct.Struct('<1sdfB')
+_U32 = struct.Struct('<I')
+BLOB_MIN = 256
+
+
+class Rigol_visa_Recorder:
+    '''
+    Pass-through pyvisa resource wrapper that logs all traffic to a trace file.
+    Attributes other than the I/O methods (timeout, chunk_size, ...) are
+    forwarded to the wrapped resource.
+    '''
+
+    def __init__(self, visa_resource, filename:str):
+        self._resource = visa_resource
+        self._lock = threading.Lock()
+        self._blobs = {}
+        self._start = time.perf_counter()
+        self._file = open(filename, 'wb')
+        name = str(getattr(visa_resource, 'resource_name', '')).encode()
+        self._file.write(_MAGIC + struct.pack('<HH', _VERSION, len(name)) + name)
+
+    def __getattr__(self, name):
+        return getattr(self._resource, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._resource, name, value)
+
+    def _log(self, op:bytes, started:float, payload:bytes):
+        duration = time.perf_counter() - started
+        with self._lock:
+            if len(payload) >= BLOB_MIN:
+                digest = hashlib.blake2b(payload, digest_size=16).digest()
+                blob_id = self._blobs.get(digest)
+                if blob_id is None:
+                    blob_id = self._blobs[digest] = len(self._blobs)
+                    packed = zlib.compress(payload, 1)
+                    self._file.write(b'X' + _U32.pack(blob_id) + _U32.pack(len(packed)) + packed)
+                self._file.write(_RECORD.pack(op, started - self._start, duration, 1) + _U32.pack(blob_id))
+            else:
+                self._file.write(_RECORD.pack(op, started - self._start, duration, 0)
+                                 + _U32.pack(len(payload)) + payload)
+
+    def write(self, cmd):
+        started = time.perf_counter()
+        result = self._resource.write(cmd)
+        self._log(b'W', started, cmd.encode())
+        return result
+
+    def read(self):
+        started = time.perf_counter()
+        reply = self._resource.read()
+        self._log(b'R', started, reply.encode())
+        return reply
+
+    def read_raw(self, size=None):
+        started = time.perf_counter()
+        reply = self._resource.read_raw(size)
+        self._log(b'R', started, reply)
+        return reply
+
+    def read_bytes(self, count, *args, **kwargs):
+        started = time.perf_counter()
+        reply = self._resource.read_bytes(count, *args, **kwargs)
+        self._log(b'R', started, reply)
+        return reply
+
+    def query(self, cmd):
+        self.write(cmd)
+        return self.read()
+
+    def wait_for_srq(self, timeout=25000):
+        '''
+        Logged like the I/O methods, so a replay takes the same SRQ or
+        polling path as the recording (see Rigol_ds1000z.wait_for_trigger).
+        '''
+        started = time.perf_counter()
+        try:
+            if not hasattr(self._resource, 'wait_for_srq'):
+                raise NotImplementedError('the transport does not support service requests')
+            result = self._resource.wait_for_srq(timeout)
+        except _visa.VisaIOError as e:
+            self._log(b'S', started, str(int(e.error_code)).encode())
+            raise
+        except NotImplementedError:
+            self._log(b'S', started, b'N')
+            raise
+        self._log(b'S', started, b'')
+        return result
+
+    def close(self):
+        ''' Close the trace file (the wrapped resource stays open) '''
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_trace(filename:str) -> tuple:
+    '''
+    Load a trace file.
+
+    Returns: (resource name, list of (op, time, duration, payload bytes))
+    '''
+    with open(filename, 'rb') as fs:
+        data = fs.read()
+    if data[:8] != _MAGIC:
+        raise ValueError(f'{filename} is not a SCPI trace')
+    version, name_len = struct.unpack_from('<HH', data, 8)
+    pos = 12 + name_len
+    name = data[12:pos].decode()
+    blobs, records = {}, []
+    while pos < len(data):
+        if data[pos:pos+1] == b'X':
+            blob_id, length = struct.unpack_from('<II', data, pos + 1)
+            pos += 9
+            blobs[blob_id] = zlib.decompress(data[pos:pos + length])
+            pos += length
+            continue
+        op, started, duration, kind = _RECORD.unpack_from(data, pos)
+        pos += _RECORD.size
+        value, = _U32.unpack_from(data, pos)
+        pos += 4
+        if kind:
+            payload = blobs[value]
+        else:
+            payload = data[pos:pos + value]
+            pos += value
+        records.append((op, started, duration, payload))
+    return name, records
+
+
+class Rigol_visa_Replay:
+    '''
+    pyvisa resource look-alike that serves the replies of a recorded trace.
+
+    Writes are checked against the recording (strict=True raises ValueError
+    on the first divergence); each write queues the replies recorded after
+    it, and read/read_raw/read_bytes/query consume them, so the reading code
+    may split the reply differently than it was recorded. Reading with
+    nothing queued raises a VISA timeout error like a silent instrument.
+
+    Args:
+        filename (str): trace written by Rigol_visa_Recorder
+        speed (float): None replays as fast as possible, 1.0 at the recorded
+            pace (each reply delayed by its recorded latency), 10.0 ten times faster
+        strict (bool): check every write against the recording
+    '''
+
+    def __init__(self, filename:str, speed:float=None, strict:bool=True):
+        self.resource_name, self._records = read_trace(filename)
+        self.speed = speed
+        self.strict = strict
+        self.timeout = 2000
+        self.chunk_size = 20480
+        self.read_termination = None
+        self.write_termination = None
+        self._pos = 0
+        self._replies = deque()
+        self._lock = threading.RLock()
+
+    def _delay(self, duration:float):
+        if self.speed:
+            time.sleep(duration / self.speed)
+
+    def write(self, cmd):
+        with self._lock:
+            while self._pos < len(self._records) and self._records[self._pos][0] != b'W':
+                self._pos += 1 # replies the code under test never read
+            if self._pos >= len(self._records):
+                raise ValueError(f'replay: trace exhausted at write {cmd!r}')
+            _, _, duration, payload = self._records[self._pos]
+            if self.strict and payload.decode() != cmd:
+                raise ValueError(f'replay: expected write {payload.decode()!r}, got {cmd!r}')
+            self._pos += 1
+            self._replies.clear()
+            while self._pos < len(self._records) and self._records[self._pos][0] == b'R':
+                self._replies.append(self._records[self._pos])
+                self._pos += 1
+            self._delay(duration)
+            return len(cmd)
+
+    def _next_chunk(self) -> bytearray:
+        if not self._replies:
+            raise _visa.errors.VisaIOError(_visa.constants.StatusCode.error_timeout)
+        _, _, duration, payload = self._replies[0]
+        if not isinstance(payload, bytearray):
+            payload = bytearray(payload)
+            self._replies[0] = (b'R', 0.0, 0.0, payload)
+            self._delay(duration)
+        return payload
+
+    def read_raw(self, size=None) -> bytes:
+        with self._lock:
+            chunk = self._next_chunk()
+            self._replies.popleft()
+            return bytes(chunk)
+
+    def read_bytes(self, count, chunk_size=None, break_on_termchar=False) -> bytes:
+        with self._lock:
+            out = bytearray()
+            while len(out) < count:
+                chunk = self._next_chunk()
+                take = min(count - len(out), len(chunk))
+                out += chunk[:take]
+                del chunk[:take]
+                if not chunk:
+                    self._replies.popleft()
+            return bytes(out)
+
+    def read(self) -> str:
+        with self._lock:
+            chunk = self._next_chunk()
+            end = chunk.find(b'\n') + 1 or len(chunk)
+            line = bytes(chunk[:end])
+            del chunk[:end]
+            if not chunk:
+                self._replies.popleft()
+            return line.decode()
+
+    def query(self, cmd) -> str:
+        with self._lock:
+            self.write(cmd)
+            return self.read()
+
+    def wait_for_srq(self, timeout=25000):
+        '''
+        Replays the recorded outcome of wait_for_srq(). A trace recorded
+        without one (a transport without service requests) answers
+        NotImplementedError, so the driver falls back to polling as it did
+        when recording.
+        '''
+        with self._lock:
+            while self._pos < len(self._records) and self._records[self._pos][0] == b'R':
+                self._pos += 1 # replies the code under test never read
+            if self._pos >= len(self._records) or self._records[self._pos][0] != b'S':
+                if self.strict and self._pos < len(self._records):
+                    raise ValueError(f'replay: expected write {self._records[self._pos][3].decode()!r}, '
+                                     'got wait_for_srq()')
+                raise NotImplementedError('no service request in the trace')
+            _, _, duration, payload = self._records[self._pos]
+            self._pos += 1
+            self._replies.clear()
+            self._delay(duration)
+            if payload == b'N':
+                raise NotImplementedError('the transport does not support service requests')
+            if payload:
+                raise _visa.errors.VisaIOError(int(payload))
+
+    def flush(self, mask=None):
+        self._replies.clear()
+
+    def clear(self):
+        self._replies.clear()
+
+    def close(self):
+        pass
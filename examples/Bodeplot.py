@@ -1,97 +1,39 @@
-import visa
-import rigol1000z
-from tqdm import tqdm
+from Rigol_ds1000z import rigol_ds1000z
+from Rigol_ds1000z.rigol_ds1000z_bode import Rigol_ds1000z_Bode
+import Rigol_ds1000z.rigol_ds1000z_constants as RigolConst
 import numpy as np
-import keyboard
-import time
+import pyvisa
 
-class BodePlot_Point:
-    def __init__(self, vin, vout, delay, frequency):
-        self.vin = vin
-        self.vout = vout
-        self.delay = delay
-        self.frequency = frequency
-        
-        self.phase = (delay * frequency) * 2 * np.pi
-        self.H = 20 * np.log10(vout / vin)
+'''
+Bode plot of the circuit between CH1 (Vin) and CH2 (Vout).
 
-def captureBodePlot(scope, num, time_total_ms = 4000, time_setup_ms = 1400):
-    '''
-    Captures the amplitude of signals on channel 1 (Vin) and 2 (Vout), the time delay 
-    between the signals, and the frequency of the signal on Channel 1. It repeats the 
-    measurement 'num' times, every 'time_total_ms' milliseconds, with 'time_setup_ms'
-    milliseconds given to change the frequency setting in the signal generator 
-    connected to the circuit. After the setup time, the measurements statistics are
-    cleared and the following measurement begins.
-    
-    In order to stop the measurement before the completion of 'num' iterations and still 
-    retrieve the measurements already made, press 'q' at any time.
-    
-    Args:
-        num (int): The number of times to repeat the measurements
-        time_total_ms (int): The time (in milliseconds) between measurements. Default 
-                             is 4000 (4 seconds).
-        time_setup_ms (int): The time between the ending of a measurement, and the begining
-                             of the next measurement (time to change the frequency setting of 
-                             the generator). Default is 1400 (1.4 seconds).
-    
-    Returns:
-        np.array() of BodePlot_Points with the measurements.
-    '''
-    scope.visa_write(':MEASure:COUNter:SOURce CHANnel1')
-    scope.visa_write(':MEASure:SETup:DSA CHANnel1')
-    scope.visa_write(':MEASure:SETup:DSB CHANnel2')
-    scope.visa_write(':MEASure:STATistic:DISPlay ON')
-    scope.visa_write(':MEASure:STATistic:MODE DIFFerence')
-    scope.visa_write(':MEASure:STATistic:ITEM VPP,CHANnel1')
-    scope.visa_write(':MEASure:STATistic:ITEM VPP,CHANnel2')
-    scope.visa_write(':MEASure:STATistic:ITEM RDELay')
-    
-    data = []
-    
-    mills_time = lambda: int(round(time.time() * 1000))
-    numPointsTaken = 0
-    lastMeasurement = mills_time()
-    inSetup = True
-    with tqdm(total=num) as pbar:
-        while True:
-            try:
-                if keyboard.is_pressed('q'):
-                    break
-                else:
-                    timeNow = mills_time()
-                    if inSetup:
-                        if timeNow >= lastMeasurement + time_setup_ms:
-                            inSetup = False
-                            scope.visa_write(':MEASure:STATistic:RESet')
-                    elif timeNow >= lastMeasurement + time_total_ms:
-                        vin = float(scope.visa_ask(':MEASure:STATistic:ITEM? AVERages,VPP,CHANnel1'))
-                        vout = float(scope.visa_ask(':MEASure:STATistic:ITEM? AVERages,VPP,CHANnel2'))
-                        delay = float(scope.visa_ask(':MEASure:STATistic:ITEM? AVERages,RDELay'))
-                        freq = float(scope.visa_ask(':MEASure:COUNter:VALue?'))
-                        
-                        data += [BodePlot_Point(vin, vout, delay, freq)]
+Each point dwells only until the scope's measurement statistics have
+settled instead of a fixed 4 s, and all readings of a point are fetched
+in one compound query.
 
-                        pbar.update(1)
-                        numPointsTaken += 1
-                        if numPointsTaken == num:
-                            break
-                        lastMeasurement = mills_time()
-                        inSetup=True
-            except:
-                break
-    
-    return data
+The generator callback steps the stimulus; here an SCPI function generator
+on the same VISA bus. Replace it with whatever drives your source, or with
+generator=None and input() to step a manual generator.
+'''
 
-
-rm = visa.ResourceManager()
+rm = pyvisa.ResourceManager()
 print('VISA Resources: ', rm.list_resources())
 
-scope = rm.open_resource(rm.list_resources()[0])
-rigolScope = Rigol1000z.Rigol1000z(scope)
-print('ID: ', rigolScope.get_id())
+dso = rigol_ds1000z.Rigol_ds1000z()
+print('ID: ', dso.idn())
+
+fgen = rm.open_resource(rm.list_resources()[1])
+def generator(frequency):
+    fgen.write(f'SOURce1:FREQuency {frequency}')
+
+bode = Rigol_ds1000z_Bode(dso, generator,
+                          source_in=RigolConst.MeasureSources.CHAN1,
+                          source_out=RigolConst.MeasureSources.CHAN2)
 
-data = captureBodePlot(rigolScope, 10)
+frequencies = np.logspace(2, 5, 31)
+points = bode.sweep(frequencies, progress=lambda i, p: print(
+    f"{p['set_frequency']:>10.1f} Hz {p['gain_db']:>7.2f} dB {p['phase_deg']:>8.1f} deg "
+    f"({p['polls']} polls, {p['dwell']:.2f} s)"))
 
 #--------------------------------------------------------------------------------------------
 #--------------------------------------------------------------------------------------------
@@ -99,4 +41,4 @@ data = captureBodePlot(rigolScope, 10)
 #--------------------------------------------------------------------------------------------
 #--------------------------------------------------------------------------------------------
 
-scope.close()
+fgen.close()